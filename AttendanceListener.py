@@ -0,0 +1,162 @@
+import time
+import argparse
+import threading
+from datetime import datetime, timezone
+from AttendeeSnapshot import (
+    SNAPSHOT_DB_PATH, open_snapshot, document_to_row, upsert_rows, delete_rows, get_watermark, set_watermark,
+    clear_watermark
+)
+from ParticipantStore import COLLECTION_NAME, ATTENDEE_MIN_COUNTER, FIELD_UPDATED_AT, BACKENDS, PARTICIPANT_STORE, get_store
+
+# --- Configuration ---
+STATUS_INTERVAL_SECONDS = 10
+
+class AttendanceListener:
+    """
+    Keeps an in-memory and on-disk attendance table in sync with the users collection.
+
+    Subscribes to collection changes through the participant store (on_snapshot for
+    Firestore, change-log polling for SQLite). The first callback carries every
+    document and rebuilds the table; later callbacks only carry the changed documents
+    (e.g. Counter increments from the scanning app). Each delta is applied to the
+    in-memory dict and to the local snapshot file, so getAttenders.py --offline and
+    CertificateGeneratorSender.py --offline can run the moment the event ends.
+    """
+
+    def __init__(self, store, db_path=SNAPSHOT_DB_PATH):
+        self.store = store
+        self.db_path = db_path
+        self.rows = {} # doc_id -> (doc_id, name, email, mobile, counter, updated_at)
+        self.change_count = 0
+        self.last_change = None
+        self._lock = threading.Lock()
+        self._initial_loaded = threading.Event()
+        self._conn = open_snapshot(db_path, check_same_thread=False) # Used from the watch thread
+        self._watch = None
+        self._closed = False
+        self._missing_updated_at = False # A document without UpdatedAt was seen since the initial load
+
+    def start(self):
+        """Starts listening to the collection. Callbacks run on a background thread."""
+        print(f"Subscribing to changes in '{COLLECTION_NAME}' ({self.store.name} store)...")
+        self._watch = self.store.stream_changes(self._on_changes)
+
+    def stop(self):
+        """Stops listening and closes the snapshot file."""
+        if self._watch:
+            self._watch.unsubscribe()
+            self._watch = None
+        with self._lock:
+            self._closed = True
+            self._conn.close()
+
+    def wait_until_loaded(self, timeout=None):
+        """Blocks until the initial collection snapshot has been applied."""
+        return self._initial_loaded.wait(timeout)
+
+    def _on_changes(self, changes):
+        initial = not self._initial_loaded.is_set()
+        received_at = datetime.now(timezone.utc)
+        upserts = []
+        removals = []
+        newest = None
+        missing_updated_at = False
+        for change_type, doc_id, data in changes:
+            if change_type == 'REMOVED':
+                removals.append(doc_id)
+                continue
+            data = data or {}
+            upserts.append(document_to_row(doc_id, data))
+            updated_at = data.get(FIELD_UPDATED_AT)
+            if not isinstance(updated_at, datetime):
+                missing_updated_at = True
+            elif newest is None or updated_at > newest:
+                newest = updated_at
+
+        with self._lock:
+            if self._closed:
+                return # Late callback after stop()
+            try:
+                if initial:
+                    # The first callback lists the whole collection
+                    self.rows.clear()
+                    self._conn.execute("DELETE FROM users")
+                    self._missing_updated_at = False
+                for doc_id in removals:
+                    self.rows.pop(doc_id, None)
+                for row in upserts:
+                    self.rows[row[0]] = row
+                delete_rows(self._conn, removals)
+                upsert_rows(self._conn, upserts)
+                # Keep the incremental refresh watermark moving with the listener
+                # (documents without UpdatedAt force incremental refreshes to read everything)
+                self._missing_updated_at = self._missing_updated_at or missing_updated_at
+                watermark = get_watermark(self._conn)
+                if self._missing_updated_at:
+                    clear_watermark(self._conn)
+                elif newest is not None and (watermark is None or newest > watermark):
+                    set_watermark(self._conn, newest)
+                elif initial and watermark is None:
+                    set_watermark(self._conn, received_at)
+                self._conn.commit()
+            except Exception as e:
+                self._conn.rollback()
+                print(f"Error applying {len(changes)} changes to '{self.db_path}': {e}")
+                return
+            self.change_count += len(changes)
+            self.last_change = datetime.now()
+
+        if initial:
+            self._initial_loaded.set()
+            print(f"Initial snapshot loaded: {len(upserts)} documents.")
+
+    def counts(self):
+        """Returns (registered, checked_in, attendees) counts from the in-memory table."""
+        with self._lock:
+            counters = [row[4] for row in self.rows.values()]
+        checked_in = sum(1 for counter in counters if counter > 0)
+        attendees = sum(1 for counter in counters if counter > ATTENDEE_MIN_COUNTER)
+        return len(counters), checked_in, attendees
+
+    def attendees(self, min_counter=ATTENDEE_MIN_COUNTER):
+        """Returns the current attendees (Counter > min_counter) as dicts."""
+        with self._lock:
+            rows = [row for row in self.rows.values() if row[4] > min_counter]
+        return [
+            {'doc_id': doc_id, 'name': name, 'email': email, 'mobile': mobile, 'counter': counter}
+            for doc_id, name, email, mobile, counter, _ in sorted(rows)
+        ]
+
+# --- Main Execution ---
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Listen to attendance changes and keep the local snapshot live.")
+    parser.add_argument("--interval", type=int, default=STATUS_INTERVAL_SECONDS, help=f"Seconds between status lines (default: {STATUS_INTERVAL_SECONDS})")
+    parser.add_argument("--db", default=SNAPSHOT_DB_PATH, help=f"Snapshot file (default: {SNAPSHOT_DB_PATH})")
+    parser.add_argument("--backend", choices=BACKENDS, default=PARTICIPANT_STORE, help=f"Participant store backend (default: {PARTICIPANT_STORE})")
+    args = parser.parse_args()
+
+    print("--- Starting Live Attendance Listener ---")
+    store = get_store(args.backend)
+    listener = AttendanceListener(store, args.db)
+    listener.start()
+    print("Waiting for the initial snapshot...")
+    listener.wait_until_loaded()
+    print("Press Ctrl+C to stop.")
+
+    try:
+        while True:
+            registered, checked_in, attendees = listener.counts()
+            last = listener.last_change.strftime("%H:%M:%S") if listener.last_change else "-"
+            print(f"[{datetime.now().strftime('%H:%M:%S')}] Registered: {registered} | Checked in: {checked_in} | "
+                  f"Attendees (Counter > {ATTENDEE_MIN_COUNTER}): {attendees} | Changes: {listener.change_count} (last {last})")
+            time.sleep(args.interval)
+    except KeyboardInterrupt:
+        print("\nStopping listener...")
+    finally:
+        listener.stop()
+        store.close()
+
+    registered, checked_in, attendees = listener.counts()
+    print(f"Final counts - Registered: {registered}, Checked in: {checked_in}, Attendees: {attendees}")
+    print(f"Attendance table saved to '{args.db}'. Run getAttenders.py or CertificateGeneratorSender.py with --offline.")
+    print("--- Live Attendance Listener Stopped ---")
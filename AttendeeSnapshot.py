@@ -0,0 +1,194 @@
+import os
+import sys
+import sqlite3
+import argparse
+from datetime import datetime
+from firebase_admin import firestore
+from FirebaseSync import initialize_firebase_sync
+from ParticipantStore import (
+    COLLECTION_NAME, ATTENDEE_MIN_COUNTER,
+    FIELD_NAME, FIELD_EMAIL, FIELD_MOBILE, FIELD_COUNTER, FIELD_UPDATED_AT
+)
+
+# --- Configuration ---
+SNAPSHOT_DB_PATH = os.path.join('output', 'cache', 'users_snapshot.sqlite')
+# Collection and field names come from ParticipantStore.py. Incremental refreshes only fetch
+# documents whose UpdatedAt (FIELD_UPDATED_AT) is newer than the stored watermark.
+
+WATERMARK_KEY = 'updated_at_watermark'
+
+# --- Snapshot Store ---
+
+def open_snapshot(db_path=SNAPSHOT_DB_PATH, check_same_thread=True):
+    """Opens (and creates if needed) the local SQLite snapshot of the users collection."""
+    db_dir = os.path.dirname(db_path)
+    if db_dir and not os.path.exists(db_dir):
+        os.makedirs(db_dir)
+        print(f"Created directory: {db_dir}")
+    conn = sqlite3.connect(db_path, check_same_thread=check_same_thread)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS users ("
+        " doc_id TEXT PRIMARY KEY,"
+        " name TEXT,"
+        " email TEXT,"
+        " mobile TEXT,"
+        " counter INTEGER NOT NULL DEFAULT 0,"
+        " updated_at TEXT)"
+    )
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_users_counter ON users(counter)")
+    conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+    conn.commit()
+    return conn
+
+def get_watermark(conn):
+    """Returns the stored UpdatedAt watermark as an aware datetime, or None."""
+    row = conn.execute("SELECT value FROM meta WHERE key = ?", (WATERMARK_KEY,)).fetchone()
+    if not row or not row[0]:
+        return None
+    return datetime.fromisoformat(row[0])
+
+def set_watermark(conn, watermark):
+    """Stores the UpdatedAt watermark (aware datetime)."""
+    conn.execute(
+        "INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+        (WATERMARK_KEY, watermark.isoformat())
+    )
+
+def clear_watermark(conn):
+    """Removes the UpdatedAt watermark, so the next incremental refresh reads the whole collection."""
+    conn.execute("DELETE FROM meta WHERE key = ?", (WATERMARK_KEY,))
+
+def document_to_row(doc_id, data):
+    """Converts a Firestore document dict into a snapshot row tuple."""
+    counter = data.get(FIELD_COUNTER, 0)
+    try:
+        counter = int(counter or 0)
+    except (ValueError, TypeError):
+        counter = 0
+    mobile = data.get(FIELD_MOBILE)
+    updated_at = data.get(FIELD_UPDATED_AT)
+    return (
+        doc_id,
+        data.get(FIELD_NAME),
+        data.get(FIELD_EMAIL),
+        str(mobile).strip() if mobile else None,
+        counter,
+        updated_at.isoformat() if isinstance(updated_at, datetime) else None,
+    )
+
+def upsert_rows(conn, rows):
+    """Inserts or replaces snapshot rows."""
+    conn.executemany(
+        "INSERT OR REPLACE INTO users (doc_id, name, email, mobile, counter, updated_at) VALUES (?, ?, ?, ?, ?, ?)",
+        rows
+    )
+
+def delete_rows(conn, doc_ids):
+    """Removes snapshot rows by document ID."""
+    conn.executemany("DELETE FROM users WHERE doc_id = ?", [(doc_id,) for doc_id in doc_ids])
+
+def refresh_snapshot(db, db_path=SNAPSHOT_DB_PATH, full=False):
+    """
+    Brings the local snapshot up to date with Firestore.
+
+    Without a stored watermark (or with full=True) the whole collection is read once and the
+    table is rebuilt. Afterwards only documents with UpdatedAt newer than the watermark are
+    fetched, so a refresh with no changes costs a single empty query. Documents without
+    UpdatedAt never match that query: if a full refresh finds any, no watermark is stored and
+    the next refresh reads the whole collection again.
+
+    Args:
+        db: Firestore client.
+        db_path (str): Snapshot file.
+        full (bool): Read the whole collection even if a watermark is stored.
+
+    Returns:
+        int: Number of documents fetched from Firestore, or None if the refresh failed (the
+            snapshot is left as it was and may be stale).
+    """
+    conn = open_snapshot(db_path)
+    fields = [FIELD_NAME, FIELD_EMAIL, FIELD_MOBILE, FIELD_COUNTER, FIELD_UPDATED_AT]
+    watermark = None if full else get_watermark(conn)
+
+    try:
+        users_ref = db.collection(COLLECTION_NAME)
+        if watermark is None:
+            print(f"Performing full snapshot refresh of '{COLLECTION_NAME}'...")
+            query = users_ref.select(fields)
+        else:
+            print(f"Refreshing snapshot incrementally (documents updated after {watermark.isoformat()})...")
+            query = (users_ref
+                     .where(filter=firestore.FieldFilter(FIELD_UPDATED_AT, '>', watermark))
+                     .order_by(FIELD_UPDATED_AT)
+                     .select(fields))
+
+        rows = []
+        newest = watermark
+        missing_updated_at = 0
+        for doc in query.stream():
+            data = doc.to_dict()
+            rows.append(document_to_row(doc.id, data))
+            updated_at = data.get(FIELD_UPDATED_AT)
+            if not isinstance(updated_at, datetime):
+                missing_updated_at += 1
+            elif newest is None or updated_at > newest:
+                newest = updated_at
+
+        if watermark is None:
+            conn.execute("DELETE FROM users") # Full refresh also drops documents deleted remotely
+        upsert_rows(conn, rows)
+        if missing_updated_at or newest is None:
+            # Changes to these documents cannot be found by UpdatedAt; keep refreshing in full
+            clear_watermark(conn)
+            if missing_updated_at:
+                print(f"Note: {missing_updated_at} documents have no {FIELD_UPDATED_AT}; the next refresh will read the whole collection again.")
+        else:
+            set_watermark(conn, newest)
+        conn.commit()
+        print(f"Snapshot refreshed: {len(rows)} documents fetched, stored at '{db_path}'.")
+        return len(rows)
+    except Exception as e:
+        conn.rollback()
+        print(f"Error refreshing snapshot from Firestore: {e}")
+        return None
+    finally:
+        conn.close()
+
+def get_snapshot_attendees(db_path=SNAPSHOT_DB_PATH, min_counter=ATTENDEE_MIN_COUNTER):
+    """
+    Reads attendees (Counter > min_counter) from the local snapshot. Uses no Firestore reads.
+
+    Returns:
+        list: Dicts with 'doc_id', 'name', 'email', 'mobile' and 'counter'.
+    """
+    if not os.path.exists(db_path):
+        print(f"Error: Snapshot '{db_path}' not found. Refresh it from Firestore first.")
+        return []
+    conn = open_snapshot(db_path)
+    try:
+        cursor = conn.execute(
+            "SELECT doc_id, name, email, mobile, counter FROM users WHERE counter > ? ORDER BY doc_id",
+            (min_counter,)
+        )
+        return [
+            {'doc_id': doc_id, 'name': name, 'email': email, 'mobile': mobile, 'counter': counter}
+            for doc_id, name, email, mobile, counter in cursor
+        ]
+    finally:
+        conn.close()
+
+# --- Main Execution ---
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Refresh the local snapshot of the Firestore users collection.")
+    parser.add_argument("--full", action="store_true", help="Re-read the whole collection instead of only changed documents")
+    parser.add_argument("--db", default=SNAPSHOT_DB_PATH, help=f"Snapshot file (default: {SNAPSHOT_DB_PATH})")
+    args = parser.parse_args()
+
+    print("--- Refreshing Users Snapshot ---")
+    db_client = initialize_firebase_sync()
+    if refresh_snapshot(db_client, args.db, full=args.full) is None:
+        sys.exit(1)
+    attendees = get_snapshot_attendees(args.db)
+    print(f"Snapshot contains {len(attendees)} attendees ({FIELD_COUNTER} > {ATTENDEE_MIN_COUNTER}).")
+    print("--- Snapshot Refresh Finished ---")
@@ -0,0 +1,154 @@
+import os
+import sys
+import time
+import argparse
+import numpy as np
+import pandas as pd
+
+# --- Configuration ---
+CAMPAIGN_PLAN_DIR = os.path.join('output', 'plans')
+CSV_EMAIL_COL = 'mail'
+CSV_PHONE_COL = 'mobile'
+CSV_NAME_COL = 'isim'
+QR_FILE_SUFFIX = '_designed.png'
+
+# --- Plan Statuses ---
+PLAN_SEND = 'send'
+SKIP_MISSING_DATA = 'missing_data'
+SKIP_ALREADY_SENT = 'already_sent'
+SKIP_DUPLICATE = 'duplicate'
+SKIP_MISSING_QR = 'missing_qr'
+PLAN_STATUSES = [PLAN_SEND, SKIP_MISSING_DATA, SKIP_ALREADY_SENT, SKIP_DUPLICATE, SKIP_MISSING_QR]
+PLAN_COLUMNS = ['row', 'email', 'mobile', 'name', 'status']
+
+def _text_column(df, col):
+    if col not in df.columns:
+        return pd.Series('', index=df.index, dtype=object)
+    return df[col].fillna('').astype(str).str.strip()
+
+def plan_qr_campaign(df, qr_dir, sent_emails, email_col=CSV_EMAIL_COL, mobile_col=CSV_PHONE_COL, name_col=CSV_NAME_COL):
+    """
+    Decides for every CSV row whether its QR email is sent, and why not otherwise.
+
+    All checks are column operations: the addresses are matched against the sent set
+    and the expected file names against one listing of qr_dir, so no per-row file
+    system calls or log writes are made. Checks apply in this order: missing email or
+    mobile, already sent, missing designed QR file, repeated ticket (same address and
+    mobile as an earlier row). Only rows that pass the first three checks count for
+    repeats, so an unsendable first row never hides a valid one.
+
+    Rows with different mobiles that share an address (e.g. tickets for family
+    members) are all planned for sending; plan_jobs() puts their tickets into one
+    email to that address.
+
+    Args:
+        df (pd.DataFrame): Rows of the *_clean.csv file.
+        qr_dir (str): Directory with the designed QR codes (<mobile>_designed.png).
+        sent_emails (set): Lower-cased addresses that already received the email.
+
+    Returns:
+        pd.DataFrame: PLAN_COLUMNS, one row per CSV row; 'row' is the CSV row index.
+    """
+    email = _text_column(df, email_col)
+    mobile = _text_column(df, mobile_col)
+    key = email.str.lower()
+    try:
+        qr_files = set(os.listdir(qr_dir))
+    except OSError:
+        qr_files = set()
+
+    missing_data = (email == '') | (mobile == '')
+    already_sent = key.isin(sent_emails)
+    missing_qr = ~(mobile + QR_FILE_SUFFIX).isin(qr_files)
+    eligible = ~missing_data & ~already_sent & ~missing_qr
+    duplicate = eligible & (key + '\0' + mobile).where(eligible).duplicated()
+    status = np.select(
+        [missing_data, already_sent, missing_qr, duplicate],
+        [SKIP_MISSING_DATA, SKIP_ALREADY_SENT, SKIP_MISSING_QR, SKIP_DUPLICATE],
+        default=PLAN_SEND,
+    )
+    return pd.DataFrame({
+        'row': df.index,
+        'email': email.values,
+        'mobile': mobile.values,
+        'name': _text_column(df, name_col).values,
+        'status': pd.Categorical(status, categories=PLAN_STATUSES),
+    })
+
+def plan_counts(plan):
+    """Number of rows per status, including statuses with no rows."""
+    counts = plan['status'].value_counts()
+    return {status: int(counts.get(status, 0)) for status in PLAN_STATUSES}
+
+def plan_jobs(plan, qr_dir):
+    """
+    Job dicts for SMTPSenderPool from the rows planned for sending, one per address.
+
+    'mobile', 'qr_path' and 'name' come from the address's first row; 'qr_paths' lists
+    the tickets of all its rows, which are attached to the same email.
+    """
+    to_send = plan[plan['status'] == PLAN_SEND]
+    jobs = {} # lower-cased address -> job
+    for row, email, mobile, name in zip(to_send['row'], to_send['email'], to_send['mobile'], to_send['name']):
+        qr_path = os.path.join(qr_dir, mobile + QR_FILE_SUFFIX)
+        job = jobs.get(email.lower())
+        if job is None:
+            jobs[email.lower()] = {'index': int(row), 'email': email, 'mobile': mobile, 'qr_path': qr_path, 'name': name, 'qr_paths': [qr_path]}
+        else:
+            job['qr_paths'].append(qr_path)
+    return list(jobs.values())
+
+def plan_skip_errors(plan):
+    """(email, mobile, reason) rows for the delivery error log, one per skipped row (already sent excluded)."""
+    rows = []
+    for status, reason in ((SKIP_MISSING_DATA, 'Missing email or mobile in CSV row'),
+                           (SKIP_DUPLICATE, 'Duplicate ticket in CSV (sent once)')):
+        skipped = plan[plan['status'] == status]
+        rows.extend((email or 'N/A', mobile or 'N/A', reason) for email, mobile in zip(skipped['email'], skipped['mobile']))
+    skipped = plan[plan['status'] == SKIP_MISSING_QR]
+    rows.extend((email, mobile, f'Missing designed QR file: {mobile}{QR_FILE_SUFFIX}') for email, mobile in zip(skipped['email'], skipped['mobile']))
+    return rows
+
+def default_plan_path(csv_path, campaign='qr'):
+    """output/plans/<input>_<campaign>_plan.csv for a *_clean.csv path."""
+    base_name = os.path.splitext(os.path.basename(csv_path))[0]
+    return os.path.join(CAMPAIGN_PLAN_DIR, f"{base_name}_{campaign}_plan.csv")
+
+def write_plan(plan, plan_path):
+    """Writes a plan in one pass (moved into place when complete)."""
+    plan_dir = os.path.dirname(plan_path)
+    if plan_dir and not os.path.exists(plan_dir):
+        os.makedirs(plan_dir)
+        print(f"Created directory: {plan_dir}")
+    tmp_path = plan_path + '.tmp'
+    plan.to_csv(tmp_path, index=False, columns=PLAN_COLUMNS)
+    os.replace(tmp_path, plan_path)
+
+def read_plan(plan_path):
+    plan = pd.read_csv(plan_path, dtype=str, keep_default_na=False)
+    plan['status'] = pd.Categorical(plan['status'], categories=PLAN_STATUSES)
+    return plan
+
+# --- Main Execution ---
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Plan a QR email campaign: which rows are sent and why the others are skipped.")
+    parser.add_argument("csv_file", help="Path to the *_clean.csv file")
+    parser.add_argument("--qr-dir", default=os.path.join('output', 'designed_qr'), help="Designed QR directory (default: output/designed_qr)")
+    parser.add_argument("--output", help="Plan file (default: output/plans/<input>_qr_plan.csv)")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.csv_file):
+        print(f"Error: CSV file not found at '{args.csv_file}'")
+        sys.exit(1)
+    from DeliveryLog import DeliveryLog
+    with DeliveryLog('qr') as delivery_log:
+        sent_emails = delivery_log.sent_emails()
+    df = pd.read_csv(args.csv_file, dtype=str)
+    start_time = time.perf_counter()
+    plan = plan_qr_campaign(df, args.qr_dir, sent_emails)
+    elapsed = time.perf_counter() - start_time
+    plan_path = args.output or default_plan_path(args.csv_file)
+    write_plan(plan, plan_path)
+    print(f"Planned {len(plan)} rows in {elapsed:.3f}s; plan written to '{plan_path}'.")
+    for status, count in plan_counts(plan).items():
+        print(f" - {status}: {count}")
@@ -1,6 +1,12 @@
 import os
-import smtplib
 import sys
+import time
+import queue
+import argparse
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from email.mime.base import MIMEBase
@@ -10,6 +16,25 @@ import firebase_admin
 from firebase_admin import credentials, firestore
 from dotenv import load_dotenv
 from tqdm import tqdm
+from MailSender import SMTPSession, get_delivery_log
+from CertificatePDF import CertificatePDFRenderer, CERTIFICATE_ARCHIVE_NAME, NAME_Y_RATIO
+from RenderManifest import RenderManifest, file_digest, render_key
+from RunMetrics import RunMetrics, LatencyHistogram, timed_items
+from AttendeeSnapshot import SNAPSHOT_DB_PATH, refresh_snapshot, get_snapshot_attendees
+from FirebaseSync import initialize_firebase_sync
+from ParticipantStore import (
+    BACKENDS, PARTICIPANT_STORE,
+    FIELD_NAME, FIELD_EMAIL, FIELD_MOBILE, get_store
+)
+
+CERTIFICATE_CAMPAIGN = 'certificate' # Delivery log campaign of the certificate emails
+# Processes rendering certificates (1 renders in this process)
+CERTIFICATE_RENDER_WORKERS = int(os.getenv('CERTIFICATE_RENDER_WORKERS', str(os.cpu_count() or 1)))
+CERTIFICATE_CHUNK_SIZE = 16 # Attendees per task sent to a worker
+CERTIFICATE_STREAM_CHUNK_SIZE = 2 # Smaller tasks while streaming, so the first emails go out sooner
+CERTIFICATE_STREAM_QUEUE_SIZE = 32 # Rendered certificates waiting for the sender while streaming
+# 'png' (raster, as before) or 'pdf' (template embedded once, name as vector text; see CertificatePDF.py)
+CERTIFICATE_FORMAT = os.getenv('CERTIFICATE_FORMAT', 'png')
 
 # --- Copied Utility Functions ---
 
@@ -22,10 +47,11 @@ def create_directory_if_not_exists(directory_path):
 # --- Copied Firebase Functions ---
 
 SERVICE_ACCOUNT_KEY_PATH = 'qr-deneme.json' # Keep config here or load from env
-COLLECTION_NAME = 'users'
 
 def initialize_firebase():
-    """Initializes the Firebase Admin SDK."""
+    """Initializes the Firebase Admin SDK (or connects to the emulator if FIRESTORE_EMULATOR_HOST is set)."""
+    if os.getenv('FIRESTORE_EMULATOR_HOST'):
+        return initialize_firebase_sync() # Anonymous emulator credential, no service account key
     if not os.path.exists(SERVICE_ACCOUNT_KEY_PATH):
         print(f"Error: Service account key file not found at '{SERVICE_ACCOUNT_KEY_PATH}'")
         sys.exit(1)
@@ -42,87 +68,327 @@ def initialize_firebase():
         print(f"Error initializing Firebase: {e}")
         sys.exit(1)
 
-def get_attendees_from_firebase(db):
-    """Fetches users from Firestore where Counter > 0."""
-    users_ref = db.collection(COLLECTION_NAME)
-    attendees = []
-    try:
-        query = users_ref.where(filter=firestore.FieldFilter('Counter', '>', 1)).stream()
-        print("Fetching attendees from Firebase (Counter > 1)...")
-        docs = list(query)
-        if not docs:
-            print("No attendees found with Counter > 1.")
-            return []
-
-        for doc in tqdm(docs, desc="Processing attendees"):
-            data = doc.to_dict()
-            attendees.append({
-                'isim': data.get('Ad-Soyad', 'Unknown Name'),
-                'mail': data.get('Eposta', ''),
-                'mobile': data.get('Telefon numaranız', '')
-            })
-        print(f"Found {len(attendees)} attendees.")
-        return attendees
-    except Exception as e:
-        print(f"Error fetching attendees from Firestore: {e}")
-        return []
+def get_attendees_from_snapshot(db_path=SNAPSHOT_DB_PATH):
+    """Reads attendees (Counter > 1) from the local users snapshot. Uses no Firestore reads."""
+    attendees = [
+        {
+            'isim': row['name'] or 'Unknown Name',
+            'mail': row['email'] or '',
+            'mobile': row['mobile'] or ''
+        }
+        for row in get_snapshot_attendees(db_path)
+    ]
+    if not attendees:
+        print("No attendees found with Counter > 1 in the local snapshot.")
+    else:
+        print(f"Found {len(attendees)} attendees in the local snapshot.")
+    return attendees
+
+def get_attendees_from_store(store):
+    """Reads attendees (Counter > 1) directly from a local participant store (SQLite or in-memory)."""
+    attendees = [
+        {
+            'isim': data.get(FIELD_NAME) or 'Unknown Name',
+            'mail': data.get(FIELD_EMAIL) or '',
+            'mobile': str(data.get(FIELD_MOBILE) or '')
+        }
+        for _, data in store.query_by_counter()
+    ]
+    print(f"Found {len(attendees)} attendees in the {store.name} store.")
+    return attendees
 
 # --- Copied Certificate Generation Function ---
 
+class CertificateRenderer:
+    """
+    Draws names onto the certificate template.
+
+    The template is decoded and the font loaded once; every certificate starts from a
+    copy of the decoded template.
+    """
+
+    def __init__(self, template_path, output_dir, font_path="arial.ttf", font_size=100, text_color=(0, 0, 0)):
+        self.output_dir = output_dir
+        self.text_color = text_color
+        with Image.open(template_path) as template:
+            self.template = template.convert("RGB")
+        try:
+            self.font = ImageFont.truetype(font_path, font_size)
+        except IOError:
+            print(f"Error: Font file not found at '{font_path}'.")
+            self.font = ImageFont.load_default()
+            print("Warning: Using default PIL font.")
+
+    def render(self, name, mobile):
+        """Writes <output_dir>/<mobile>.png. Returns True on success."""
+        if not name or not mobile:
+            print(f"Warning: Skipping certificate generation due to missing name ('{name}') or mobile ('{mobile}')")
+            return False
+        try:
+            certificate = self.template.copy()
+            template_width, template_height = certificate.size
+            draw = ImageDraw.Draw(certificate)
+            formatted_name = ' '.join(part.capitalize() for part in name.split())
+            Y_POSITION = template_height * NAME_Y_RATIO
+            try:
+                bbox = draw.textbbox((0, 0), formatted_name, font=self.font)
+                text_width = bbox[2] - bbox[0]
+            except AttributeError:
+                text_width, text_height = draw.textsize(formatted_name, font=self.font)
+            x_position = (template_width - text_width) / 2
+            draw.text((x_position, Y_POSITION), formatted_name, fill=self.text_color, font=self.font)
+            certificate.save(os.path.join(self.output_dir, f"{mobile}.png"))
+            return True
+        except Exception as e:
+            print(f"Error generating certificate for {name} ({mobile}): {e}")
+            return False
+
 def generate_certificate(name, mobile, template_path, output_dir, font_path="arial.ttf", font_size=100, text_color=(0, 0, 0)):
     """Generates a certificate by drawing a name onto a template image."""
     if not name or not mobile:
         print(f"Warning: Skipping certificate generation due to missing name ('{name}') or mobile ('{mobile}')")
         return False
     try:
-        template = Image.open(template_path).convert("RGB")
-        template_width, template_height = template.size
-        try:
-            font = ImageFont.truetype(font_path, font_size)
-        except IOError:
-            print(f"Error: Font file not found at '{font_path}'.")
-            try:
-                font = ImageFont.load_default()
-                print("Warning: Using default PIL font.")
-            except Exception as font_e:
-                 print(f"Error: Could not load default font: {font_e}. Cannot generate certificate for {name}.")
-                 return False
-
-        draw = ImageDraw.Draw(template)
-        formatted_name = ' '.join(part.capitalize() for part in name.split())
-        Y_POSITION = template_height * 0.45
-        try:
-            bbox = draw.textbbox((0, 0), formatted_name, font=font)
-            text_width = bbox[2] - bbox[0]
-            x_position = (template_width - text_width) / 2
-            y_position = Y_POSITION
-        except AttributeError:
-             text_width, text_height = draw.textsize(formatted_name, font=font)
-             x_position = (template_width - text_width) / 2
-             y_position = Y_POSITION
-
-        draw.text((x_position, y_position), formatted_name, fill=text_color, font=font)
-        output_path = os.path.join(output_dir, f"{mobile}.png")
-        template.save(output_path)
-        return True
+        renderer = CertificateRenderer(template_path, output_dir, font_path, font_size, text_color)
     except FileNotFoundError:
         print(f"Error: Template image not found at '{template_path}'")
         return False
     except Exception as e:
         print(f"Error generating certificate for {name} ({mobile}): {e}")
         return False
+    return renderer.render(name, mobile)
+
+# --- Parallel Certificate Generation ---
+
+_worker_renderer = None # Per worker process, set by _init_certificate_worker
+
+def _init_certificate_worker(template_path, output_dir, font_path, font_size, text_color):
+    global _worker_renderer
+    _worker_renderer = CertificateRenderer(template_path, output_dir, font_path, font_size, text_color)
+
+def _render_certificate_chunk(chunk):
+    """Renders a chunk in a worker. Returns (rendered, seconds) per certificate."""
+    results = []
+    for name, mobile in chunk:
+        start = time.perf_counter()
+        rendered = _worker_renderer.render(name, mobile)
+        results.append((rendered, time.perf_counter() - start))
+    return results
+
+def certificate_render_keys(attendees, template_path, font_path, font_size, text_color, file_format):
+    """
+    Render key (see RenderManifest.py) of every attendee's certificate: a hash of the
+    name and of everything else the certificate is drawn from.
+    """
+    shared_inputs = {
+        'template': file_digest(template_path),
+        'font': 'Helvetica' if file_format == 'pdf' else (file_digest(font_path) or 'default'),
+        'font_size': font_size,
+        'text_color': list(text_color),
+        'name_y': NAME_Y_RATIO,
+        'format': file_format,
+    }
+    return [render_key(name=attendee.get('isim'), **shared_inputs) for attendee in attendees]
+
+def split_unchanged_certificates(attendees, keys, manifest, file_format, force=False):
+    """Returns (unchanged, to_render): attendees whose certificate is up to date, and (attendee, key) pairs to render."""
+    unchanged, to_render = [], []
+    for attendee, key in zip(attendees, keys):
+        if not force and manifest.is_current(f"{attendee.get('mobile')}.{file_format}", key):
+            unchanged.append(attendee)
+        else:
+            to_render.append((attendee, key))
+    if unchanged:
+        print(f"Skipping {len(unchanged)} certificates whose name, template and font have not changed.")
+    return unchanged, to_render
+
+def generate_certificates(attendees, template_path, output_dir, font_path="arial.ttf", font_size=100, text_color=(0, 0, 0),
+                          workers=CERTIFICATE_RENDER_WORKERS, chunk_size=CERTIFICATE_CHUNK_SIZE, file_format=CERTIFICATE_FORMAT,
+                          force=False, metrics=None):
+    """
+    Generates the certificates of all attendees across worker processes.
+
+    Every worker decodes the template and loads the font once (pool initializer) and
+    renders attendees in chunks of chunk_size; only the success flags travel back.
+    With workers <= 1 everything is rendered in this process.
+
+    With file_format 'pdf', <mobile>.pdf files are written by CertificatePDFRenderer
+    instead. They embed the template without re-encoding it, so they are written in
+    this process without a pool. font_path does not apply (PDFs use Helvetica).
+
+    Certificates whose inputs (name, template, font, size, color, position) have not
+    changed since they were last rendered are kept (see RenderManifest.py); force
+    renders every certificate again.
+
+    metrics (a StageMetrics, see RunMetrics.py) receives the render time of every
+    certificate, measured in the worker for pooled renders.
+
+    Returns:
+        int: Number of certificates generated or already up to date.
+    """
+    try:
+        with RenderManifest(output_dir, 'certificate') as manifest:
+            keys = certificate_render_keys(attendees, template_path, font_path, font_size, text_color, file_format)
+            unchanged, to_render = split_unchanged_certificates(attendees, keys, manifest, file_format, force)
+            items = [(attendee.get('isim'), attendee.get('mobile')) for attendee, _ in to_render]
+            if metrics is not None:
+                metrics.extra['unchanged'] = len(unchanged)
+            if not items:
+                return len(unchanged)
+            rendered_count = 0
+            if file_format == 'pdf' or workers <= 1 or len(items) <= chunk_size:
+                if file_format == 'pdf':
+                    pdf_renderer = CertificatePDFRenderer(template_path, font_size, text_color)
+                    render = lambda name, mobile: pdf_renderer.render_certificate(name, mobile, output_dir)
+                else:
+                    render = CertificateRenderer(template_path, output_dir, font_path, font_size, text_color).render
+                for (attendee, key), (name, mobile) in timed_items(tqdm(list(zip(to_render, items)), desc="Generating Certificates"), metrics):
+                    if render(name, mobile):
+                        manifest.record(f"{mobile}.{file_format}", key)
+                        rendered_count += 1
+            else:
+                # Chunks are recorded in the manifest as they come back, so an interrupted run keeps them
+                chunks = [(to_render[i:i + chunk_size], items[i:i + chunk_size]) for i in range(0, len(items), chunk_size)]
+                with ProcessPoolExecutor(max_workers=min(workers, len(chunks)), initializer=_init_certificate_worker,
+                                         initargs=(template_path, output_dir, font_path, font_size, text_color)) as executor:
+                    with tqdm(total=len(items), desc=f"Generating Certificates ({workers} processes)") as progress:
+                        chunk_results = executor.map(_render_certificate_chunk, [chunk_items for _, chunk_items in chunks])
+                        for (chunk_to_render, chunk_items), results in zip(chunks, chunk_results):
+                            for (attendee, key), (rendered, seconds) in zip(chunk_to_render, results):
+                                if rendered:
+                                    manifest.record(f"{attendee.get('mobile')}.{file_format}", key)
+                                    rendered_count += 1
+                                if metrics is not None:
+                                    metrics.observe(seconds)
+                            progress.update(len(chunk_items))
+            return len(unchanged) + rendered_count
+    except FileNotFoundError:
+        print(f"Error: Template image not found at '{template_path}'")
+        return 0
+    except BrokenProcessPool as e:
+        print(f"Error: Certificate worker processes failed to start: {e}")
+        return 0
+
+def write_certificate_archive(attendees, template_path, output_dir):
+    """Writes the certificates of all attendees as one multi-page PDF for printing."""
+    archive_path = os.path.join(output_dir, CERTIFICATE_ARCHIVE_NAME)
+    names = [attendee['isim'] for attendee in attendees if attendee.get('isim') and attendee.get('mobile')]
+    archive_size = CertificatePDFRenderer(template_path).write(names, archive_path)
+    print(f"Wrote {len(names)} certificate pages to '{archive_path}' ({archive_size / 1e6:.1f} MB).")
 
 # --- Copied Certificate Sending Function ---
 
-def send_certificates(attendees, certificate_dir, sender_email, sender_password, smtp_server, smtp_port):
-    """Sends attendance certificates via email to attendees."""
+def filter_unsent_attendees(attendees, delivery_log):
+    """Returns the attendees whose certificate has not been delivered yet."""
+    unsent = [attendee for attendee in attendees if not delivery_log.is_sent(attendee.get('mail'))]
+    if len(unsent) < len(attendees):
+        print(f"Skipping {len(attendees) - len(unsent)} attendees who already received their certificate.")
+    return unsent
+
+CERTIFICATE_SUBJECT = "Your A.I. Summit Erzurum Attendance Certificate"
+
+def send_certificate(session, attendee, certificate_dir, sender_email, delivery_log, file_format=CERTIFICATE_FORMAT):
+    """
+    Emails one attendee their certificate over an open SMTPSession and records the
+    outcome in the delivery log.
+
+    Returns:
+        bool or None: True if sent, False if building or sending the email failed,
+        None if the attendee was skipped (missing data or certificate file).
+    """
+    recipient_email = attendee.get('mail', '').strip()
+    mobile = attendee.get('mobile', '').strip()
+    full_name = attendee.get('isim', 'Participant').strip()
+
+    if not recipient_email or not mobile:
+        print(f"Skipping certificate email for '{full_name}' due to missing email ('{recipient_email}') or mobile ('{mobile}')")
+        delivery_log.log_error(recipient_email or 'N/A', mobile or 'N/A', 'Missing email or mobile')
+        return None
+
+    certificate_filename = f"{mobile}.{file_format}"
+    certificate_file_path = os.path.join(certificate_dir, certificate_filename)
+
+    if not os.path.exists(certificate_file_path):
+        print(f"Warning: Certificate file not found for mobile '{mobile}'. Looked for '{certificate_filename}' in '{certificate_dir}'. Skipping email for '{full_name}'.")
+        delivery_log.log_error(recipient_email, mobile, f'Missing certificate file: {certificate_filename}')
+        return None
+
+    if full_name and full_name != 'Participant':
+         name_parts = full_name.split()
+         if len(name_parts) > 1:
+             last_name = name_parts[-1].upper()
+             first_middle_names = [name.capitalize() for name in name_parts[:-1]]
+             formatted_name_body = " ".join(first_middle_names) + " " + last_name
+         else:
+             formatted_name_body = name_parts[0].capitalize()
+    else:
+         formatted_name_body = 'Participant'
+
+    body = (
+        f"Sevgili {formatted_name_body},\n\n"
+        "A.I. Summit Erzurum etkinliğimize katılımınız için teşekkür ederiz!\n\n"
+        "Katılım belgeniz ekte yer almaktadır.\n\n"
+        "Başka etkinliklerde tekrar görüşmek dileğiyle!\n\n"
+        "Etkinlik detayları ve güncellemeler için bizi Instagram’dan takip etmeyi unutmayın:\n\n"
+        "https://www.instagram.com/atauniaisummiterzurum\n\n"
+        "Saygılarımızla,\n"
+        "ATASOFT Ekibi"
+    )
+    msg = MIMEMultipart()
+    msg['From'] = sender_email
+    msg['To'] = recipient_email
+    msg['Subject'] = CERTIFICATE_SUBJECT
+    msg.attach(MIMEText(body, 'plain', 'utf-8'))
+
+    try:
+        with open(certificate_file_path, 'rb') as attachment:
+            part = MIMEBase('application', 'pdf' if file_format == 'pdf' else 'octet-stream')
+            part.set_payload(attachment.read())
+        encoders.encode_base64(part)
+        attachment_filename = f"AI_Summit_Erzurum_Certificate_{formatted_name_body.replace(' ', '_')}.{file_format}"
+        part.add_header('Content-Disposition', 'attachment', filename=attachment_filename)
+        msg.attach(part)
+    except Exception as attach_e:
+         print(f"Error attaching certificate file '{certificate_file_path}' for {recipient_email}: {attach_e}")
+         delivery_log.log_error(recipient_email, mobile, f'Error attaching certificate: {attach_e}')
+         return False
+
+    try:
+        session.send(recipient_email, msg) # Reconnects and retries if the session drops
+        delivery_log.record_sent(recipient_email, mobile)
+        return True
+    except Exception as e:
+        print(f"Error sending certificate email to {recipient_email}: {type(e).__name__} - {str(e)}")
+        delivery_log.log_error(recipient_email, mobile, f'Sending failed: {e}')
+        return False
+
+def _print_send_summary(sent_count, failed_email_count, session, total):
+    print(f"\nCertificate Email Sending Summary:")
+    print(f" - Successfully sent: {sent_count}")
+    print(f" - Failed attempts: {failed_email_count}")
+    print(f" - SMTP reconnects: {session.reconnects}")
+    print(f" - Total attendees processed: {total}")
+
+def send_certificates(attendees, certificate_dir, sender_email, sender_password, smtp_server, smtp_port, delivery_log=None,
+                      file_format=CERTIFICATE_FORMAT, metrics=None):
+    """
+    Sends attendance certificates via email to attendees.
+
+    Deliveries are recorded in the 'certificate' campaign of the delivery log (see
+    DeliveryLog.py) as they happen, so a rerun after a crash or SMTP failure only
+    queues the attendees who have not received their certificate yet. file_format
+    selects the attached <mobile>.png or <mobile>.pdf files. metrics (a StageMetrics,
+    see RunMetrics.py) receives the time of every attempted delivery.
+    """
+    if delivery_log is None:
+        delivery_log = get_delivery_log(CERTIFICATE_CAMPAIGN)
+    attendees = filter_unsent_attendees(attendees, delivery_log)
     if not attendees:
-        print("No attendees provided to send certificates.")
+        print("No attendees left to send certificates to.")
         return
+    session = SMTPSession(smtp_server, smtp_port, sender_email, sender_password)
     try:
-        server = smtplib.SMTP(smtp_server, smtp_port)
-        server.starttls()
-        server.login(sender_email, sender_password)
+        session.open()
         print("Logged in to the SMTP server successfully for sending certificates.")
     except Exception as e:
         print(f"Error connecting to SMTP server for certificates: {e}")
@@ -131,78 +397,173 @@ def send_certificates(attendees, certificate_dir, sender_email, sender_password,
     failed_email_count = 0
     sent_count = 0
     for attendee in tqdm(attendees, desc="Sending Certificates"):
-        recipient_email = attendee.get('mail', '').strip()
-        mobile = attendee.get('mobile', '').strip()
-        full_name = attendee.get('isim', 'Participant').strip()
-
-        if not recipient_email or not mobile:
-            print(f"Skipping certificate email for '{full_name}' due to missing email ('{recipient_email}') or mobile ('{mobile}')")
-            continue
-
-        certificate_filename = f"{mobile}.png"
-        certificate_file_path = os.path.join(certificate_dir, certificate_filename)
-
-        if not os.path.exists(certificate_file_path):
-            print(f"Warning: Certificate file not found for mobile '{mobile}'. Looked for '{certificate_filename}' in '{certificate_dir}'. Skipping email for '{full_name}'.")
-            continue
-
-        subject = "Your A.I. Summit Erzurum Attendance Certificate"
-        if full_name and full_name != 'Participant':
-             name_parts = full_name.split()
-             if len(name_parts) > 1:
-                 last_name = name_parts[-1].upper()
-                 first_middle_names = [name.capitalize() for name in name_parts[:-1]]
-                 formatted_name_body = " ".join(first_middle_names) + " " + last_name
-             else:
-                 formatted_name_body = name_parts[0].capitalize()
-        else:
-             formatted_name_body = 'Participant'
-
-        body = (
-            f"Sevgili {formatted_name_body},\n\n"
-            "A.I. Summit Erzurum etkinliğimize katılımınız için teşekkür ederiz!\n\n"
-            "Katılım belgeniz ekte yer almaktadır.\n\n"
-            "Başka etkinliklerde tekrar görüşmek dileğiyle!\n\n"
-            "Etkinlik detayları ve güncellemeler için bizi Instagram’dan takip etmeyi unutmayın:\n\n"
-            "https://www.instagram.com/atauniaisummiterzurum\n\n"
-            "Saygılarımızla,\n"
-            "ATASOFT Ekibi"
-        )
-        msg = MIMEMultipart()
-        msg['From'] = sender_email
-        msg['To'] = recipient_email
-        msg['Subject'] = subject
-        msg.attach(MIMEText(body, 'plain', 'utf-8'))
-
-        try:
-            with open(certificate_file_path, 'rb') as attachment:
-                part = MIMEBase('application', 'octet-stream')
-                part.set_payload(attachment.read())
-            encoders.encode_base64(part)
-            attachment_filename = f"AI_Summit_Erzurum_Certificate_{formatted_name_body.replace(' ', '_')}.png"
-            part.add_header('Content-Disposition', 'attachment', filename=attachment_filename)
-            msg.attach(part)
-        except Exception as attach_e:
-             print(f"Error attaching certificate file '{certificate_file_path}' for {recipient_email}: {attach_e}")
-             failed_email_count += 1
-             continue
-
-        try:
-            server.send_message(msg)
+        start = time.perf_counter()
+        result = send_certificate(session, attendee, certificate_dir, sender_email, delivery_log, file_format)
+        if metrics is not None and result is not None:
+            metrics.observe(time.perf_counter() - start)
+        if result:
             sent_count += 1
-        except Exception as e:
-            print(f"Error sending certificate email to {recipient_email}: {type(e).__name__} - {str(e)}")
+        elif result is False:
             failed_email_count += 1
 
-    print(f"\nCertificate Email Sending Summary:")
-    print(f" - Successfully sent: {sent_count}")
-    print(f" - Failed attempts: {failed_email_count}")
-    print(f" - Total attendees processed: {len(attendees)}")
-    server.quit()
+    _print_send_summary(sent_count, failed_email_count, session, len(attendees))
+    session.close()
+    delivery_log.flush()
     print("Finished sending certificate emails.")
 
+# --- Streaming Render-and-Send ---
+
+def _render_ahead(attendees, ready, template_path, output_dir, font_path, font_size, text_color, workers, chunk_size, file_format, force,
+                  render_latency=None):
+    """
+    Producer of stream_certificates: puts (attendee, rendered) on the bounded ready
+    queue for every attendee, then None. Certificates that are still up to date (see
+    RenderManifest.py) go first without rendering; the rest follow in attendee order
+    as they are rendered.
+
+    A full queue blocks the put, and no new chunks are submitted until there is room,
+    so rendering never runs more than the queue plus the chunks in flight ahead of
+    sending. Render times are recorded in render_latency (a LatencyHistogram) if given.
+    """
+    try:
+        with RenderManifest(output_dir, 'certificate') as manifest:
+            keys = certificate_render_keys(attendees, template_path, font_path, font_size, text_color, file_format)
+            unchanged, to_render = split_unchanged_certificates(attendees, keys, manifest, file_format, force)
+            for attendee in unchanged:
+                ready.put((attendee, True))
+
+            def finished(attendee, key, rendered, seconds):
+                if render_latency is not None:
+                    render_latency.record(seconds)
+                if rendered:
+                    manifest.record(f"{attendee.get('mobile')}.{file_format}", key)
+                ready.put((attendee, rendered))
+
+            if file_format == 'pdf' or workers <= 1:
+                if file_format == 'pdf':
+                    pdf_renderer = CertificatePDFRenderer(template_path, font_size, text_color)
+                    render = lambda name, mobile: pdf_renderer.render_certificate(name, mobile, output_dir)
+                else:
+                    render = CertificateRenderer(template_path, output_dir, font_path, font_size, text_color).render
+                for attendee, key in to_render:
+                    start = time.perf_counter()
+                    rendered = render(attendee.get('isim'), attendee.get('mobile'))
+                    finished(attendee, key, rendered, time.perf_counter() - start)
+                return
+            chunks = [to_render[i:i + chunk_size] for i in range(0, len(to_render), chunk_size)]
+            if not chunks:
+                return
+            with ProcessPoolExecutor(max_workers=min(workers, len(chunks)), initializer=_init_certificate_worker,
+                                     initargs=(template_path, output_dir, font_path, font_size, text_color)) as executor:
+                pending = deque()
+                next_chunk = 0
+                while pending or next_chunk < len(chunks):
+                    while next_chunk < len(chunks) and len(pending) < 2 * workers: # Keep every worker busy with one chunk queued
+                        chunk = chunks[next_chunk]
+                        pending.append((chunk, executor.submit(_render_certificate_chunk, [(a.get('isim'), a.get('mobile')) for a, _ in chunk])))
+                        next_chunk += 1
+                    chunk, future = pending.popleft()
+                    for (attendee, key), (rendered, seconds) in zip(chunk, future.result()):
+                        finished(attendee, key, rendered, seconds)
+    except Exception as e:
+        print(f"Error: Certificate rendering stopped: {type(e).__name__} - {e}")
+    finally:
+        ready.put(None)
+
+def stream_certificates(attendees, template_path, output_dir, sender_email, sender_password, smtp_server, smtp_port,
+                        font_path="arial.ttf", font_size=100, text_color=(0, 0, 0), workers=CERTIFICATE_RENDER_WORKERS,
+                        chunk_size=CERTIFICATE_STREAM_CHUNK_SIZE, file_format=CERTIFICATE_FORMAT, delivery_log=None,
+                        queue_size=CERTIFICATE_STREAM_QUEUE_SIZE, force=False, metrics=None):
+    """
+    Renders and sends certificates at the same time.
+
+    A background thread renders the attendees (in worker processes, as in
+    generate_certificates) and hands every finished certificate to this thread
+    through a queue of at most queue_size certificates; this thread emails them over
+    one SMTPSession as they arrive. Rendering and network waits overlap, so the run
+    takes about as long as the slower of the two instead of their sum.
+
+    Deliveries and errors go to the 'certificate' campaign of the delivery log, like
+    send_certificates; attendees who already received their certificate are skipped.
+    Certificates that are still up to date are sent without rendering them again
+    (see generate_certificates).
+
+    metrics (a StageMetrics, see RunMetrics.py) receives the time of every delivery
+    attempt; the render times are added to it as 'render_latency'.
+
+    Returns:
+        tuple: (generated, sent, failed) counts.
+    """
+    if delivery_log is None:
+        delivery_log = get_delivery_log(CERTIFICATE_CAMPAIGN)
+    attendees = filter_unsent_attendees(attendees, delivery_log)
+    if not attendees:
+        print("No attendees left to send certificates to.")
+        return 0, 0, 0
+    session = SMTPSession(smtp_server, smtp_port, sender_email, sender_password)
+    try:
+        session.open()
+        print("Logged in to the SMTP server successfully for sending certificates.")
+    except Exception as e:
+        print(f"Error connecting to SMTP server for certificates: {e}")
+        return 0, 0, 0
+
+    ready = queue.Queue(maxsize=queue_size)
+    render_latency = LatencyHistogram() if metrics is not None else None
+    renderer = threading.Thread(
+        target=_render_ahead, name='certificate-renderer', daemon=True,
+        args=(attendees, ready, template_path, output_dir, font_path, font_size, text_color, workers, chunk_size, file_format, force,
+              render_latency),
+    )
+    renderer.start()
+    generated_count = sent_count = failed_email_count = 0
+    with tqdm(total=len(attendees), desc="Rendering and Sending Certificates") as progress:
+        while True:
+            item = ready.get()
+            if item is None:
+                break
+            attendee, rendered = item
+            progress.update(1)
+            if not rendered:
+                delivery_log.log_error(attendee.get('mail') or 'N/A', attendee.get('mobile') or 'N/A', 'Certificate generation failed')
+                continue
+            generated_count += 1
+            start = time.perf_counter()
+            result = send_certificate(session, attendee, output_dir, sender_email, delivery_log, file_format)
+            if metrics is not None and result is not None:
+                metrics.observe(time.perf_counter() - start)
+            if result:
+                sent_count += 1
+            elif result is False:
+                failed_email_count += 1
+    renderer.join()
+    if metrics is not None:
+        metrics.extra['generated'] = generated_count
+        metrics.extra['render_latency'] = render_latency.to_dict()
+
+    print(f" - Certificates generated: {generated_count}")
+    _print_send_summary(sent_count, failed_email_count, session, len(attendees))
+    session.close()
+    delivery_log.flush()
+    print("Finished streaming certificate emails.")
+    return generated_count, sent_count, failed_email_count
+
 # --- Main Execution Block ---
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate attendance certificates and send them via email.")
+    parser.add_argument("--offline", action="store_true", help="Read attendees from the local snapshot only, without contacting Firebase")
+    parser.add_argument("--full-refresh", action="store_true", help="Re-read the whole collection into the snapshot")
+    parser.add_argument("--backend", choices=BACKENDS, default=PARTICIPANT_STORE, help=f"Participant store backend (default: {PARTICIPANT_STORE})")
+    parser.add_argument("--workers", type=int, default=CERTIFICATE_RENDER_WORKERS, help=f"Processes rendering certificates (default: {CERTIFICATE_RENDER_WORKERS})")
+    parser.add_argument("--format", choices=['png', 'pdf'], default=CERTIFICATE_FORMAT, help=f"Certificate file format (default: {CERTIFICATE_FORMAT})")
+    parser.add_argument("--archive", action="store_true", help=f"Also write the certificates of all attendees, including those already sent, as one multi-page PDF ({CERTIFICATE_ARCHIVE_NAME}) for printing")
+    parser.add_argument("--stream", action="store_true", help="Send every certificate as soon as it is rendered instead of generating all of them first")
+    parser.add_argument("--yes", action="store_true", help="Send without asking for confirmation (non-interactive runs)")
+    parser.add_argument("--force-render", action="store_true", help="Render every certificate again, even if its inputs have not changed")
+    parser.add_argument("--profile", action="store_true", help="Also capture cProfile statistics for every stage (written next to the run report)")
+    args = parser.parse_args()
+    metrics = RunMetrics('certificates', profile=args.profile)
+
     print("--- Starting Certificate Generation and Sending Process ---")
     load_dotenv()
 
@@ -238,48 +599,89 @@ if __name__ == "__main__":
     # --- Create Output Directory ---
     create_directory_if_not_exists(CERTIFICATES_OUTPUT_DIR)
 
-    # --- Initialize Firebase ---
-    db_client = initialize_firebase()
-    if not db_client:
-        sys.exit(1) # Exit if Firebase initialization failed
-
-    # --- Fetch Attendees ---
-    attendees = get_attendees_from_firebase(db_client)
+    if args.backend != 'firestore':
+        # --- Fetch Attendees from a local backend ---
+        store = get_store(args.backend)
+        attendees = get_attendees_from_store(store)
+        store.close()
+    else:
+        # --- Refresh Local Snapshot ---
+        if not args.offline:
+            db_client = initialize_firebase()
+            if not db_client:
+                sys.exit(1) # Exit if Firebase initialization failed
+            if refresh_snapshot(db_client, full=args.full_refresh) is None:
+                print("Error: Could not refresh the attendee snapshot. Run with --offline to use the existing (possibly stale) snapshot.")
+                sys.exit(1)
+
+        # --- Fetch Attendees ---
+        attendees = get_attendees_from_snapshot()
+
+    # Attendees who already received their certificate are skipped by send_certificates and
+    # stream_certificates (resumes an interrupted run); unchanged certificates are not rendered again.
+    all_attendees = attendees # The archive covers every attendee, including those already sent
+
+    # --- Generate and Send Certificates Together ---
+    if attendees and args.stream:
+        send_choice = 'yes' if args.yes else input(f"Generate and send certificates to the attendees who have not received one yet ({len(attendees)} attendees in total)? (yes/no): ").strip().lower()
+        if send_choice == 'yes':
+            print("\nStreaming certificates...")
+            with metrics.stage('stream_certificates') as stage:
+                stream_certificates(
+                    attendees, TEMPLATE_IMAGE_PATH, CERTIFICATES_OUTPUT_DIR, SENDER_EMAIL,
+                    SENDER_PASSWORD, SMTP_SERVER, SMTP_PORT,
+                    font_path=FONT_FILE, workers=args.workers, file_format=args.format, force=args.force_render,
+                    metrics=stage
+                )
+        else:
+            print("Certificate generation and sending skipped by user.")
+        attendees = [] # Already handled; skip the two-phase flow below
 
     # --- Generate Certificates ---
     if attendees:
         print(f"\nGenerating {len(attendees)} certificates...")
-        generated_count = 0
-        for attendee in tqdm(attendees, desc="Generating Certificates"):
-            success = generate_certificate(
-                name=attendee['isim'],
-                mobile=attendee['mobile'],
+        with metrics.stage('generate_certificates') as stage:
+            generated_count = generate_certificates(
+                attendees,
                 template_path=TEMPLATE_IMAGE_PATH,
                 output_dir=CERTIFICATES_OUTPUT_DIR,
-                font_path=FONT_FILE
+                font_path=FONT_FILE,
+                workers=args.workers,
+                file_format=args.format,
+                force=args.force_render,
+                metrics=stage
                 # font_size and text_color use defaults from function definition
             )
-            if success:
-                generated_count += 1
         print(f"Finished generating certificates. {generated_count} successfully created.")
 
         # --- Ask before Sending Certificates ---
         if generated_count > 0:
-            send_choice = input(f"Successfully generated {generated_count} certificates. Do you want to send them via email? (yes/no): ").strip().lower()
+            if args.yes:
+                send_choice = 'yes'
+            else:
+                send_choice = input(f"Successfully generated {generated_count} certificates. Do you want to send them via email? (yes/no): ").strip().lower()
             if send_choice == 'yes':
                 print("\n--- Starting Certificate Email Sending Process ---")
-                send_certificates(
-                    attendees, CERTIFICATES_OUTPUT_DIR, SENDER_EMAIL,
-                    SENDER_PASSWORD, SMTP_SERVER, SMTP_PORT
-                )
+                with metrics.stage('send_certificates') as stage:
+                    send_certificates(
+                        attendees, CERTIFICATES_OUTPUT_DIR, SENDER_EMAIL,
+                        SENDER_PASSWORD, SMTP_SERVER, SMTP_PORT,
+                        file_format=args.format, metrics=stage
+                    )
                 # Message "Finished sending certificate emails." is printed inside send_certificates
             else:
                 print("Email sending skipped by user.")
         else:
             print("No certificates were generated, skipping email sending step.")
     else:
-        # Message already printed by get_attendees_from_firebase if no attendees found
+        # Message already printed by get_attendees_from_snapshot if no attendees found
         pass
 
+    # --- Write the Printable Archive ---
+    if args.archive and all_attendees:
+        write_certificate_archive(all_attendees, TEMPLATE_IMAGE_PATH, CERTIFICATES_OUTPUT_DIR)
+
+    if metrics.stages:
+        metrics.write()
     print("\n--- Certificate Generation and Sending Process Finished ---")
 
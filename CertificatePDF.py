@@ -0,0 +1,154 @@
+import io
+import os
+import sys
+import argparse
+from PIL import Image
+
+# --- Configuration ---
+CERTIFICATE_PDF_DPI = 300 # Template pixels per inch on the PDF page
+CERTIFICATE_ARCHIVE_NAME = 'certificates_archive.pdf'
+NAME_Y_RATIO = 0.45 # Top of the name, as a fraction of the template height (same as the PNG certificates)
+
+# --- Font ---
+# Names use the standard Helvetica font, which every PDF viewer provides (metrics match
+# Arial). Text is encoded as Windows-1254 (Turkish): WinAnsi plus the six Turkish
+# letters below, mapped to their glyph names through /Differences.
+TEXT_ENCODING = 'cp1254'
+TURKISH_DIFFERENCES = '[208 /Gbreve 221 /Idotaccent 222 /Scedilla 240 /gbreve 253 /dotlessi 254 /scedilla]'
+HELVETICA_ASCENT = 718 # 1/1000 em
+HELVETICA_DEFAULT_WIDTH = 556
+# Glyph widths in 1/1000 em from the Helvetica AFM
+HELVETICA_WIDTHS = dict(zip(
+    " !\"#$%&'()*+,-./0123456789:;<=>?@ABCDEFGHIJKLMNOPQRSTUVWXYZ[\\]^_`abcdefghijklmnopqrstuvwxyz{|}~",
+    [278, 278, 355, 556, 556, 889, 667, 191, 333, 333, 389, 584, 278, 333, 278, 278,
+     556, 556, 556, 556, 556, 556, 556, 556, 556, 556, 278, 278, 584, 584, 584, 556,
+     1015, 667, 667, 722, 722, 667, 611, 778, 722, 278, 500, 667, 556, 833, 722, 778,
+     667, 778, 722, 667, 611, 722, 667, 944, 667, 667, 611, 278, 278, 278, 469, 556,
+     333, 556, 556, 500, 556, 556, 278, 556, 556, 222, 222, 500, 222, 833, 556, 556,
+     556, 556, 333, 500, 278, 556, 500, 722, 500, 500, 500, 334, 260, 334, 584]
+))
+HELVETICA_WIDTHS.update({
+    'Ç': 722, 'ç': 500, 'Ö': 778, 'ö': 556, 'Ü': 722, 'ü': 556, 'Ğ': 778, 'ğ': 556,
+    'İ': 278, 'ı': 278, 'Ş': 667, 'ş': 500, 'Â': 667, 'â': 556, 'Î': 278, 'î': 278, 'Û': 722, 'û': 556,
+})
+
+def _pdf_string(text):
+    """Encodes text as a PDF literal string in the certificate font encoding."""
+    data = text.encode(TEXT_ENCODING, errors='replace')
+    return b'(' + data.replace(b'\\', b'\\\\').replace(b'(', b'\\(').replace(b')', b'\\)') + b')'
+
+def _text_width(text, font_size):
+    return sum(HELVETICA_WIDTHS.get(char, HELVETICA_DEFAULT_WIDTH) for char in text) * font_size / 1000.0
+
+def format_certificate_name(name):
+    return ' '.join(part.capitalize() for part in str(name).split())
+
+class CertificatePDFRenderer:
+    """
+    Writes certificates as PDF: the template as a full-page image with the name drawn as
+    vector text on top.
+
+    The template is read once and kept as its JPEG bytes (non-JPEG templates are
+    converted once). JPEG data is embedded as is (DCTDecode), so nothing is decoded or
+    re-encoded per certificate. A multi-page archive embeds the image a single time and
+    every page refers to it. Text placement matches the PNG certificates of
+    CertificateGeneratorSender.CertificateRenderer.
+    """
+
+    def __init__(self, template_path, font_size=100, text_color=(0, 0, 0), dpi=CERTIFICATE_PDF_DPI):
+        with Image.open(template_path) as template:
+            self.pixel_width, self.pixel_height = template.size
+            if template.format == 'JPEG' and template.mode in ('RGB', 'L'):
+                color_space = 'DeviceRGB' if template.mode == 'RGB' else 'DeviceGray'
+                with open(template_path, 'rb') as f:
+                    jpeg_data = f.read()
+            else:
+                buffer = io.BytesIO()
+                template.convert('RGB').save(buffer, 'JPEG', quality=92)
+                color_space, jpeg_data = 'DeviceRGB', buffer.getvalue()
+        scale = 72.0 / dpi # PDF points per template pixel
+        self.page_width = self.pixel_width * scale
+        self.page_height = self.pixel_height * scale
+        self.font_size = font_size * scale
+        self._color = ' '.join(f"{component / 255:.3f}" for component in text_color)
+        self._image_object = (
+            f"<< /Type /XObject /Subtype /Image /Width {self.pixel_width} /Height {self.pixel_height}"
+            f" /ColorSpace /{color_space} /BitsPerComponent 8 /Filter /DCTDecode /Length {len(jpeg_data)} >>\nstream\n"
+        ).encode('ascii') + jpeg_data + b'\nendstream'
+        self._font_object = (
+            "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica"
+            f" /Encoding << /Type /Encoding /BaseEncoding /WinAnsiEncoding /Differences {TURKISH_DIFFERENCES} >> >>"
+        ).encode('ascii')
+
+    def _page_content(self, name):
+        text = format_certificate_name(name)
+        x = (self.page_width - _text_width(text, self.font_size)) / 2
+        # PDF y grows upwards and text is placed by its baseline; PIL placed the top of the text
+        y = self.page_height * (1 - NAME_Y_RATIO) - self.font_size * HELVETICA_ASCENT / 1000.0
+        content = (
+            f"q {self.page_width:.2f} 0 0 {self.page_height:.2f} 0 0 cm /Template Do Q\n"
+            f"BT /Name {self.font_size:.2f} Tf {self._color} rg {x:.2f} {y:.2f} Td "
+        ).encode('ascii') + _pdf_string(text) + b" Tj ET"
+        return b"<< /Length %d >>\nstream\n" % len(content) + content + b"\nendstream"
+
+    def render(self, names):
+        """Returns a PDF with one certificate page per name."""
+        # Objects: 1 catalog, 2 page tree, 3 font, 4 template image, then a page and its content per name
+        page_ids = [5 + 2 * i for i in range(len(names))]
+        objects = [
+            b"<< /Type /Catalog /Pages 2 0 R >>",
+            b"<< /Type /Pages /Kids [" + b" ".join(b"%d 0 R" % page_id for page_id in page_ids) + b"] /Count %d >>" % len(names),
+            self._font_object,
+            self._image_object,
+        ]
+        media_box = f"[0 0 {self.page_width:.2f} {self.page_height:.2f}]".encode('ascii')
+        for page_id, name in zip(page_ids, names):
+            objects.append(
+                b"<< /Type /Page /Parent 2 0 R /MediaBox " + media_box +
+                b" /Resources << /Font << /Name 3 0 R >> /XObject << /Template 4 0 R >> >> /Contents %d 0 R >>" % (page_id + 1)
+            )
+            objects.append(self._page_content(name))
+
+        out = bytearray(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+        offsets = []
+        for object_id, body in enumerate(objects, start=1):
+            offsets.append(len(out))
+            out += b"%d 0 obj\n" % object_id + body + b"\nendobj\n"
+        xref_offset = len(out)
+        out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+        out += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+        out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref_offset)
+        return bytes(out)
+
+    def write(self, names, output_path):
+        """Writes render(names) to output_path."""
+        data = self.render(names)
+        with open(output_path, 'wb') as f:
+            f.write(data)
+        return len(data)
+
+    def render_certificate(self, name, mobile, output_dir):
+        """Writes <output_dir>/<mobile>.pdf. Returns True on success."""
+        if not name or not mobile:
+            print(f"Warning: Skipping certificate generation due to missing name ('{name}') or mobile ('{mobile}')")
+            return False
+        try:
+            self.write([name], os.path.join(output_dir, f"{mobile}.pdf"))
+            return True
+        except Exception as e:
+            print(f"Error generating certificate for {name} ({mobile}): {e}")
+            return False
+
+# --- Main Execution ---
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Write PDF certificates for a list of names.")
+    parser.add_argument("template", help="Certificate template image (e.g. tasarim.jpg)")
+    parser.add_argument("output", help="Output PDF path")
+    parser.add_argument("names", nargs='+', help="One page is written per name")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.template):
+        print(f"Error: Template image '{args.template}' not found.")
+        sys.exit(1)
+    size = CertificatePDFRenderer(args.template).write(args.names, args.output)
+    print(f"Wrote {len(args.names)} certificate pages to '{args.output}' ({size} bytes).")
@@ -0,0 +1,276 @@
+import os
+import sys
+import hmac
+import json
+import time
+import uuid
+import argparse
+import ipaddress
+import threading
+from datetime import datetime
+from urllib.parse import urlparse, parse_qs
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from CommitController import CommitController
+from ParticipantStore import (
+    BACKENDS, PARTICIPANT_STORE, FIELD_NAME, FIELD_EMAIL, FIELD_MOBILE, FIELD_COUNTER, MAX_BATCH_SIZE, get_store
+)
+
+# --- Configuration ---
+DEFAULT_HOST = '127.0.0.1'
+# Shared secret scanners send in the X-Checkin-Token header; required when listening beyond loopback
+CHECKIN_TOKEN = os.getenv('CHECKIN_TOKEN', '')
+DEFAULT_PORT = 8765
+FLUSH_INTERVAL_SECONDS = 1.0 # How often pending Counter increments are written to the store
+
+class CheckinService:
+    """
+    In-memory check-in index for the venue gate.
+
+    The whole participant table is loaded once into a dict keyed by UUID (the QR code
+    payload), so validate and check-in are a single hash lookup with no network round trip.
+    Check-ins bump the local Counter immediately and accumulate per-UUID deltas; a
+    background thread flushes the coalesced deltas to the store as Increment batches
+    through a CommitController. Because only deltas are written, several gates can run
+    their own service against the same collection; each gate's local Counter only
+    includes its own scans since startup.
+
+    Every Increment batch gets a write ID that the store applies at most once (see
+    ParticipantStore.increment_counters). A batch that fails, possibly after the
+    store applied it (timeout, dropped connection), is kept as is with its ID and
+    committed again on the next flush, so retries never count a check-in twice.
+    """
+
+    def __init__(self, store, flush_interval=FLUSH_INTERVAL_SECONDS):
+        self.store = store
+        self.flush_interval = flush_interval
+        self.participants = {} # UUID -> {'name', 'email', 'mobile', 'counter'}
+        self.pending = {} # UUID -> Counter delta not yet written to the store
+        self.unconfirmed = [] # (write ID, records) batches that failed; retried as is
+        self.stats = {'validations': 0, 'checkins': 0, 'unknown': 0, 'flushed': 0, 'flush_failures': 0}
+        self.controller = CommitController(max_batch_size=MAX_BATCH_SIZE - 1) # One write per batch is the write ID marker
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock() # Serializes flushes (background thread and stop())
+        self._stop_event = threading.Event()
+        self._flusher = None
+
+    def load(self):
+        """Loads every participant from the store into the in-memory index."""
+        start_time = time.monotonic()
+        participants = {}
+        for doc_id, data in self.store.list_all():
+            try:
+                counter = int(data.get(FIELD_COUNTER) or 0)
+            except (ValueError, TypeError):
+                counter = 0
+            participants[doc_id] = {
+                'name': data.get(FIELD_NAME),
+                'email': data.get(FIELD_EMAIL),
+                'mobile': data.get(FIELD_MOBILE),
+                'counter': counter,
+            }
+        with self._lock:
+            self.participants = participants
+        print(f"Loaded {len(participants)} participants from the {self.store.name} store in {time.monotonic() - start_time:.1f}s.")
+        return len(participants)
+
+    def validate(self, uuid_value):
+        """Returns a copy of the participant for a UUID, or None if it is unknown."""
+        with self._lock:
+            self.stats['validations'] += 1
+            participant = self.participants.get(uuid_value)
+            if participant is None:
+                self.stats['unknown'] += 1
+                return None
+            return dict(participant)
+
+    def checkin(self, uuid_value):
+        """Increments Counter for a UUID. Returns the updated participant, or None if it is unknown."""
+        with self._lock:
+            participant = self.participants.get(uuid_value)
+            if participant is None:
+                self.stats['unknown'] += 1
+                return None
+            participant['counter'] += 1
+            self.pending[uuid_value] = self.pending.get(uuid_value, 0) + 1
+            self.stats['checkins'] += 1
+            return dict(participant)
+
+    # --- Background flush ---
+
+    def flush(self):
+        """Writes all pending Counter deltas to the store. Failed batches are kept for the next flush."""
+        with self._flush_lock:
+            with self._lock:
+                if not self.pending and not self.unconfirmed:
+                    return 0
+                deltas, self.pending = list(self.pending.items()), {}
+                batches, self.unconfirmed = self.unconfirmed, []
+            batch_size = self.controller.batch_size
+            batches += [(str(uuid.uuid4()), deltas[i:i + batch_size]) for i in range(0, len(deltas), batch_size)]
+            flushed = 0
+            commit = lambda records, write_id: self.store.increment_counters(records, write_id=write_id)
+            for write_id, batch, error in self.controller.commit_batches(batches, commit):
+                if error is None:
+                    flushed += len(batch)
+                    continue
+                print(f"Error flushing {len(batch)} check-ins: {error}. Will retry on the next flush.")
+                with self._lock:
+                    self.stats['flush_failures'] += 1
+                    self.unconfirmed.append((write_id, batch))
+            with self._lock:
+                self.stats['flushed'] += flushed
+            return flushed
+
+    def _unflushed(self):
+        """Check-ins not yet written to the store. Caller holds the lock."""
+        return sum(self.pending.values()) + sum(delta for _, batch in self.unconfirmed for _, delta in batch)
+
+    def _flush_loop(self):
+        while not self._stop_event.wait(self.flush_interval):
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"Error in check-in flush loop: {e}")
+
+    def start(self):
+        """Starts the background flush thread."""
+        self._flusher = threading.Thread(target=self._flush_loop, daemon=True)
+        self._flusher.start()
+
+    def stop(self):
+        """Stops the flush thread and writes the remaining deltas."""
+        self._stop_event.set()
+        if self._flusher:
+            self._flusher.join()
+            self._flusher = None
+        self.flush()
+        with self._lock:
+            remaining = self._unflushed()
+        if remaining:
+            print(f"Warning: {remaining} check-ins could not be written to the store.")
+
+    def status(self):
+        with self._lock:
+            status = dict(self.stats)
+            status['participants'] = len(self.participants)
+            status['pending'] = self._unflushed()
+        return status
+
+# --- HTTP API ---
+
+class CheckinRequestHandler(BaseHTTPRequestHandler):
+    """
+    GET  /validate?uuid=<uuid>  -> participant without changing Counter
+    POST /checkin?uuid=<uuid>   -> increments Counter and returns the participant
+    GET  /status                -> service counters
+
+    Unknown UUIDs return 404. With a token, every request must carry it in the
+    X-Checkin-Token header, otherwise it gets 401. Connections are kept alive so
+    scanners avoid a TCP handshake per scan.
+    """
+    protocol_version = 'HTTP/1.1'
+    # Send headers and body in one segment without Nagle delays; the response is flushed after each request
+    wbufsize = -1
+    disable_nagle_algorithm = True
+    service = None # Set by serve()
+    token = '' # Set by serve()
+
+    def _send_json(self, status_code, payload):
+        body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        self.send_response(status_code)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _handle(self, action):
+        if self.token and not hmac.compare_digest(self.headers.get('X-Checkin-Token', '').encode(), self.token.encode()):
+            self._send_json(401, {'error': 'invalid or missing X-Checkin-Token'})
+            return
+        url = urlparse(self.path)
+        if url.path == '/status' and action == 'validate':
+            self._send_json(200, self.service.status())
+            return
+        if url.path != f'/{action}':
+            self._send_json(404, {'error': 'not found'})
+            return
+        uuid_value = parse_qs(url.query).get('uuid', [''])[0].strip()
+        if not uuid_value:
+            self._send_json(400, {'error': 'missing uuid'})
+            return
+        if action == 'checkin':
+            participant = self.service.checkin(uuid_value)
+        else:
+            participant = self.service.validate(uuid_value)
+        if participant is None:
+            self._send_json(404, {'uuid': uuid_value, 'valid': False})
+        else:
+            self._send_json(200, {'uuid': uuid_value, 'valid': True, **participant})
+
+    def do_GET(self):
+        self._handle('validate')
+
+    def do_POST(self):
+        # Drain any request body so the kept-alive connection stays in sync
+        length = int(self.headers.get('Content-Length') or 0)
+        if length:
+            self.rfile.read(length)
+        self._handle('checkin')
+
+    def log_message(self, format, *args):
+        pass # Per-request logging would dominate the response time
+
+def is_loopback(host):
+    """True if host only accepts connections from this machine."""
+    if host == 'localhost':
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
+
+def serve(service, host=DEFAULT_HOST, port=DEFAULT_PORT, token=CHECKIN_TOKEN):
+    """
+    Creates the HTTP server for a service. Call serve_forever() on the result.
+
+    The API exposes names, emails and phone numbers and changes Counter, so a host other
+    than loopback requires a token (raises ValueError without one).
+    """
+    if not token and not is_loopback(host):
+        raise ValueError(f"Listening on {host} requires a shared token (set CHECKIN_TOKEN).")
+    handler = type('BoundCheckinRequestHandler', (CheckinRequestHandler,), {'service': service, 'token': token})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+# --- Main Execution ---
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve low-latency check-in validation from an in-memory participant index.")
+    parser.add_argument("--host", default=DEFAULT_HOST, help=f"Address to listen on (default: {DEFAULT_HOST}); other addresses require CHECKIN_TOKEN")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help=f"Port to listen on (default: {DEFAULT_PORT})")
+    parser.add_argument("--flush-interval", type=float, default=FLUSH_INTERVAL_SECONDS, help=f"Seconds between Counter flushes (default: {FLUSH_INTERVAL_SECONDS})")
+    parser.add_argument("--backend", choices=BACKENDS, default=PARTICIPANT_STORE, help=f"Participant store backend (default: {PARTICIPANT_STORE})")
+    args = parser.parse_args()
+
+    print("--- Starting Check-in Service ---")
+    if not CHECKIN_TOKEN and not is_loopback(args.host):
+        print(f"Error: Listening on {args.host} exposes participant data to the network. Set CHECKIN_TOKEN to a shared secret for the scanners.")
+        sys.exit(1)
+    store = get_store(args.backend)
+    service = CheckinService(store, flush_interval=args.flush_interval)
+    service.load()
+    service.start()
+    server = serve(service, args.host, args.port)
+    print(f"Listening on http://{args.host}:{args.port} (GET /validate?uuid=..., POST /checkin?uuid=..., GET /status). Press Ctrl+C to stop.")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\nStopping check-in service...")
+    finally:
+        server.server_close()
+        service.stop()
+        store.close()
+    status = service.status()
+    print(f"[{datetime.now().strftime('%H:%M:%S')}] Check-ins: {status['checkins']}, written to the store: {status['flushed']} "
+          f"documents, pending: {status['pending']}, unknown scans: {status['unknown']}")
+    print("--- Check-in Service Stopped ---")
@@ -0,0 +1,228 @@
+import os
+import json
+import time
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from google.api_core import exceptions as api_exceptions
+from ParticipantStore import MAX_BATCH_SIZE
+from RunMetrics import LatencyHistogram
+
+# --- Configuration ---
+INITIAL_BATCH_SIZE = 499
+MIN_BATCH_SIZE = 25
+BATCH_SIZE_STEP = 50 # Additive increase after a fast commit
+INITIAL_CONCURRENCY = 2
+MAX_CONCURRENCY = 8
+GROW_CONCURRENCY_AFTER = 5 # Consecutive fast commits before adding a concurrent commit
+TARGET_LATENCY_SECONDS = 1.5 # Commits slower than this shrink the batch size
+MAX_RETRIES = 5
+BASE_BACKOFF_SECONDS = 0.5
+MAX_BACKOFF_SECONDS = 30.0
+
+# Quota pressure and contention: back off and cut batch size and concurrency
+THROTTLE_ERRORS = (
+    api_exceptions.TooManyRequests,   # 429, includes ResourceExhausted
+    api_exceptions.Aborted,           # 409, contention on the same documents
+    api_exceptions.DeadlineExceeded,  # 504
+)
+# Transient server errors: back off and retry without changing the batch shape
+RETRYABLE_ERRORS = THROTTLE_ERRORS + (
+    api_exceptions.ServiceUnavailable,   # 503
+    api_exceptions.InternalServerError,  # 500
+)
+
+# Upper bucket bounds in seconds; the last bucket collects everything slower
+LATENCY_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+class CommitController:
+    """
+    Commits record batches with retries and adaptive batch size and concurrency.
+
+    Retryable errors (see RETRYABLE_ERRORS) are retried with full-jitter exponential
+    backoff. Batch size and the number of concurrent commits follow an AIMD policy:
+    fast commits grow them additively, slow commits shrink the batch size, and
+    throttling errors (quota exhausted, contention, deadline) halve both. Every commit
+    attempt's latency is recorded in a histogram.
+    """
+
+    def __init__(self, batch_size=INITIAL_BATCH_SIZE, concurrency=INITIAL_CONCURRENCY,
+                 min_batch_size=MIN_BATCH_SIZE, max_batch_size=MAX_BATCH_SIZE, max_concurrency=MAX_CONCURRENCY,
+                 target_latency=TARGET_LATENCY_SECONDS, max_retries=MAX_RETRIES):
+        self.min_batch_size = min_batch_size
+        self.max_batch_size = max_batch_size
+        if max_concurrency < 1:
+            print(f"Warning: max_concurrency must be at least 1 (got {max_concurrency}). Using 1.")
+        self.max_concurrency = max(1, max_concurrency)
+        self.batch_size = max(min_batch_size, min(batch_size, max_batch_size))
+        self.concurrency = max(1, min(concurrency, self.max_concurrency))
+        self.target_latency = target_latency
+        self.max_retries = max_retries
+        self.latency = LatencyHistogram(LATENCY_BUCKETS) # Successful commits
+        self.failed_latency = LatencyHistogram(LATENCY_BUCKETS) # Failed attempts, including retried ones
+        self.retries = 0
+        self.throttled = 0
+        self.peak_concurrency = self.concurrency
+        self._fast_streak = 0
+        self._lock = threading.Lock()
+
+    # --- Adaptation ---
+
+    def _on_success(self, latency):
+        with self._lock:
+            self.latency.record(latency)
+            if latency > self.target_latency:
+                self.batch_size = max(self.min_batch_size, int(self.batch_size * 0.75))
+                self._fast_streak = 0
+                return
+            self.batch_size = min(self.max_batch_size, self.batch_size + BATCH_SIZE_STEP)
+            self._fast_streak += 1
+            if self._fast_streak >= GROW_CONCURRENCY_AFTER:
+                self.concurrency = min(self.max_concurrency, self.concurrency + 1)
+                self.peak_concurrency = max(self.peak_concurrency, self.concurrency)
+                self._fast_streak = 0
+
+    def _on_error(self, latency, error):
+        with self._lock:
+            self.failed_latency.record(latency)
+            self._fast_streak = 0
+            if isinstance(error, THROTTLE_ERRORS):
+                self.throttled += 1
+                self.batch_size = max(self.min_batch_size, self.batch_size // 2)
+                self.concurrency = max(1, self.concurrency // 2)
+
+    @staticmethod
+    def backoff_delay(attempt):
+        """Full-jitter exponential backoff for the given retry attempt (0-based)."""
+        return random.uniform(0, min(MAX_BACKOFF_SECONDS, BASE_BACKOFF_SECONDS * (2 ** attempt)))
+
+    # --- Committing ---
+
+    def commit(self, commit_func, records):
+        """
+        Calls commit_func(records), retrying retryable errors with backoff.
+
+        Returns:
+            float: Latency of the successful attempt in seconds.
+
+        Raises:
+            The last error if it is not retryable or retries are exhausted.
+        """
+        attempt = 0
+        while True:
+            start = time.monotonic()
+            try:
+                commit_func(records)
+            except Exception as e:
+                latency = time.monotonic() - start
+                self._on_error(latency, e)
+                if not isinstance(e, RETRYABLE_ERRORS) or attempt >= self.max_retries:
+                    raise
+                delay = self.backoff_delay(attempt)
+                with self._lock:
+                    self.retries += 1
+                print(f"Commit of {len(records)} documents failed ({type(e).__name__}: {e}). "
+                      f"Retrying in {delay:.1f}s (attempt {attempt + 2}/{self.max_retries + 1})...")
+                time.sleep(delay)
+                attempt += 1
+                continue
+            latency = time.monotonic() - start
+            self._on_success(latency)
+            return latency
+
+    def commit_all(self, records, commit_func):
+        """
+        Commits records in adaptively sized batches on a bounded pool of threads.
+
+        Batches are cut from the remaining records using the batch size current at
+        submission time, and no more than the current concurrency are in flight.
+
+        Yields:
+            tuple: (batch, error) for every finished batch in completion order; error is
+                None if the batch was committed.
+        """
+        position = 0
+        in_flight = {}
+        with ThreadPoolExecutor(max_workers=self.max_concurrency) as executor:
+            while position < len(records) or in_flight:
+                while position < len(records) and len(in_flight) < self.concurrency:
+                    batch = records[position:position + self.batch_size]
+                    position += len(batch)
+                    in_flight[executor.submit(self.commit, commit_func, batch)] = batch
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    batch = in_flight.pop(future)
+                    error = future.exception()
+                    yield batch, error
+
+    def commit_batches(self, batches, commit_func):
+        """
+        Commits pre-cut batches as they are, with no more than the current concurrency
+        in flight.
+
+        For writes that are only safe to retry with the same batch, like Counter
+        increments keyed by a write ID (see ParticipantStore.increment_counters): a
+        batch is never re-cut, so the caller can keep a failed batch with its key and
+        commit it again later.
+
+        Args:
+            batches (list): (key, records) pairs.
+            commit_func (callable): commit_func(records, key), retried like commit().
+
+        Yields:
+            tuple: (key, records, error) for every finished batch in completion order;
+                error is None if the batch was committed.
+        """
+        pending = list(batches)
+        in_flight = {}
+        with ThreadPoolExecutor(max_workers=self.max_concurrency) as executor:
+            while pending or in_flight:
+                while pending and len(in_flight) < self.concurrency:
+                    key, records = pending.pop(0)
+                    future = executor.submit(self.commit, lambda records, key=key: commit_func(records, key), records)
+                    in_flight[future] = (key, records)
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    key, records = in_flight.pop(future)
+                    yield key, records, future.exception()
+
+    # --- Reporting ---
+
+    def stats(self):
+        with self._lock:
+            return {
+                'final_batch_size': self.batch_size,
+                'final_concurrency': self.concurrency,
+                'peak_concurrency': self.peak_concurrency,
+                'retries': self.retries,
+                'throttled': self.throttled,
+                'commit_latency': self.latency.to_dict(),
+                'failed_attempt_latency': self.failed_latency.to_dict(),
+            }
+
+    def print_summary(self):
+        print(f"Commit latency: {self.latency.format()}")
+        if self.failed_latency.count:
+            print(f"Failed attempts: {self.failed_latency.format()} ({self.retries} retries, {self.throttled} throttled)")
+        print(f"Final batch size: {self.batch_size}, concurrency: {self.concurrency} (peak {self.peak_concurrency})")
+
+    def save_stats(self, stats_path):
+        """Appends this run's statistics to a JSON file so throughput can be tuned across runs."""
+        stats_dir = os.path.dirname(stats_path)
+        if stats_dir and not os.path.exists(stats_dir):
+            os.makedirs(stats_dir)
+        runs = []
+        if os.path.exists(stats_path):
+            try:
+                with open(stats_path, 'r', encoding='utf-8') as f:
+                    runs = json.load(f)
+            except (IOError, ValueError):
+                runs = []
+        entry = self.stats()
+        entry['finished_at'] = time.strftime('%Y-%m-%d %H:%M:%S')
+        runs.append(entry)
+        try:
+            with open(stats_path, 'w', encoding='utf-8') as f:
+                json.dump(runs, f, indent=2)
+        except IOError as e:
+            print(f"Warning: Could not write commit statistics '{stats_path}': {e}")
@@ -6,12 +6,16 @@ import re
 import openpyxl
 from openpyxl import Workbook
 from openpyxl.drawing.image import Image as OpenpyxlImage
-import subprocess # Added for running the sync script
-import sys # Added for getting python executable path
+import sys
+import argparse
+from functools import partial
 from FileOperations import create_directory_if_not_exists, clean_phone_number # Import clean_phone_number
-from QRDesign import overlay_qr_on_template # Removed generate_certificate
+from QRDesign import overlay_qr_on_template, resolve_font_path, DESIGN_FONT_PATH # Removed generate_certificate
 from MailSender import send_qr_codes # Removed send_certificates
-# Removed FirebaseSync imports related to fetching attendees
+from FirebaseSync import initialize_firebase_sync, sync_dataframe_to_firestore
+from TicketIndex import write_ticket_index, TICKET_INDEX_DIR
+from Pipeline import Pipeline, Stage, STAGE_FAILED
+from RunMetrics import RunMetrics, current_stage, timed_items
 from dotenv import load_dotenv
 # Removed tqdm import if only used for certificates
 
@@ -27,7 +31,7 @@ COUNTER_COLUMN_NAME = os.getenv('COUNTER_COLUMN_NAME')
 CSV_OUTPUT_DIR = os.getenv('CSV_OUTPUT_DIR')
 QR_OUTPUT_DIR = os.getenv('QR_OUTPUT_DIR')
 # EXCEL_OUTPUT_PATH = os.getenv('EXCEL_OUTPUT_PATH') # Removed: Path will be generated dynamically
-FIREBASE_SYNC_SCRIPT = os.getenv('FIREBASE_SYNC_SCRIPT')
+# FIREBASE_SYNC_SCRIPT = os.getenv('FIREBASE_SYNC_SCRIPT') # Removed: Sync now runs in-process via FirebaseSync
 
 # Email configuration
 SENDER_EMAIL = os.getenv('SENDER_EMAIL')
@@ -37,6 +41,12 @@ SMTP_PORT = int(os.getenv('SMTP_PORT'))
 
 NAMESPACE = uuid.NAMESPACE_DNS  
 
+# Pipeline outputs
+EXCEL_OUTPUT_DIR = os.path.join('output', 'excel')
+DESIGNED_QR_OUTPUT_DIR = os.path.join('output', 'designed_qr')
+TEMPLATE_IMAGE_PATH = "tasarim.jpg"
+PIPELINE_STAGES = ['excel', 'ticket_index', 'qr', 'excel_export', 'design', 'sync', 'mail']
+
 # --- Utility Functions ---
 
 def generate_uuid_from_phone(phone_number_str):
@@ -45,7 +55,13 @@ def generate_uuid_from_phone(phone_number_str):
     return str(uuid.uuid5(NAMESPACE, str(phone_number_str)))
 
 # --- Excel Processing & CSV Generation ---
-def process_excel(file_path, phone_col, uuid_col, counter_col):
+def process_excel(file_path, phone_col, uuid_col, counter_col, return_frame=False):
+    """
+    Cleans the input Excel file and writes the *_form.csv, *_differences.csv and *_clean.csv files.
+
+    Returns the path to *_clean.csv, or (path, DataFrame) when return_frame is True so callers
+    can reuse the cleaned rows without parsing the CSV again. Returns None on failure.
+    """
     try:
         if not os.path.exists(file_path):
             print(f"Error: File not found at '{file_path}'")
@@ -277,6 +293,8 @@ def process_excel(file_path, phone_col, uuid_col, counter_col):
         output_csv_path = os.path.join(CSV_OUTPUT_DIR, output_csv_filename)
         df.to_csv(output_csv_path, index=False, encoding='utf-8-sig')
         print(f"Successfully saved final processed CSV to '{output_csv_path}'.")
+        if return_frame:
+            return output_csv_path, df
         return output_csv_path
     except Exception as e:
         print(f"An unexpected error occurred during Excel processing: {e}")
@@ -288,7 +306,7 @@ def process_excel(file_path, phone_col, uuid_col, counter_col):
 from QRGenerator import generate_qr_codes_from_csv
 
 # --- Excel with QR Code Generation ---
-def generate_excel_with_qr(csv_path, qr_dir, excel_output_path):
+def generate_excel_with_qr(csv_path, qr_dir, excel_output_path, metrics=None):
     df = pd.read_csv(csv_path, dtype=str)
     wb = Workbook()
     ws = wb.active
@@ -298,7 +316,7 @@ def generate_excel_with_qr(csv_path, qr_dir, excel_output_path):
     headers = ['qr kodlar', 'ad soyad', 'posta', 'numara']
     ws.append(headers)
     row_number = 2
-    for _, row in df.iterrows():
+    for _, row in timed_items(df.iterrows(), metrics):
         ws.row_dimensions[row_number].height = 100  # Adjust row height according to QR size
         mobile = row.get('mobile', '').strip() # Ensure mobile is stripped
 
@@ -338,11 +356,129 @@ def generate_excel_with_qr(csv_path, qr_dir, excel_output_path):
     print(f"Successfully generated Excel with QR codes at: '{excel_output_path}'")
 
 
-# --- File Operations ---
-# from FileOperations import create_directory_if_not_exists # This line is now handled above
+# --- Pipeline Stages ---
+# Each stage takes the shared context dict (see Pipeline.py); returning False marks it as failed.
+# The clean frame is only in the context if the 'excel' stage ran in this process.
+
+def _clean_frame(context, csv_file):
+    if 'clean_df' not in context:
+        context['clean_df'] = pd.read_csv(csv_file, dtype=str)
+    return context['clean_df']
+
+def excel_stage(context, excel_file_path):
+    process_result = process_excel(excel_file_path, PHONE_COLUMN_NAME, UUID_COLUMN_NAME, COUNTER_COLUMN_NAME, return_frame=True)
+    if not process_result:
+        print("CSV file generation failed. Skipping subsequent steps.")
+        return False
+    context['csv_file'], context['clean_df'] = process_result
+    if current_stage() is not None:
+        current_stage().add_items(len(context['clean_df'])) # Vectorized: rows, no per-row latency
+
+def ticket_index_stage(context, csv_file, index_path):
+    # Ticket index for offline lookups (scanner devices, gate laptops)
+    try:
+        df = _clean_frame(context, csv_file)
+        write_ticket_index(df, index_path, uuid_col=UUID_COLUMN_NAME)
+        if current_stage() is not None:
+            current_stage().add_items(len(df))
+    except Exception as e:
+        print(f"Error writing ticket index: {e}")
+        return False
+
+def qr_stage(context, csv_file):
+    create_directory_if_not_exists(QR_OUTPUT_DIR)
+    generate_qr_codes_from_csv(csv_file, UUID_COLUMN_NAME, 'mobile', QR_OUTPUT_DIR, metrics=current_stage())
+    print("QR code generation completed.")
+
+def excel_export_stage(context, csv_file, excel_output_path):
+    create_directory_if_not_exists(EXCEL_OUTPUT_DIR)
+    generate_excel_with_qr(csv_file, QR_OUTPUT_DIR, excel_output_path, metrics=current_stage())
+    print("Excel generation with QR completed.")
+
+def design_stage(context, csv_file):
+    if not os.path.exists(TEMPLATE_IMAGE_PATH):
+        print(f"Warning: Template image '{TEMPLATE_IMAGE_PATH}' not found. Skipping QR design.")
+        return False
+    create_directory_if_not_exists(DESIGNED_QR_OUTPUT_DIR)
+    if overlay_qr_on_template(QR_OUTPUT_DIR, TEMPLATE_IMAGE_PATH, DESIGNED_QR_OUTPUT_DIR, csv_path=csv_file,
+                              metrics=current_stage()) is False:
+        return False
+    print("QR Design process completed.")
+
+def sync_stage(context, csv_file):
+    # Runs in-process: reuses the initialized Firebase app and the cleaned frame already in memory
+    try:
+        db_client = initialize_firebase_sync()
+        summary = sync_dataframe_to_firestore(db_client, _clean_frame(context, csv_file), metrics=current_stage())
+        print("--- Firebase Synchronization Finished ---")
+        return not summary or summary.get('failed', 0) == 0 # Failed commits are retried on the next run
+    except SystemExit:
+        # initialize_firebase_sync exits on missing/invalid credentials; keep the pipeline running
+        print("Error: Firebase initialization failed. Skipping synchronization.")
+        return False
+    except Exception as e:
+        print(f"An unexpected error occurred during Firebase sync: {e}")
+        return False
+
+def mail_stage(context, csv_file):
+    if not os.path.exists(csv_file) or not os.path.exists(DESIGNED_QR_OUTPUT_DIR):
+        print(f"Prerequisites not met (CSV exists: {os.path.exists(csv_file)}, Designed QRs exist: {os.path.exists(DESIGNED_QR_OUTPUT_DIR)}). QR Emails cannot be sent.")
+        return False
+    send_qr_codes(
+        csv_file, DESIGNED_QR_OUTPUT_DIR, SENDER_EMAIL,
+        SENDER_PASSWORD, SMTP_SERVER, SMTP_PORT, metrics=current_stage()
+    )
+    print("--- QR Email Sending Process Finished ---")
+
+def build_pipeline(excel_file_path):
+    """
+    The DataExtractor stages for one input Excel file as a Pipeline.
+
+    excel -> ticket_index, qr, sync; qr -> excel_export, design; design -> mail.
+    Sync and mail ask for confirmation unless the pipeline runs with assume_yes. Mail
+    is never skipped: the delivery log already keeps it from sending twice.
+
+    In parallel mode, ticket_index, qr and sync start together once excel is done,
+    then excel_export (thread) and design (worker process) once the basic QR codes
+    exist; mail waits for design.
+    """
+    base_name = os.path.splitext(os.path.basename(excel_file_path))[0]
+    csv_file = os.path.join(CSV_OUTPUT_DIR, f"{base_name}_clean.csv") # Written by process_excel
+    index_path = os.path.join(TICKET_INDEX_DIR, f"{base_name}_tickets.idx")
+    excel_output_path = os.path.join(EXCEL_OUTPUT_DIR, f"{base_name}_modified.xlsx")
+    columns = {'phone': PHONE_COLUMN_NAME, 'uuid': UUID_COLUMN_NAME, 'counter': COUNTER_COLUMN_NAME}
+    # The font file QRDesign actually loads (it may come from the system font directories)
+    design_font = resolve_font_path(DESIGN_FONT_PATH) or DESIGN_FONT_PATH
+    return Pipeline([
+        Stage('excel', partial(excel_stage, excel_file_path=excel_file_path),
+              inputs=[excel_file_path], outputs=[csv_file], params=columns),
+        Stage('ticket_index', partial(ticket_index_stage, csv_file=csv_file, index_path=index_path),
+              inputs=[csv_file], outputs=[index_path], after=['excel']),
+        Stage('qr', partial(qr_stage, csv_file=csv_file),
+              inputs=[csv_file], outputs=[QR_OUTPUT_DIR], after=['excel']),
+        Stage('excel_export', partial(excel_export_stage, csv_file=csv_file, excel_output_path=excel_output_path),
+              inputs=[csv_file, QR_OUTPUT_DIR], outputs=[excel_output_path], after=['qr']),
+        Stage('design', partial(design_stage, csv_file=csv_file),
+              inputs=[csv_file, QR_OUTPUT_DIR, TEMPLATE_IMAGE_PATH, design_font], outputs=[DESIGNED_QR_OUTPUT_DIR], after=['qr'],
+              executor='process'), # CPU-bound; keeps the GIL free for the export and sync threads
+        Stage('sync', partial(sync_stage, csv_file=csv_file),
+              inputs=[csv_file], after=['excel'], confirm="Do you want to sync with Firebase?"),
+        Stage('mail', partial(mail_stage, csv_file=csv_file),
+              inputs=[csv_file, DESIGNED_QR_OUTPUT_DIR], after=['design'], always_run=True,
+              confirm="Do you want to send emails with designed QR codes?"),
+    ])
 
 # --- Main Execution ---
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Process the input Excel file and run the QR ticket pipeline.")
+    parser.add_argument("--stages", nargs='+', choices=PIPELINE_STAGES, metavar='STAGE',
+                        help=f"Stages to bring up to date, with the stages they depend on (default: all). Choices: {', '.join(PIPELINE_STAGES)}")
+    parser.add_argument("--yes", action="store_true", help="Run Firebase sync and mailing without asking (non-interactive runs)")
+    parser.add_argument("--force", action="store_true", help="Run the selected stages even if their inputs have not changed")
+    parser.add_argument("--parallel", action="store_true", help="Run independent stages at the same time (sync and export in threads, design in a process)")
+    parser.add_argument("--profile", action="store_true", help="Also capture cProfile statistics for every stage (written next to the run report)")
+    args = parser.parse_args()
+
     # --- Find Input Excel File ---
     if not os.path.exists(INPUT_DIR):
         os.makedirs(INPUT_DIR)
@@ -366,86 +502,13 @@ if __name__ == "__main__":
         safe_excel_file_path_repr = repr(excel_file_path.encode(sys.stdout.encoding, errors='replace').decode(sys.stdout.encoding, errors='replace'))
         print(f"Using input file: {safe_excel_file_path_repr}")
 
-    # Define output directory paths
-    designed_qr_output_dir = os.path.join('output', 'designed_qr')
-    excel_output_dir = os.path.join('output', 'excel')
-
-    csv_file = process_excel(excel_file_path, PHONE_COLUMN_NAME, UUID_COLUMN_NAME, COUNTER_COLUMN_NAME)
-    if csv_file: # csv_file now holds the path to *_clean.csv
-        create_directory_if_not_exists(QR_OUTPUT_DIR)
-        create_directory_if_not_exists(excel_output_dir)
-        create_directory_if_not_exists(designed_qr_output_dir)
-
-        # --- QR code generation and Excel ---
-        # Pass the correct csv_file path (_clean.csv)
-        generate_qr_codes_from_csv(csv_file, UUID_COLUMN_NAME, 'mobile', QR_OUTPUT_DIR)
-        print("QR code generation completed.")
-
-        base_name = os.path.splitext(os.path.basename(excel_file_path))[0]
-        dynamic_excel_output_path = os.path.join(excel_output_dir, f"{base_name}_modified.xlsx")
-
-        # Pass the correct csv_file path (_clean.csv)
-        generate_excel_with_qr(csv_file, QR_OUTPUT_DIR, dynamic_excel_output_path)
-        print("Excel generation with QR completed.") # Corrected print message
-
-        # --- QR Design ---
-        print("\n--- Starting QR Design Process ---")
-        template_image_path = "tasarim.jpg"
-        if not os.path.exists(template_image_path):
-             print(f"Warning: Template image '{template_image_path}' not found. Skipping QR design.")
-             can_design = False
-        else:
-            # Pass the correct csv_file path (_clean.csv)
-            overlay_qr_on_template(QR_OUTPUT_DIR, template_image_path, designed_qr_output_dir, csv_path=csv_file)
-            print("QR Design process completed.")
-            can_design = True
-
-        # --- Firebase Sync ---
-        firebase_choice = input("Do you want to sync with Firebase? (yes/no): ").strip().lower()
-        if firebase_choice == 'yes':
-            print("\n--- Starting Firebase Synchronization ---")
-            try:
-                if not os.path.exists(FIREBASE_SYNC_SCRIPT):
-                    print(f"Error: Firebase sync script '{FIREBASE_SYNC_SCRIPT}' not found.")
-                else:
-                    python_executable = sys.executable
-                    # Pass the correct csv_file path (_clean.csv) to the sync script
-                    result = subprocess.run(
-                        [python_executable, FIREBASE_SYNC_SCRIPT, csv_file],
-                        capture_output=True, text=True, check=True
-                    )
-                    print("Firebase sync script output:")
-                    print(result.stdout)
-                    if result.stderr: print("Firebase sync script errors:", result.stderr)
-                    print("--- Firebase Synchronization Finished ---")
-            except FileNotFoundError:
-                print(f"Error: Python executable not found at '{sys.executable}'. Cannot run sync script.")
-            except subprocess.CalledProcessError as e:
-                print(f"Error: Firebase sync script failed with exit code {e.returncode}.")
-                print("Output:")
-                print(e.stdout)
-                print("Errors:")
-                print(e.stderr)
-            except Exception as e:
-                print(f"An unexpected error occurred during Firebase sync: {e}")
-
-        # --- Send QR Emails ---
-        email_choice = input("Do you want to send emails with designed QR codes? (yes/no): ").strip().lower()
-        if email_choice == 'yes':
-            # Check existence of the correct csv_file (_clean.csv)
-            if can_design and os.path.exists(csv_file) and os.path.exists(designed_qr_output_dir):
-                print("\n--- Starting QR Email Sending Process ---")
-                # Pass the correct csv_file path (_clean.csv)
-                send_qr_codes(
-                    csv_file, designed_qr_output_dir, SENDER_EMAIL,
-                    SENDER_PASSWORD, SMTP_SERVER, SMTP_PORT
-                )
-                print("--- QR Email Sending Process Finished ---")
-            else:
-                # Update the check message to reflect the correct csv file name pattern
-                print(f"Prerequisites not met (Template exists: {can_design}, CSV exists: {os.path.exists(csv_file)}, Designed QRs exist: {os.path.exists(designed_qr_output_dir)}). QR Emails cannot be sent.")
+    pipeline = build_pipeline(excel_file_path)
+    metrics = RunMetrics('data_extractor', profile=args.profile)
+    results = pipeline.run(args.stages, assume_yes=args.yes, force=args.force, parallel=args.parallel, metrics=metrics)
+    metrics.write()
 
-        print("\nAll processes have been completed.")
-        print("Note: To generate and send certificates, run 'python CertificateGeneratorSender.py' separately.")
+    if STAGE_FAILED in results.values():
+        print("\nSome stages failed; rerun to retry them (unchanged stages are skipped).")
     else:
-        print("CSV file generation failed. Skipping subsequent steps.")
+        print("\nAll processes have been completed.")
+    print("Note: To generate and send certificates, run 'python CertificateGeneratorSender.py' separately.")
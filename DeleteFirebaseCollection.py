@@ -1,19 +1,41 @@
 import sys
 import os
+import argparse
 import firebase_admin
 from firebase_admin import firestore
 
 # Import necessary functions from FirebaseSync.py
 # Ensure FirebaseSync.py is in the same directory or Python path
 try:
-    from FirebaseSync import initialize_firebase_sync, delete_collection, COLLECTION_NAME
+    from FirebaseSync import initialize_firebase_sync, delete_collection, fast_delete_collection, delete_store, COLLECTION_NAME, DELETE_WORKERS
+    from ParticipantStore import BACKENDS, PARTICIPANT_STORE, get_store
 except ImportError:
     print("Error: Could not import functions from FirebaseSync.py.")
     print("Ensure FirebaseSync.py is in the same directory.")
     sys.exit(1)
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=f"Delete every document in the '{COLLECTION_NAME}' Firestore collection.")
+    parser.add_argument("--fast", action="store_true", help="Keys-only listing with concurrent delete batches")
+    parser.add_argument("--workers", type=int, default=DELETE_WORKERS, help=f"Concurrent delete workers for --fast (default: {DELETE_WORKERS})")
+    parser.add_argument("--backend", choices=BACKENDS, default=PARTICIPANT_STORE, help=f"Participant store backend (default: {PARTICIPANT_STORE})")
+    args = parser.parse_args()
+    if args.workers < 1:
+        parser.error("--workers must be at least 1")
+
     print("--- Firebase Collection Deletion Utility ---")
+    if os.getenv('FIRESTORE_EMULATOR_HOST'):
+        print(f"Using Firestore emulator at {os.getenv('FIRESTORE_EMULATOR_HOST')}.")
+
+    if args.backend != 'firestore':
+        store = get_store(args.backend)
+        confirm = input(f"Delete all participants from the local {args.backend} store? (yes/no): ").strip().lower()
+        if confirm == 'yes':
+            delete_store(store)
+        else:
+            print("\nDeletion cancelled by user.")
+        store.close()
+        sys.exit(0)
 
     # Initialize Firebase
     db_client = initialize_firebase_sync()
@@ -31,7 +53,10 @@ if __name__ == "__main__":
 
     if confirm == 'yes':
         print(f"\nProceeding with deletion of collection '{COLLECTION_NAME}'...")
-        delete_collection(db_client, collection_ref)
+        if args.fast:
+            fast_delete_collection(db_client, collection_ref, workers=args.workers)
+        else:
+            delete_collection(db_client, collection_ref)
         print(f"--- Deletion process for '{COLLECTION_NAME}' finished. ---")
     else:
         print("\nDeletion cancelled by user.")
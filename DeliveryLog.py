@@ -0,0 +1,280 @@
+import os
+import csv
+import sys
+import sqlite3
+import argparse
+import threading
+from datetime import datetime
+
+# --- Configuration ---
+DELIVERY_LOG_PATH = os.path.join('logs', 'delivery_log.sqlite')
+# Buffered rows are written in one transaction once this many have accumulated
+DELIVERY_LOG_FLUSH_EVERY = int(os.getenv('DELIVERY_LOG_FLUSH_EVERY', '25'))
+# CSV logs written by earlier versions; imported automatically on first use
+LEGACY_SENT_LOG_CSV = os.path.join('logs', 'sent_emails.csv')
+LEGACY_ERROR_LOG_CSV = os.path.join('logs', 'email_errors.csv')
+
+def normalize_email(email):
+    """Key used for delivery lookups: stripped and lower-cased."""
+    return str(email).strip().lower() if email else ''
+
+class DeliveryLog:
+    """
+    Sent/error log for one mail campaign, stored in SQLite.
+
+    Replaces the CSV logs, which had to be parsed completely before every run and were
+    reopened for every line written. Deliveries are keyed by (campaign, email), so
+    "already sent?" is a set lookup for addresses this process knows about and a
+    primary-key lookup otherwise. Writes are buffered and committed together every
+    flush_every rows and on flush()/close(); callers flush at their own commit
+    boundaries (e.g. the mail queue checkpoint). A crash loses at most the unflushed
+    rows. The database runs in WAL mode with a busy timeout and duplicate deliveries
+    are ignored by the primary key, so several sender processes can share one log.
+    Thread-safe.
+    """
+
+    def __init__(self, campaign, db_path=DELIVERY_LOG_PATH, flush_every=DELIVERY_LOG_FLUSH_EVERY, import_legacy=True):
+        self.campaign = campaign
+        self.db_path = db_path
+        self.flush_every = max(1, flush_every)
+        self._lock = threading.Lock()
+        self._pending_sent = {} # normalized email -> (campaign, email, mobile, sent_at)
+        self._pending_errors = []
+        db_dir = os.path.dirname(db_path)
+        if db_dir and not os.path.exists(db_dir):
+            os.makedirs(db_dir)
+            print(f"Created log directory: {db_dir}")
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("PRAGMA busy_timeout=10000") # Other sender processes may hold the write lock
+        with self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS deliveries ("
+                " campaign TEXT NOT NULL,"
+                " email TEXT NOT NULL,"
+                " mobile TEXT,"
+                " sent_at TEXT NOT NULL,"
+                " PRIMARY KEY (campaign, email)) WITHOUT ROWID"
+            )
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS errors ("
+                " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+                " campaign TEXT NOT NULL,"
+                " email TEXT,"
+                " mobile TEXT,"
+                " reason TEXT,"
+                " logged_at TEXT NOT NULL)"
+            )
+            # Legacy CSV imports: rows already imported per file, so appended rows are picked up once
+            self._conn.execute("CREATE TABLE IF NOT EXISTS imports (path TEXT PRIMARY KEY, size INTEGER, rows INTEGER)")
+        self._sent = {row[0] for row in self._conn.execute("SELECT email FROM deliveries WHERE campaign = ?", (campaign,))}
+        if import_legacy and campaign == 'qr':
+            self.import_csv_logs()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # --- Queries ---
+
+    def is_sent(self, email):
+        """Returns True if the campaign already delivered to this address (in any process)."""
+        key = normalize_email(email)
+        with self._lock:
+            if key in self._sent:
+                return True
+            row = self._conn.execute("SELECT 1 FROM deliveries WHERE campaign = ? AND email = ?", (self.campaign, key)).fetchone()
+            if row:
+                self._sent.add(key) # Sent by another process since this log was opened
+            return row is not None
+
+    def sent_emails(self):
+        """Set of normalized addresses the campaign delivered to, as known to this process."""
+        with self._lock:
+            return set(self._sent)
+
+    def counts(self):
+        """Returns {'sent': ..., 'errors': ...} for the campaign, including buffered rows."""
+        self.flush()
+        with self._lock:
+            sent = self._conn.execute("SELECT COUNT(*) FROM deliveries WHERE campaign = ?", (self.campaign,)).fetchone()[0]
+            errors = self._conn.execute("SELECT COUNT(*) FROM errors WHERE campaign = ?", (self.campaign,)).fetchone()[0]
+        return {'sent': sent, 'errors': errors}
+
+    # --- Writes ---
+
+    def record_sent(self, email, mobile, sent_at=None):
+        """Buffers a delivery. Repeated addresses keep the first delivery."""
+        key = normalize_email(email)
+        if not key:
+            return
+        sent_at = sent_at or datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        with self._lock:
+            if key in self._sent:
+                return
+            self._sent.add(key)
+            self._pending_sent[key] = (self.campaign, key, str(mobile) if mobile else None, sent_at)
+            full = len(self._pending_sent) + len(self._pending_errors) >= self.flush_every
+        if full:
+            self.flush()
+
+    def log_error(self, email, mobile, reason, logged_at=None):
+        """Buffers an error or skip reason for an address."""
+        logged_at = logged_at or datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        row = (self.campaign, str(email) if email else 'N/A', str(mobile) if mobile else 'N/A', str(reason), logged_at)
+        with self._lock:
+            self._pending_errors.append(row)
+            full = len(self._pending_sent) + len(self._pending_errors) >= self.flush_every
+        if full:
+            self.flush()
+
+    def log_errors(self, rows):
+        """Writes many (email, mobile, reason) rows at once, e.g. the skips of a campaign plan."""
+        logged_at = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        with self._lock:
+            self._pending_errors.extend(
+                (self.campaign, str(email) if email else 'N/A', str(mobile) if mobile else 'N/A', str(reason), logged_at)
+                for email, mobile, reason in rows
+            )
+        self.flush()
+
+    def flush(self):
+        """
+        Writes all buffered rows in one transaction.
+
+        Returns:
+            int: Number of rows written. On a database error the rows stay buffered
+                for the next flush and 0 is returned.
+        """
+        with self._lock:
+            if not self._pending_sent and not self._pending_errors:
+                return 0
+            sent_rows = list(self._pending_sent.values())
+            error_rows = self._pending_errors
+            try:
+                with self._conn:
+                    self._conn.executemany(
+                        "INSERT OR IGNORE INTO deliveries (campaign, email, mobile, sent_at) VALUES (?, ?, ?, ?)", sent_rows
+                    )
+                    self._conn.executemany(
+                        "INSERT INTO errors (campaign, email, mobile, reason, logged_at) VALUES (?, ?, ?, ?, ?)", error_rows
+                    )
+            except sqlite3.Error as e:
+                print(f"Warning: Could not write {len(sent_rows) + len(error_rows)} rows to the delivery log '{self.db_path}': {e}")
+                return 0
+            self._pending_sent = {}
+            self._pending_errors = []
+            return len(sent_rows) + len(error_rows)
+
+    def close(self):
+        """Flushes buffered rows and closes the database."""
+        if self._conn is None:
+            return
+        self.flush()
+        with self._lock:
+            remaining = len(self._pending_sent) + len(self._pending_errors)
+            self._conn.close()
+            self._conn = None
+        if remaining:
+            print(f"CRITICAL ERROR: {remaining} delivery log rows could not be written to '{self.db_path}'.")
+
+    # --- Legacy CSV import ---
+
+    def import_csv_logs(self, sent_csv=LEGACY_SENT_LOG_CSV, errors_csv=LEGACY_ERROR_LOG_CSV):
+        """
+        Imports the CSV logs of earlier versions into the campaign.
+
+        Each file's size and imported row count are remembered, so calling this again
+        only reads files that changed and only imports rows appended since.
+
+        Returns:
+            tuple: (deliveries imported, errors imported)
+        """
+        marks = []
+        imported_sent = 0
+        for row in self._read_new_csv_rows(sent_csv, marks):
+            if row.get('email'):
+                self.record_sent(row['email'], row.get('mobile'), sent_at=row.get('sent_date') or None)
+                imported_sent += 1
+        imported_errors = 0
+        for row in self._read_new_csv_rows(errors_csv, marks):
+            self.log_error(row.get('email'), row.get('mobile'), row.get('reason'), logged_at=row.get('timestamp') or None)
+            imported_errors += 1
+        self.flush()
+        with self._lock:
+            if self._pending_sent or self._pending_errors:
+                return 0, 0 # Not written; the files are imported again next time
+            with self._conn:
+                self._conn.executemany("INSERT OR REPLACE INTO imports (path, size, rows) VALUES (?, ?, ?)", marks)
+        if imported_sent or imported_errors:
+            print(f"Imported {imported_sent} sent and {imported_errors} error entries from the CSV logs into '{self.db_path}'.")
+        return imported_sent, imported_errors
+
+    def _read_new_csv_rows(self, csv_path, marks):
+        """Returns the rows appended since the last import and adds the file's new import mark to marks."""
+        if not csv_path or not os.path.exists(csv_path):
+            return []
+        path_key = os.path.abspath(csv_path)
+        size = os.path.getsize(csv_path)
+        with self._lock:
+            row = self._conn.execute("SELECT size, rows FROM imports WHERE path = ?", (path_key,)).fetchone()
+        if row and row[0] == size:
+            return []
+        done = row[1] if row else 0
+        try:
+            with open(csv_path, 'r', encoding='utf-8', newline='') as f:
+                rows = list(csv.DictReader(f))
+        except (IOError, csv.Error, UnicodeDecodeError) as e:
+            print(f"Warning: Could not import CSV log '{csv_path}': {e}")
+            return []
+        marks.append((path_key, size, len(rows)))
+        return rows[done:]
+
+    # --- Export ---
+
+    def export_csv(self, kind, csv_path):
+        """Writes the campaign's 'sent' or 'errors' rows to a CSV file in the legacy column layout."""
+        self.flush()
+        if kind == 'sent':
+            header = ["email", "mobile", "sent_date"]
+            query = "SELECT email, mobile, sent_at FROM deliveries WHERE campaign = ? ORDER BY sent_at"
+        else:
+            header = ["email", "mobile", "reason", "timestamp"]
+            query = "SELECT email, mobile, reason, logged_at FROM errors WHERE campaign = ? ORDER BY id"
+        with self._lock:
+            rows = self._conn.execute(query, (self.campaign,)).fetchall()
+        with open(csv_path, 'w', encoding='utf-8', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(header)
+            writer.writerows(rows)
+        return len(rows)
+
+# --- Main Execution ---
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Inspect, import or export the mail delivery log.")
+    parser.add_argument("--db", default=DELIVERY_LOG_PATH, help=f"Delivery log path (default: {DELIVERY_LOG_PATH})")
+    parser.add_argument("--campaign", default='qr', help="Campaign name (default: qr)")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser("status", help="Show sent and error counts")
+    import_parser = subparsers.add_parser("import", help="Import CSV logs of earlier versions")
+    import_parser.add_argument("--sent", default=LEGACY_SENT_LOG_CSV, help=f"Sent log CSV (default: {LEGACY_SENT_LOG_CSV})")
+    import_parser.add_argument("--errors", default=LEGACY_ERROR_LOG_CSV, help=f"Error log CSV (default: {LEGACY_ERROR_LOG_CSV})")
+    export_parser = subparsers.add_parser("export", help="Export sent or error rows to CSV")
+    export_parser.add_argument("kind", choices=['sent', 'errors'])
+    export_parser.add_argument("csv_file", help="Output CSV path")
+    args = parser.parse_args()
+
+    if args.command == "export" and not os.path.exists(args.db):
+        print(f"Error: Delivery log not found at '{args.db}'")
+        sys.exit(1)
+    with DeliveryLog(args.campaign, db_path=args.db, import_legacy=False) as log:
+        if args.command == "import":
+            log.import_csv_logs(args.sent, args.errors)
+        elif args.command == "export":
+            count = log.export_csv(args.kind, args.csv_file)
+            print(f"Exported {count} {args.kind} rows of campaign '{args.campaign}' to '{args.csv_file}'.")
+        counts = log.counts()
+        print(f"Campaign '{args.campaign}': {counts['sent']} sent, {counts['errors']} errors logged.")
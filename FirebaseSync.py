@@ -1,25 +1,51 @@
 import firebase_admin
 from firebase_admin import credentials, firestore
+from google.auth.credentials import AnonymousCredentials
 import pandas as pd
+from tqdm import tqdm
+from CommitController import CommitController, MAX_CONCURRENCY
+from RunMetrics import timed_items
+from ParticipantStore import (
+    COLLECTION_NAME, SYNC_MANIFEST_PATH, DELETE_WORKERS, BACKENDS, PARTICIPANT_STORE,
+    FIELD_NAME, FIELD_EMAIL, FIELD_MOBILE, FIELD_COUNTER, FirestoreStore, get_store
+)
+import argparse
+import hashlib
+import json
+import time
 import sys
 import os
 
 # --- Configuration ---
 # IMPORTANT: Replace with the actual path to your Firebase service account key file
 SERVICE_ACCOUNT_KEY_PATH = 'qr-deneme.json'
-COLLECTION_NAME = 'users'
+# Collection, document field names and the sync manifest path live in ParticipantStore.py
 CSV_UUID_COL = 'UUID'
 CSV_COUNTER_COL = 'Counter'
 CSV_NAME_COL = 'isim'
 CSV_EMAIL_COL = 'mail'
 CSV_PHONE_COL = 'mobile'
+SYNC_MANIFEST_SAVE_EVERY = 10 # Committed batches between sync manifest writes
+# Set FIRESTORE_EMULATOR_HOST (e.g. localhost:8080) to run against the local emulator
+EMULATOR_PROJECT_ID = os.getenv('GOOGLE_CLOUD_PROJECT', 'demo-atasoft')
 
-# --- Firebase Initialization (Moved to CertificateGeneratorSender.py and potentially needed here if not already initialized by subprocess call) ---
+# --- Firebase Initialization ---
 # It's generally better to initialize once per process.
-# If this script is ONLY run via subprocess from DataExtractor AFTER DataExtractor initializes,
-# this might not be needed. However, for standalone execution or robustness, keep it.
+# DataExtractor.py calls this in-process before sync_dataframe_to_firestore; the check below
+# reuses an already initialized app, so repeated calls are cheap.
+class _EmulatorCredential(credentials.Base):
+    """Anonymous credential used when talking to the local Firestore emulator."""
+
+    def get_credential(self):
+        return AnonymousCredentials()
+
 def initialize_firebase_sync():
     """Initializes the Firebase Admin SDK for the sync script."""
+    if os.getenv('FIRESTORE_EMULATOR_HOST'):
+        if not firebase_admin._apps:
+            firebase_admin.initialize_app(_EmulatorCredential(), {'projectId': EMULATOR_PROJECT_ID})
+            print(f"Firebase Admin SDK initialized against emulator at {os.getenv('FIRESTORE_EMULATOR_HOST')} (project '{EMULATOR_PROJECT_ID}').")
+        return firestore.client()
     if not os.path.exists(SERVICE_ACCOUNT_KEY_PATH):
         print(f"Error: Service account key file not found at '{SERVICE_ACCOUNT_KEY_PATH}'")
         sys.exit(1)
@@ -37,6 +63,55 @@ def initialize_firebase_sync():
         sys.exit(1)
 
 
+# --- Sync Manifest (change detection) ---
+def document_hash(data):
+    """Returns a stable content hash for a Firestore document payload."""
+    payload = json.dumps(data, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+def load_sync_manifest(manifest_path=SYNC_MANIFEST_PATH):
+    """
+    Loads the document ID -> content hash manifest of the last successful sync.
+
+    Returns an empty dict if the manifest is missing, unreadable or was written
+    for a different collection, which makes the next sync a full upload.
+    """
+    if not os.path.exists(manifest_path):
+        return {}
+    try:
+        with open(manifest_path, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+    except (IOError, ValueError) as e:
+        print(f"Warning: Could not read sync manifest '{manifest_path}': {e}. Performing a full sync.")
+        return {}
+    if manifest.get('collection') != COLLECTION_NAME:
+        print(f"Warning: Sync manifest '{manifest_path}' belongs to another collection. Performing a full sync.")
+        return {}
+    return manifest.get('documents', {})
+
+def save_sync_manifest(documents, manifest_path=SYNC_MANIFEST_PATH):
+    """Atomically writes the document ID -> content hash manifest."""
+    manifest_dir = os.path.dirname(manifest_path)
+    if manifest_dir and not os.path.exists(manifest_dir):
+        os.makedirs(manifest_dir)
+    tmp_path = manifest_path + '.tmp'
+    try:
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'collection': COLLECTION_NAME, 'documents': documents}, f)
+        os.replace(tmp_path, manifest_path)
+    except IOError as e:
+        print(f"Warning: Could not write sync manifest '{manifest_path}': {e}")
+
+def clear_sync_manifest(manifest_path=SYNC_MANIFEST_PATH):
+    """Removes the sync manifest so the next sync uploads every document again."""
+    if os.path.exists(manifest_path):
+        try:
+            os.remove(manifest_path)
+            print(f"Removed sync manifest '{manifest_path}'.")
+        except OSError as e:
+            print(f"Warning: Could not remove sync manifest '{manifest_path}': {e}")
+
+
 # --- Firestore Operations ---
 def delete_collection(db, collection_ref, batch_size=500):
     """Deletes all documents in a collection in batches."""
@@ -58,12 +133,61 @@ def delete_collection(db, collection_ref, batch_size=500):
             docs = collection_ref.limit(batch_size).stream()
 
         print(f"Successfully deleted all documents in '{collection_ref.id}' collection.")
+        # Everything recorded as synced is gone now
+        clear_sync_manifest()
     except Exception as e:
         print(f"Error deleting collection '{collection_ref.id}': {e}")
         sys.exit(1)
 
-def sync_csv_to_firestore(db, csv_path):
-    """Reads CSV and uploads data to Firestore, creating new documents or merging with existing ones."""
+def fast_delete_collection(db, collection_ref, workers=DELETE_WORKERS, batch_size=500):
+    """
+    Deletes all documents in a collection using keys-only listing and concurrent batches.
+
+    See FirestoreStore.delete_all for how the key space is partitioned.
+
+    Args:
+        db: Firestore client.
+        collection_ref: Reference of the collection to wipe.
+        workers (int): Number of concurrent delete workers.
+        batch_size (int): Documents per delete batch (Firestore allows at most 500).
+
+    Returns:
+        int: Number of deleted documents.
+    """
+    store = FirestoreStore(db, collection_ref.id)
+    return delete_store(store, workers=workers, batch_size=batch_size)
+
+def delete_store(store, workers=DELETE_WORKERS, **kwargs):
+    """Deletes every document in a participant store, reports the rate and clears its sync manifest."""
+    start_time = time.monotonic()
+    deleted = store.delete_all(workers=workers, **kwargs)
+    elapsed = time.monotonic() - start_time
+    rate = deleted / elapsed if elapsed > 0 else 0
+    if deleted and store.sync_manifest_path:
+        # Even a partial wipe makes the recorded sync state stale
+        clear_sync_manifest(store.sync_manifest_path)
+    print(f"Deleted {deleted} documents from the {store.name} store in {elapsed:.1f}s ({rate:.0f} docs/s).")
+    return deleted
+
+def sync_csv_to_firestore(db, csv_path, full_sync=False, manifest_path=SYNC_MANIFEST_PATH, controller=None):
+    """
+    Reads CSV and uploads data to Firestore, creating new documents or merging with existing ones.
+
+    Args:
+        db: Firestore client.
+        csv_path (str): Path to the *_clean.csv file.
+        full_sync (bool): Ignore the manifest and write every row.
+        manifest_path (str): Path to the sync manifest file.
+        controller (CommitController, optional): Commit controller to use.
+
+    Returns:
+        dict: Sync summary counts (see sync_dataframe_to_firestore).
+    """
+    df = read_participant_csv(csv_path)
+    return sync_dataframe_to_firestore(db, df, full_sync=full_sync, manifest_path=manifest_path, controller=controller)
+
+def read_participant_csv(csv_path):
+    """Reads a *_clean.csv file for syncing. Exits if the file is missing or unreadable."""
     # Encode path for safe printing, especially on Windows
     safe_csv_path_repr = repr(csv_path.encode(sys.stdout.encoding, errors='replace').decode(sys.stdout.encoding, errors='replace'))
 
@@ -80,20 +204,67 @@ def sync_csv_to_firestore(db, csv_path):
         print(f"Error reading CSV file: {type(e).__name__} - {e}")
         print(f"(File path attempted: {safe_csv_path_repr})")
         sys.exit(1)
+    return df
+
+def sync_dataframe_to_firestore(db, df, full_sync=False, manifest_path=SYNC_MANIFEST_PATH, controller=None, metrics=None):
+    """
+    Uploads participant rows from an in-memory DataFrame to Firestore.
+
+    This is the in-process entry point used by DataExtractor.py, which passes the frame
+    produced by process_excel instead of re-reading *_clean.csv.
+
+    Returns:
+        dict: Counts for 'inserted', 'updated', 'unchanged', 'failed' and 'total'.
+    """
+    return sync_dataframe(FirestoreStore(db), df, full_sync=full_sync, manifest_path=manifest_path, controller=controller,
+                          metrics=metrics)
 
-    users_ref = db.collection(COLLECTION_NAME)
+def sync_dataframe(store, df, full_sync=False, manifest_path=None, controller=None, metrics=None):
+    """
+    Uploads participant rows from a DataFrame to any participant store.
 
-    # REMOVED: Deletion of existing data is no longer done here.
-    # print(f"Attempting to delete all existing documents in '{COLLECTION_NAME}' collection...")
-    # delete_collection(db, users_ref)
+    Only documents whose content changed since the last sync (according to the local
+    manifest) are written. Unchanged rows are counted but not sent. Changed documents are
+    committed through a CommitController, which retries throttled or failed commits and
+    adapts batch size and concurrency to the observed latency. Blank name, email or
+    mobile cells are written as empty strings, so clearing a value in the CSV clears it
+    in the store.
 
-    # Upload new data or update existing data
-    print(f"Uploading/Updating {len(df)} records in '{COLLECTION_NAME}' collection...")
-    upload_count = 0
-    batch = db.batch()
-    batch_count = 0
+    Args:
+        store (ParticipantStore): Target backend (Firestore, SQLite or in-memory).
+        df (pd.DataFrame): Participant rows with UUID, Counter, isim, mail and mobile columns.
+        full_sync (bool): Ignore the manifest and write every row.
+        manifest_path (str, optional): Sync manifest file. Defaults to the store's own manifest;
+            stores without one (in-memory) always write every row.
+        controller (CommitController, optional): Commit controller to use; a default one is
+            created if omitted.
+        metrics (StageMetrics, optional): Receives the time spent preparing each row and the
+            controller's commit statistics (see RunMetrics.py).
 
-    for index, row in df.iterrows():
+    Returns:
+        dict: Counts for 'inserted', 'updated', 'unchanged', 'failed' and 'total'.
+    """
+    if manifest_path is None:
+        manifest_path = store.sync_manifest_path
+    # Positional index so row numbers in warnings match the CSV lines
+    df = df.reset_index(drop=True)
+    # Compare against the last synced state so only inserts and changes are written
+    previous_hashes = {} if full_sync or not manifest_path else load_sync_manifest(manifest_path)
+    if full_sync:
+        print("Full sync requested. Ignoring the sync manifest.")
+    elif previous_hashes:
+        print(f"Loaded sync manifest with {len(previous_hashes)} documents.")
+    synced_hashes = {} if full_sync else dict(previous_hashes)
+
+    print(f"Uploading/Updating changed records out of {len(df)} in the {store.name} store ('{COLLECTION_NAME}')...")
+    inserted_count = 0
+    updated_count = 0
+    unchanged_count = 0
+    failed_count = 0
+    records = {} # doc_id -> data for every new or changed document (last row wins for duplicate UUIDs)
+    pending = {} # doc_id -> (hash, is_insert) for documents not yet committed
+
+    for index, row in timed_items(tqdm(df.iterrows(), total=len(df), desc="Syncing to Firestore"), metrics):
         doc_id = row[CSV_UUID_COL]
         if not doc_id or pd.isna(doc_id):
             print(f"Warning: Skipping row {index + 2} due to missing or invalid UUID.")
@@ -114,55 +285,104 @@ def sync_csv_to_firestore(db, csv_path):
 
             data = {
                 # Use specific column names expected by Firestore if they differ from CSV
-                "Counter": counter,
-                "Ad-Soyad": row[CSV_NAME_COL],
-                "Eposta": row[CSV_EMAIL_COL],
-                "Telefon numaranız": row[CSV_PHONE_COL]
+                FIELD_COUNTER: counter,
+                FIELD_NAME: row[CSV_NAME_COL],
+                FIELD_EMAIL: row[CSV_EMAIL_COL],
+                FIELD_MOBILE: row[CSV_PHONE_COL]
                 # Add other fields from CSV as needed
             }
-            # Remove None values to avoid errors during Firestore upload
-            data = {k: v for k, v in data.items() if v is not None and pd.notna(v)}
-
-            doc_ref = users_ref.document(doc_id)
-            # Use merge=True to update existing docs or create new ones
-            batch.set(doc_ref, data, merge=True)
-            batch_count += 1
-            upload_count += 1
-
-            # Commit batch periodically
-            if batch_count >= 499:
-                print(f"Committing batch of {batch_count} documents...")
-                batch.commit()
-                print("Batch committed.")
-                batch = db.batch() # Start a new batch
-                batch_count = 0
+            # Blank cells are written as '' rather than left out: merge=True keeps fields missing
+            # from the write, so a value cleared in the CSV would otherwise stay in the store
+            data = {k: '' if v is None or pd.isna(v) else v for k, v in data.items()}
+
+            doc_hash = document_hash(data)
+            previous_hash = previous_hashes.get(doc_id)
+            if previous_hash == doc_hash:
+                unchanged_count += 1
+                continue
+
+            # The store merges into existing docs (or creates new ones) and stamps UpdatedAt
+            records[doc_id] = data
+            pending[doc_id] = (doc_hash, previous_hash is None)
 
         except Exception as e:
             print(f"Error processing row {index + 2} (UUID: {doc_id}): {e}")
 
-    # Commit any remaining documents in the last batch
-    if batch_count > 0:
-        print(f"Committing final batch of {batch_count} documents...")
-        batch.commit()
-        print("Final batch committed.")
+    # Commit in batches sized by the controller (retries, backoff, adaptive batch size and concurrency)
+    if records:
+        if controller is None:
+            controller = CommitController()
+        unsaved_batches = 0
+        try:
+            with tqdm(total=len(records), desc="Committing", unit="docs") as progress:
+                for batch, error in controller.commit_all(list(records.items()), store.upsert_batch):
+                    if error is not None:
+                        print(f"Error committing batch of {len(batch)} documents: {error}")
+                        failed_count += len(batch)
+                    else:
+                        for doc_id, _ in batch:
+                            doc_hash, is_insert = pending[doc_id]
+                            synced_hashes[doc_id] = doc_hash
+                            if is_insert:
+                                inserted_count += 1
+                            else:
+                                updated_count += 1
+                        unsaved_batches += 1
+                        if manifest_path and unsaved_batches >= SYNC_MANIFEST_SAVE_EVERY:
+                            save_sync_manifest(synced_hashes, manifest_path)
+                            unsaved_batches = 0
+                    progress.update(len(batch))
+        finally:
+            # Also runs on interruption, so committed documents are not sent again next time
+            if manifest_path and unsaved_batches:
+                save_sync_manifest(synced_hashes, manifest_path)
+        controller.print_summary()
+        if metrics is not None:
+            metrics.extra['commit'] = controller.stats()
+        if store.commit_stats_path:
+            controller.save_stats(store.commit_stats_path)
+
+    print(f"\nSync Summary ({store.name} store, '{COLLECTION_NAME}'):")
+    print(f" - Inserted: {inserted_count}")
+    print(f" - Updated: {updated_count}")
+    print(f" - Unchanged (not sent): {unchanged_count}")
+    print(f" - Failed to commit: {failed_count}")
+    print(f" - Total rows: {len(df)}")
 
-    print(f"Successfully processed {upload_count} records for Firestore collection '{COLLECTION_NAME}'.")
+    return {
+        'inserted': inserted_count,
+        'updated': updated_count,
+        'unchanged': unchanged_count,
+        'failed': failed_count,
+        'total': len(df),
+    }
 
 
 # --- Main Execution ---
 if __name__ == "__main__":
-    if len(sys.argv) < 2:
-        print("Usage: python FirebaseSync.py <path_to_csv_file>")
-        sys.exit(1)
+    parser = argparse.ArgumentParser(description="Sync a *_clean.csv file to the Firestore users collection.")
+    parser.add_argument("csv_file", help="Path to the *_clean.csv file")
+    parser.add_argument("--full", action="store_true", help="Ignore the sync manifest and write every row")
+    parser.add_argument("--backend", choices=BACKENDS, default=PARTICIPANT_STORE, help=f"Participant store backend (default: {PARTICIPANT_STORE})")
+    parser.add_argument("--max-concurrency", type=int, default=MAX_CONCURRENCY, help=f"Upper limit for concurrent commits (default: {MAX_CONCURRENCY})")
+    args = parser.parse_args()
+    if args.max_concurrency < 1:
+        parser.error("--max-concurrency must be at least 1")
+    controller = CommitController(max_concurrency=args.max_concurrency)
 
-    csv_file_path = sys.argv[1]
+    csv_file_path = args.csv_file
     # Encode path for safe printing
     safe_csv_file_path_repr = repr(csv_file_path.encode(sys.stdout.encoding, errors='replace').decode(sys.stdout.encoding, errors='replace'))
 
 
     print("--- Starting Firebase Synchronization ---")
     print(f"Processing file: {safe_csv_file_path_repr}") # Use encoded path representation
-    # Initialize Firebase specifically for this script run
-    db_client = initialize_firebase_sync()
-    sync_csv_to_firestore(db_client, csv_file_path) # Pass the original path here
+    if args.backend == 'firestore':
+        # Initialize Firebase specifically for this script run
+        db_client = initialize_firebase_sync()
+        sync_csv_to_firestore(db_client, csv_file_path, full_sync=args.full, controller=controller) # Pass the original path here
+    else:
+        store = get_store(args.backend)
+        sync_dataframe(store, read_participant_csv(csv_file_path), full_sync=args.full, controller=controller)
+        store.close()
     print("--- Firebase Synchronization Complete ---")
@@ -0,0 +1,207 @@
+import os
+import json
+import time
+import random
+import threading
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# --- Configuration ---
+# Provider quotas; 0 (the default) disables a limit. Gmail allows roughly 500 messages per day on free accounts.
+MAIL_PER_MINUTE = int(os.getenv('MAIL_PER_MINUTE', '0'))
+MAIL_PER_DAY = int(os.getenv('MAIL_PER_DAY', '0'))
+# Longest a sender waits for quota before pausing the campaign (the queue is saved for the next run)
+MAX_QUOTA_WAIT_SECONDS = float(os.getenv('MAIL_MAX_QUOTA_WAIT', '300'))
+MAIL_SCHEDULER_STATE_FILE = 'logs/mail_scheduler_state.json'
+MIN_RATE_FACTOR = 0.1 # Lowest fraction of MAIL_PER_MINUTE after repeated throttling
+RATE_RECOVERY_STEP = 0.05 # Fraction of MAIL_PER_MINUTE regained per accepted message
+# Pause of all senders after a throttling reply, doubled for every earlier rejection of the same
+# message and jittered; applies with or without quotas
+THROTTLE_BACKOFF_SECONDS = float(os.getenv('MAIL_THROTTLE_BACKOFF', '2'))
+MAX_THROTTLE_BACKOFF_SECONDS = 60.0
+
+class TokenBucket:
+    """
+    Token bucket holding up to capacity tokens that refill evenly over period seconds.
+
+    Uses wall-clock time so the state stays meaningful when saved and loaded by a
+    later run. A capacity of 0 means unlimited.
+    """
+
+    def __init__(self, capacity, period, tokens=None, updated=None):
+        self.capacity = capacity
+        self.period = period
+        self.rate_factor = 1.0 # Scales the refill rate; lowered while the provider throttles
+        self.tokens = float(capacity) if tokens is None else min(float(tokens), capacity)
+        self.updated = time.time() if updated is None else updated
+
+    @property
+    def rate(self):
+        return self.capacity / self.period * self.rate_factor
+
+    def _refill(self, now):
+        if now > self.updated:
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, now):
+        """Seconds until one token is available."""
+        if not self.capacity:
+            return 0.0
+        self._refill(now)
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def take(self):
+        if self.capacity:
+            self.tokens -= 1
+
+    def give_back(self):
+        if self.capacity:
+            self.tokens = min(self.capacity, self.tokens + 1)
+
+    def to_dict(self):
+        return {'tokens': self.tokens, 'updated': self.updated}
+
+class MailScheduler:
+    """
+    Paces a mail campaign to the provider's per-minute and per-day quotas.
+
+    Senders call acquire() before every message. Throttling replies (SMTP 4xx) pause all
+    senders for a jittered backoff that doubles with every rejection of the same message,
+    and halve the per-minute rate; every accepted message wins back a little of it (AIMD),
+    so the campaign settles at the highest rate the provider sustains. Bucket levels and the
+    remaining queue are saved to a state file. A campaign paused at the daily quota
+    continues in a later run from where it stopped, without re-analyzing the CSV or
+    resending anything.
+    """
+
+    def __init__(self, campaign, per_minute=MAIL_PER_MINUTE, per_day=MAIL_PER_DAY,
+                 max_wait=MAX_QUOTA_WAIT_SECONDS, state_file=MAIL_SCHEDULER_STATE_FILE,
+                 throttle_backoff=THROTTLE_BACKOFF_SECONDS):
+        self.campaign = campaign
+        self.max_wait = max_wait
+        self.throttle_backoff = throttle_backoff
+        self.backoff_until = 0.0 # time.time() before which no message is sent after throttling
+        self.state_file = state_file
+        self.throttled = 0
+        self.paused_for = None # Seconds of quota wait that made the campaign pause
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock() # Serializes save(): pool checkpoints run outside the pool lock
+        state = self._load_state().get(campaign, {})
+        buckets = state.get('buckets', {})
+        self.minute = TokenBucket(per_minute, 60, **buckets.get('minute', {}))
+        self.day = TokenBucket(per_day, 86400, **buckets.get('day', {}))
+        self.minute.rate_factor = state.get('rate_factor', 1.0)
+        self._queue_state = state.get('queue')
+
+    # --- Pacing ---
+
+    def acquire(self):
+        """
+        Blocks until both quotas allow one more message and any throttling backoff has
+        passed, then takes a token from each quota.
+
+        Returns:
+            bool: False if the wait would exceed max_wait; the caller should stop and
+                leave the remaining queue for a later run.
+        """
+        while True:
+            with self._lock:
+                now = time.time()
+                wait = max(self.minute.wait_time(now), self.day.wait_time(now), self.backoff_until - now)
+                if wait <= 0:
+                    self.minute.take()
+                    self.day.take()
+                    return True
+                if wait > self.max_wait:
+                    self.paused_for = wait
+                    return False
+            time.sleep(min(wait, 1.0))
+
+    def on_success(self):
+        with self._lock:
+            self.minute.rate_factor = min(1.0, self.minute.rate_factor + RATE_RECOVERY_STEP)
+
+    def on_throttled(self, deferrals=1):
+        """
+        Called for SMTP 4xx replies: pauses all senders, halves the per-minute rate and
+        refunds the daily token.
+
+        Args:
+            deferrals (int): How often the server has now rejected this message; each
+                earlier rejection doubles the pause (up to MAX_THROTTLE_BACKOFF_SECONDS).
+        """
+        with self._lock:
+            self.throttled += 1
+            backoff = min(MAX_THROTTLE_BACKOFF_SECONDS, self.throttle_backoff * 2 ** (max(1, deferrals) - 1))
+            backoff *= random.uniform(0.5, 1.0) # Jitter, so senders do not retry in lockstep
+            self.backoff_until = max(self.backoff_until, time.time() + backoff)
+            self.minute.rate_factor = max(MIN_RATE_FACTOR, self.minute.rate_factor / 2)
+            self.minute.tokens = min(self.minute.tokens, 0)
+            self.day.give_back() # The message was not accepted
+            if self.minute.capacity:
+                print(f"Throttled by the SMTP server. Pausing for {backoff:.1f}s, then sending at {self.current_rate_per_minute():.1f} messages/min.")
+            else:
+                print(f"Throttled by the SMTP server. Pausing for {backoff:.1f}s.")
+
+    def current_rate_per_minute(self):
+        return self.minute.rate * 60 if self.minute.capacity else float('inf')
+
+    # --- Persistence ---
+
+    @staticmethod
+    def fingerprint(*paths):
+        """Identifies the campaign input so a saved queue is only reused for the same files."""
+        result = []
+        for path in paths:
+            try:
+                stat = os.stat(path)
+                result.append([os.path.abspath(path), stat.st_size, stat.st_mtime])
+            except OSError:
+                result.append([os.path.abspath(path), None, None])
+        return result
+
+    def _load_state(self):
+        if not os.path.exists(self.state_file):
+            return {}
+        try:
+            with open(self.state_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (IOError, ValueError) as e:
+            print(f"Warning: Could not read mail scheduler state '{self.state_file}': {e}")
+            return {}
+
+    def load_queue(self, source):
+        """Returns the saved remaining jobs if they were built from the same source, else None."""
+        if not self._queue_state or self._queue_state.get('source') != source:
+            return None
+        return self._queue_state.get('jobs')
+
+    def save(self, source=None, jobs=None):
+        """
+        Saves bucket levels, the rate and the remaining queue (cleared when jobs is empty).
+
+        Safe to call from several threads; saves run one at a time. The temporary file is
+        named per process, so other processes sharing the state file never write to it.
+        """
+        with self._save_lock:
+            with self._lock:
+                campaign_state = {
+                    'buckets': {'minute': self.minute.to_dict(), 'day': self.day.to_dict()},
+                    'rate_factor': self.minute.rate_factor,
+                    'queue': {'source': source, 'jobs': jobs, 'saved_at': time.strftime('%Y-%m-%d %H:%M:%S')} if jobs else None,
+                }
+            state = self._load_state()
+            state[self.campaign] = campaign_state
+            state_dir = os.path.dirname(self.state_file)
+            if state_dir and not os.path.exists(state_dir):
+                os.makedirs(state_dir)
+            tmp_path = f"{self.state_file}.{os.getpid()}.tmp"
+            try:
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    json.dump(state, f, ensure_ascii=False)
+                os.replace(tmp_path, self.state_file)
+            except IOError as e:
+                print(f"Warning: Could not write mail scheduler state '{self.state_file}': {e}")
+            self._queue_state = campaign_state['queue']
@@ -3,120 +3,578 @@ from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from email.mime.base import MIMEBase
 from email import encoders
+from email.header import Header
+from concurrent.futures import ProcessPoolExecutor
 import os
 import pandas as pd
 from dotenv import load_dotenv
-from datetime import datetime
-import csv
+import time
+import uuid
+import base64
+import atexit
+import queue
+import threading
+from MailScheduler import MailScheduler
+from DeliveryLog import DeliveryLog, DELIVERY_LOG_PATH
+from CampaignPlanner import (
+    PLAN_SEND, SKIP_ALREADY_SENT, SKIP_MISSING_DATA, SKIP_MISSING_QR, SKIP_DUPLICATE,
+    plan_qr_campaign, plan_counts, plan_jobs, plan_skip_errors, default_plan_path, write_plan, read_plan
+)
 
 # Load environment variables from .env file
 load_dotenv()
 
 # --- Constants ---
-SENT_EMAIL_LOG_FILE = 'logs/sent_emails.csv'
-EMAIL_ERROR_LOG_FILE = 'logs/email_errors.csv'
+# Number of parallel SMTP sessions used by send_qr_codes
+SMTP_CONCURRENCY = int(os.getenv('SMTP_CONCURRENCY', '4'))
+QR_EMAIL_SUBJECT = "AI Summit Erzurum E-Biletiniz"
+QR_EMAIL_BODY = (
+    "Sevgili {name},\n\n"
+    "Zirveye katılım için hazırladığımız e-biletiniz ekte yer almaktadır.\n\n"
+    "Lütfen etkinlik alanında E-Biletinizi hazır bulundurunuz.❗❗\n\n"
+    "Heyecan dolu bu deneyimin bir parçası olmaya hazır olun! Sizlerle buluşmak için sabırsızlanıyoruz.\n\n"
+    "Etkinlik detayları ve güncellemeler için bizi Instagram’dan takip etmeyi unutmayın:\n\n"
+    "https://www.instagram.com/atauniaisummiterzurum\n\n"
+    "Görüşmek üzere!\n"
+    "ATASOFT Ekibi"
+)
+# Processes rendering messages ahead of the SMTP sessions (0 renders in the sending threads)
+MAIL_RENDER_WORKERS = int(os.getenv('MAIL_RENDER_WORKERS', str(min(4, os.cpu_count() or 1))))
+# Rendered messages kept ready ahead of the senders
+MAIL_RENDER_WINDOW = int(os.getenv('MAIL_RENDER_WINDOW', '64'))
+# Messages sent over one SMTP connection before it is closed and reopened (0 = never recycle)
+SMTP_MESSAGES_PER_SESSION = int(os.getenv('SMTP_MESSAGES_PER_SESSION', '100'))
+# Tries per message when the session drops (SMTPServerDisconnected, 421) before giving up
+SMTP_SEND_ATTEMPTS = int(os.getenv('SMTP_SEND_ATTEMPTS', '3'))
+SMTP_RECONNECT_DELAY_SECONDS = 1.0 # Multiplied by the attempt number
+# Log in without STARTTLS when the server does not offer it (only for local test servers such as benchmarks/smtp_sink.py)
+SMTP_ALLOW_INSECURE = os.getenv('SMTP_ALLOW_INSECURE', '0') == '1'
+# Temporary (4xx) rejections of one message before it is logged as failed (0 = retry forever)
+SMTP_MAX_DEFERRALS = int(os.getenv('SMTP_MAX_DEFERRALS', '5'))
+# Save the unsent queue after this many finished messages (see MailScheduler.py)
+CHECKPOINT_EVERY = 25
+
+# Open delivery logs per campaign, shared by all sender threads of this process
+_delivery_logs = {}
+_delivery_logs_lock = threading.Lock()
 
 # --- Utility Functions ---
 
-def _ensure_log_dir_exists(log_file):
-    """Ensures the directory for the log file exists."""
-    log_dir = os.path.dirname(log_file)
-    if log_dir and not os.path.exists(log_dir):
-        try:
-            os.makedirs(log_dir)
-            print(f"Created log directory: {log_dir}")
-        except OSError as e:
-            print(f"Warning: Could not create log directory '{log_dir}': {e}")
-            return False
-    return True
+def get_delivery_log(campaign='qr'):
+    """
+    Returns this process's DeliveryLog for a campaign, opening it on first use.
 
-def get_sent_emails(log_file=SENT_EMAIL_LOG_FILE):
+    Buffered rows are flushed when the process exits.
+    """
+    with _delivery_logs_lock:
+        log = _delivery_logs.get(campaign)
+        if log is None:
+            log = DeliveryLog(campaign)
+            _delivery_logs[campaign] = log
+            atexit.register(log.close)
+        return log
+
+def get_sent_emails(campaign='qr'):
     """
     Get a set of email addresses that have already been sent QR codes.
-    
+
     Args:
-        log_file (str): Path to the CSV file tracking sent emails.
-        
+        campaign (str): Delivery log campaign (default: 'qr').
+
     Returns:
-        set: A set of email addresses that have already received QR codes.
+        set: Lower-cased email addresses that have already received QR codes.
     """
-    if not _ensure_log_dir_exists(log_file):
-        return set()
-    
-    if not os.path.exists(log_file):
-        try:
-            with open(log_file, 'w', encoding='utf-8') as f:
-                f.write("email,mobile,sent_date\n")
-            return set()
-        except IOError as e:
-            print(f"Warning: Could not create sent emails log file '{log_file}': {e}")
-            return set()
-    
-    try:
-        sent_df = pd.read_csv(log_file, dtype=str)
-        if 'email' in sent_df.columns:
-            return set(sent_df['email'].str.lower().dropna())
-        else:
-            print(f"Warning: 'email' column not found in {log_file}. Assuming no emails sent.")
-            return set()
-    except Exception as e:
-        print(f"Warning: Error reading sent emails log '{log_file}': {e}")
-        return set()
+    return get_delivery_log(campaign).sent_emails()
 
-def record_sent_email(email, mobile, log_file=SENT_EMAIL_LOG_FILE):
+def record_sent_email(email, mobile, campaign='qr'):
     """
     Record that an email has been sent to a specific address.
-    
+
     Args:
         email (str): Email address that received the QR code.
         mobile (str): Mobile number associated with the email.
-        log_file (str): Path to the CSV file tracking sent emails.
+        campaign (str): Delivery log campaign (default: 'qr').
     """
-    if not _ensure_log_dir_exists(log_file):
-        return
+    get_delivery_log(campaign).record_sent(email, mobile)
 
-    now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    
-    try:
-        file_exists = os.path.exists(log_file)
-        with open(log_file, 'a', encoding='utf-8', newline='') as f:
-            if not file_exists or os.path.getsize(log_file) == 0:
-                f.write("email,mobile,sent_date\n")
-            f.write(f"{email},{mobile},{now}\n")
-    except IOError as e:
-        print(f"Warning: Could not record sent email to log '{log_file}': {e}")
-
-def log_email_error(email, mobile, reason, log_file=EMAIL_ERROR_LOG_FILE):
+def log_email_error(email, mobile, reason, campaign='qr'):
     """
-    Logs an error or skip reason for a specific email address using the csv module.
+    Logs an error or skip reason for a specific email address.
 
     Args:
         email (str): Email address that failed or was skipped.
         mobile (str): Mobile number associated with the email (can be None or 'N/A').
         reason (str): Description of the error or skip reason.
-        log_file (str): Path to the CSV file for logging errors.
+        campaign (str): Delivery log campaign (default: 'qr').
     """
-    if not _ensure_log_dir_exists(log_file):
-        print(f"Error: Cannot log email error because log directory cannot be created/accessed for '{log_file}'.")
-        return
+    get_delivery_log(campaign).log_error(email, mobile, reason)
+
+# --- SMTP Sessions ---
 
-    now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    email_str = str(email) if email else 'N/A'
-    mobile_str = str(mobile) if mobile else 'N/A'
-    reason_str = str(reason)
+def open_smtp_session(smtp_server, smtp_port, sender_email, sender_password, allow_insecure=SMTP_ALLOW_INSECURE):
+    """
+    Opens an SMTP session, upgrading to TLS when the server offers STARTTLS and logging in
+    when a password is configured. Local stand-ins (e.g. aiosmtpd) usually offer neither.
 
+    With a password, STARTTLS is required: a server that does not offer it (a
+    misconfiguration, or an attacker stripping it) raises smtplib.SMTPNotSupportedError
+    instead of receiving the password in plain text, unless allow_insecure is set
+    (SMTP_ALLOW_INSECURE=1, for local test servers only).
+    """
+    server = smtplib.SMTP(smtp_server, smtp_port)
     try:
-        file_exists = os.path.exists(log_file)
-        with open(log_file, 'a', encoding='utf-8', newline='') as f:
-            writer = csv.writer(f)
-            if not file_exists or os.path.getsize(log_file) == 0:
-                writer.writerow(["email", "mobile", "reason", "timestamp"])
-            writer.writerow([email_str, mobile_str, reason_str, now])
-    except (IOError, csv.Error) as e:
-        print(f"CRITICAL ERROR: Could not write to email error log '{log_file}'. Error: {type(e).__name__} - {e}")
-        print(f"Data attempted to log: Email='{email_str}', Mobile='{mobile_str}', Reason='{reason_str}', Timestamp='{now}'")
-
-def send_qr_codes(csv_path, qr_dir, sender_email, sender_password, smtp_server, smtp_port):
+        server.ehlo()
+        if server.has_extn('starttls'):
+            server.starttls()
+            server.ehlo()
+        elif sender_password and not allow_insecure:
+            raise smtplib.SMTPNotSupportedError(
+                f"{smtp_server}:{smtp_port} does not offer STARTTLS; refusing to send the password unencrypted "
+                "(set SMTP_ALLOW_INSECURE=1 only for a local test server)")
+        if sender_password:
+            server.login(sender_email, sender_password)
+    except Exception:
+        server.close()
+        raise
+    return server
+
+class SMTPSession:
+    """
+    SMTP connection that manages its own lifetime.
+
+    The session is opened on first use and recycled (QUIT and reconnect) after
+    max_messages messages, before providers start dropping long-lived connections. A
+    dead session (SMTPServerDisconnected, a 421 reply or a failed reconnect) is
+    reopened and the current message retried, up to max_attempts tries per message.
+    A message can be delivered twice if the connection drops after the server
+    accepted it but before the reply arrived.
+    """
+
+    def __init__(self, smtp_server, smtp_port, sender_email, sender_password,
+                 max_messages=SMTP_MESSAGES_PER_SESSION, max_attempts=SMTP_SEND_ATTEMPTS):
+        self.smtp_server = smtp_server
+        self.smtp_port = smtp_port
+        self.sender_email = sender_email
+        self.sender_password = sender_password
+        self.max_messages = max_messages
+        self.max_attempts = max(1, max_attempts)
+        self.reconnects = 0
+        self._server = None
+        self._session_messages = 0
+
+    def open(self):
+        """Connects now instead of on the first send, so configuration errors surface early."""
+        if self._server is None:
+            self._server = open_smtp_session(self.smtp_server, self.smtp_port, self.sender_email, self.sender_password)
+            self._session_messages = 0
+
+    def _drop(self):
+        server, self._server = self._server, None
+        if server is not None:
+            try:
+                server.close()
+            except Exception:
+                pass # Already broken
+
+    def send(self, recipient_email, msg):
+        """
+        Sends one message (a Message or a rendered string), reconnecting as needed.
+
+        Raises:
+            smtplib.SMTPServerDisconnected: The session could not be kept alive within
+                max_attempts tries.
+            smtplib.SMTPException: Any other rejection (e.g. SMTPRecipientsRefused for a
+                550 to RCPT), without retrying or dropping the session.
+        """
+        message = msg if isinstance(msg, str) else msg.as_string()
+        for attempt in range(1, self.max_attempts + 1):
+            if attempt > 1:
+                self.reconnects += 1
+                time.sleep(SMTP_RECONNECT_DELAY_SECONDS * (attempt - 1))
+            try:
+                self.open()
+                self._server.sendmail(self.sender_email, recipient_email, message)
+            except smtplib.SMTPAuthenticationError:
+                self._drop()
+                raise
+            except smtplib.SMTPResponseException as e:
+                if e.smtp_code != 421:
+                    raise # The session is fine; the message was rejected
+                self._drop()
+                error = e
+            except smtplib.SMTPServerDisconnected as e:
+                self._drop()
+                error = e
+            except smtplib.SMTPException:
+                raise # e.g. SMTPRecipientsRefused: only this message failed (SMTPException subclasses OSError)
+            except OSError as e: # Socket errors: the connection is gone
+                self._drop()
+                error = e
+            else:
+                self._session_messages += 1
+                if self.max_messages and self._session_messages >= self.max_messages:
+                    self.close() # Recycled; the next send reconnects
+                return
+        if isinstance(error, smtplib.SMTPResponseException):
+            raise error
+        raise smtplib.SMTPServerDisconnected(f"SMTP session lost after {self.max_attempts} attempts: {error}")
+
+    def close(self):
+        server, self._server = self._server, None
+        if server is not None:
+            try:
+                server.quit()
+            except Exception:
+                pass # The session may already be gone
+
+class SMTPSenderPool:
+    """
+    Sends messages over several SMTP sessions in parallel.
+
+    Each worker thread opens its own authenticated SMTPSession and pulls jobs from a
+    shared queue until it is empty, so throughput scales with the number of sessions
+    instead of being capped by the round trip of one. Sessions are recycled and
+    reconnected by SMTPSession; a worker only stops once its session cannot be revived. build_message, on_sent and on_failed are called
+    from the worker threads; the delivery log helpers above are safe to call from them.
+
+    With a MailScheduler, every message waits for quota first. Throttling replies (4xx)
+    make all sessions back off and put the job back in the queue instead of failing it,
+    up to max_deferrals times per job; after that the job fails. If the quota wait gets too long, the run pauses and
+    the unsent jobs are returned as 'pending'.
+    """
+
+    def __init__(self, smtp_server, smtp_port, sender_email, sender_password, concurrency=SMTP_CONCURRENCY,
+                 max_messages_per_session=SMTP_MESSAGES_PER_SESSION, max_attempts=SMTP_SEND_ATTEMPTS,
+                 max_deferrals=SMTP_MAX_DEFERRALS):
+        self.smtp_server = smtp_server
+        self.smtp_port = smtp_port
+        self.sender_email = sender_email
+        self.sender_password = sender_password
+        self.concurrency = max(1, concurrency)
+        self.max_messages_per_session = max_messages_per_session
+        self.max_attempts = max_attempts
+        self.max_deferrals = max_deferrals
+        self._lock = threading.Lock()
+
+    def run(self, jobs, build_message, on_sent, on_failed, scheduler=None, checkpoint=None, metrics=None):
+        """
+        Sends one message per job.
+
+        Args:
+            jobs (list): Job dicts; each needs an 'email' key with the recipient address.
+            build_message (callable): build_message(job) -> email.message.Message or the
+                rendered message string (see MessagePrerenderer). Exceptions count as
+                failures with reason 'Error preparing email: ...'.
+            on_sent (callable): on_sent(job) after a message was accepted by the server.
+            on_failed (callable): on_failed(job, reason) for every job that was not sent.
+            scheduler (MailScheduler, optional): Quota pacing and throttling feedback.
+            checkpoint (callable, optional): checkpoint(unsent_jobs), called every
+                CHECKPOINT_EVERY finished jobs so an interrupted run can resume.
+            metrics (StageMetrics, optional): Receives the time from taking each job to
+                finishing it, message rendering included (see RunMetrics.py).
+
+        Returns:
+            dict: 'sent', 'failed', 'deferred' (4xx retries), 'reconnects' (dropped sessions
+                reopened), 'pending' (unsent jobs when paused for quota), 'elapsed' (seconds)
+                and 'rate' (messages per second).
+        """
+        self._queue = queue.Queue()
+        for job in jobs:
+            self._queue.put(job)
+        self._sent = 0
+        self._failed = 0
+        self._deferred = 0
+        self._reconnects = 0
+        self._connect_error = None
+        self._remaining = len(jobs)
+        self._in_flight = {} # worker_id -> job taken from the queue but not finished
+        self._paused = False
+        self._checkpoint = checkpoint
+        self._metrics = metrics
+
+        workers = min(self.concurrency, len(jobs))
+        print(f"Sending {len(jobs)} emails over {workers} SMTP sessions...")
+        start_time = time.monotonic()
+        threads = [
+            threading.Thread(target=self._worker, args=(worker_id, build_message, on_sent, on_failed, scheduler), daemon=True)
+            for worker_id in range(1, workers + 1)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        pending = []
+        while not self._queue.empty():
+            pending.append(self._queue.get_nowait())
+        if not self._paused:
+            # Jobs left over mean no worker could connect (or all lost their sessions)
+            for job in pending:
+                self._failed += 1
+                on_failed(job, f'Sending skipped due to SMTP connection failure: {self._connect_error}')
+            pending = []
+        elapsed = time.monotonic() - start_time
+        rate = self._sent / elapsed if elapsed > 0 else 0.0
+        return {'sent': self._sent, 'failed': self._failed, 'deferred': self._deferred, 'reconnects': self._reconnects,
+                'pending': pending, 'elapsed': elapsed, 'rate': rate}
+
+    def unsent_jobs(self):
+        """Snapshot of queued and in-flight jobs."""
+        with self._queue.mutex:
+            queued = list(self._queue.queue)
+        with self._lock:
+            return list(self._in_flight.values()) + queued
+
+    def _worker(self, worker_id, build_message, on_sent, on_failed, scheduler):
+        session = SMTPSession(self.smtp_server, self.smtp_port, self.sender_email, self.sender_password,
+                              max_messages=self.max_messages_per_session, max_attempts=self.max_attempts)
+        try:
+            session.open()
+        except Exception as e:
+            with self._lock:
+                print(f"Worker {worker_id}: Error connecting to SMTP server: {e}")
+                self._connect_error = e
+            log_email_error('N/A', 'N/A', f'SMTP Connection/Login Failed: {e}')
+            return
+        try:
+            while not self._paused:
+                try:
+                    job = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                with self._lock:
+                    self._in_flight[worker_id] = job
+                if scheduler and not scheduler.acquire():
+                    self._requeue(worker_id, job)
+                    with self._lock:
+                        if not self._paused:
+                            self._paused = True
+                            print(f"Quota exhausted for the next {scheduler.paused_for / 60:.0f} minutes. Pausing the campaign.")
+                    break
+                if not self._send(worker_id, session, job, build_message, on_sent, on_failed, scheduler):
+                    break # Session lost
+        finally:
+            session.close()
+            with self._lock:
+                self._reconnects += session.reconnects
+
+    def _requeue(self, worker_id, job):
+        with self._lock:
+            self._in_flight.pop(worker_id, None)
+        self._queue.put(job)
+
+    def _send(self, worker_id, session, job, build_message, on_sent, on_failed, scheduler):
+        """Sends one job. Returns False if the session is no longer usable."""
+        started = time.perf_counter()
+        recipient_email = job['email']
+        try:
+            msg = build_message(job)
+        except Exception as e:
+            self._finish(worker_id, False, f"Error preparing email for {recipient_email}: {e}", started)
+            on_failed(job, f'Error preparing email: {e}')
+            return True
+        try:
+            session.send(recipient_email, msg)
+        except smtplib.SMTPServerDisconnected as e:
+            # Reconnecting failed too: leave the job for the other sessions
+            self._requeue(worker_id, job)
+            print(f"Worker {worker_id}: SMTP session lost ({e}).")
+            with self._lock:
+                self._connect_error = e
+            return False
+        except smtplib.SMTPResponseException as e:
+            if scheduler and 400 <= e.smtp_code < 500:
+                # Temporary rejection (rate limit, greylisting): slow down and retry the job later
+                job['deferrals'] = job.get('deferrals', 0) + 1 # Saved with the queue, so it survives a pause
+                scheduler.on_throttled(job['deferrals']) # Senders back off longer for each rejection
+                if self.max_deferrals and job['deferrals'] >= self.max_deferrals:
+                    # Full mailbox, greylisting that never clears, ...: stop retrying this recipient
+                    self._finish(worker_id, False, f"Giving up on {recipient_email} after {job['deferrals']} temporary rejections: {e}", started)
+                    on_failed(job, f"Temporarily rejected {job['deferrals']} times: {e}")
+                    return e.smtp_code != 421
+                self._requeue(worker_id, job)
+                with self._lock:
+                    self._deferred += 1
+                return e.smtp_code != 421 # Repeated 421s: the session could not be revived
+            self._finish(worker_id, False, f"Error sending email to {recipient_email}: {e}", started)
+            on_failed(job, f'Sending failed: {e}')
+            return True
+        except Exception as e:
+            self._finish(worker_id, False, f"Error sending email to {recipient_email}: {e}", started)
+            on_failed(job, f'Sending failed: {e}')
+            return True
+        if scheduler:
+            scheduler.on_success()
+        self._finish(worker_id, True, f"Email sent to {recipient_email}", started)
+        on_sent(job)
+        return True
+
+    def _finish(self, worker_id, sent, message, started):
+        if self._metrics is not None:
+            self._metrics.observe(time.perf_counter() - started)
+        with self._lock:
+            self._in_flight.pop(worker_id, None)
+            if sent:
+                self._sent += 1
+            else:
+                self._failed += 1
+            self._remaining -= 1
+            # Printed under the lock so lines from different workers don't interleave
+            print(f"{message}. Remaining candidates: {self._remaining}")
+            finished = self._sent + self._failed
+        if self._checkpoint and finished % CHECKPOINT_EVERY == 0:
+            self._checkpoint(self.unsent_jobs())
+
+# --- QR Code Emails ---
+
+def format_participant_name(full_name):
+    """Formats a name as 'First Middle LAST' for the email greeting."""
+    full_name = full_name.strip() if isinstance(full_name, str) else 'Participant' # NaN for empty CSV cells
+    formatted_name = 'Participant'
+    if full_name and full_name != 'Participant':
+        name_parts = full_name.split()
+        if len(name_parts) > 1:
+            last_name = name_parts[-1].upper()
+            first_middle_names = [name.capitalize() for name in name_parts[:-1]]
+            formatted_name = " ".join(first_middle_names) + " " + last_name
+        elif len(name_parts) == 1:
+            formatted_name = name_parts[0].capitalize()
+    return formatted_name
+
+def build_qr_email(sender_email, recipient_email, full_name, qr_file_path, subject=QR_EMAIL_SUBJECT):
+    """Builds the e-ticket email with the designed QR code attached."""
+    body = QR_EMAIL_BODY.format(name=format_participant_name(full_name))
+    msg = MIMEMultipart()
+    msg['From'] = sender_email
+    msg['To'] = recipient_email
+    msg['Subject'] = subject
+    msg.attach(MIMEText(body, 'plain'))
+
+    with open(qr_file_path, 'rb') as attachment:
+        part = MIMEBase('application', 'octet-stream')
+        part.set_payload(attachment.read())
+    encoders.encode_base64(part)
+    part.add_header(
+        'Content-Disposition',
+        f'attachment; filename={os.path.basename(qr_file_path)}',
+    )
+    msg.attach(part)
+    return msg
+
+class QREmailTemplate:
+    """
+    Renders the e-ticket email straight to its wire format.
+
+    The headers, MIME boundary and part headers are built once; each message only
+    fills in the recipient, the greeting and the base64 QR attachment. The result is
+    the same MIME structure build_qr_email() produces, without building and
+    serializing a Message object per recipient.
+    """
+
+    def __init__(self, sender_email, subject=QR_EMAIL_SUBJECT):
+        # Base64 content never contains '=' runs, so the boundary cannot collide with it
+        boundary = '=' * 15 + uuid.uuid4().hex + '=='
+        if not subject.isascii():
+            subject = Header(subject, 'utf-8').encode()
+        self._head = (
+            f'Content-Type: multipart/mixed; boundary="{boundary}"\n'
+            'MIME-Version: 1.0\n'
+            f'From: {sender_email}\n'
+        )
+        self._subject = f'Subject: {subject}\n\n'
+        self._text_part = (
+            f'--{boundary}\n'
+            'Content-Type: text/plain; charset="utf-8"\n'
+            'MIME-Version: 1.0\n'
+            'Content-Transfer-Encoding: base64\n\n'
+        )
+        self._attachment_part = (
+            f'\n--{boundary}\n'
+            'Content-Type: application/octet-stream\n'
+            'MIME-Version: 1.0\n'
+            'Content-Transfer-Encoding: base64\n'
+        )
+        self._end = f'\n--{boundary}--\n'
+
+    def render(self, recipient_email, full_name, qr_file_path, *more_qr_file_paths):
+        """Returns the complete message as a string, ready for sendmail(). Every QR file is attached."""
+        body = QR_EMAIL_BODY.format(name=format_participant_name(full_name))
+        parts = [self._head, f'To: {recipient_email}\n', self._subject,
+                 self._text_part, base64.encodebytes(body.encode('utf-8')).decode('ascii')]
+        for path in (qr_file_path,) + more_qr_file_paths:
+            with open(path, 'rb') as attachment:
+                data = attachment.read()
+            parts += [self._attachment_part, f'Content-Disposition: attachment; filename={os.path.basename(path)}\n\n',
+                      base64.encodebytes(data).decode('ascii')]
+        parts.append(self._end)
+        return ''.join(parts)
+
+# --- Message Pre-rendering ---
+
+_render_template = None # Per render process, set by _init_qr_renderer
+
+def _init_qr_renderer(sender_email, subject):
+    global _render_template
+    _render_template = QREmailTemplate(sender_email, subject)
+
+def qr_job_attachments(job):
+    """QR files attached to a job's email (all tickets of the address; queues saved by older versions have one)."""
+    return job.get('qr_paths') or [job['qr_path']]
+
+def _render_qr_job(job):
+    return _render_template.render(job['email'], job['name'], *qr_job_attachments(job))
+
+class MessagePrerenderer:
+    """
+    Renders messages in a process pool ahead of the SMTP senders.
+
+    Up to `window` jobs, taken in queue order, are rendered in the background. Use get
+    as an SMTPSenderPool build_message callable: it returns the finished message of a
+    job (waiting only if rendering has fallen behind) and submits the next jobs, so CPU
+    work for upcoming messages overlaps the network I/O of the current ones while
+    memory stays bounded by the window. Jobs that are not in the prefetch window (e.g.
+    requeued after throttling) are rendered on demand.
+    """
+
+    def __init__(self, jobs, render, initializer=None, initargs=(), workers=MAIL_RENDER_WORKERS, window=MAIL_RENDER_WINDOW):
+        self._jobs = jobs
+        self._render = render
+        self._window = max(1, window)
+        self._executor = ProcessPoolExecutor(max_workers=max(1, workers), initializer=initializer, initargs=initargs)
+        self._futures = {} # id(job) -> Future
+        self._taken = set() # id(job) of jobs already handed out
+        self._next = 0
+        self._lock = threading.Lock()
+        with self._lock:
+            self._fill()
+
+    def _fill(self):
+        while len(self._futures) < self._window and self._next < len(self._jobs):
+            job = self._jobs[self._next]
+            self._next += 1
+            if id(job) not in self._taken and id(job) not in self._futures:
+                self._futures[id(job)] = self._executor.submit(self._render, job)
+
+    def get(self, job):
+        """Returns the rendered message of a job. Rendering errors are raised here."""
+        with self._lock:
+            future = self._futures.pop(id(job), None)
+            if future is None:
+                future = self._executor.submit(self._render, job)
+            self._taken.add(id(job))
+            self._fill()
+        return future.result()
+
+    def close(self):
+        self._executor.shutdown(wait=True, cancel_futures=True)
+
+def _checkpoint(delivery_log, scheduler, source, unsent):
+    """Commits the delivery log before saving the queue, so a resumed run never resends."""
+    delivery_log.flush()
+    scheduler.save(source, unsent)
+
+def send_qr_codes(csv_path, qr_dir, sender_email, sender_password, smtp_server, smtp_port, concurrency=SMTP_CONCURRENCY,
+                  scheduler=None, render_workers=MAIL_RENDER_WORKERS, plan_path=None, metrics=None):
     """
     Send QR codes via email.
 
@@ -127,51 +585,70 @@ def send_qr_codes(csv_path, qr_dir, sender_email, sender_password, smtp_server,
         sender_password (str): Sender's email password.
         smtp_server (str): SMTP server address.
         smtp_port (int): SMTP server port.
+        concurrency (int): Number of parallel SMTP sessions (default: SMTP_CONCURRENCY).
+        scheduler (MailScheduler, optional): Quota pacing; defaults to the 'qr' campaign with
+            the MAIL_PER_MINUTE / MAIL_PER_DAY limits.
+        render_workers (int): Processes pre-rendering messages (default: MAIL_RENDER_WORKERS);
+            0 renders in the sending threads.
+        plan_path (str, optional): Campaign plan to send from if the file exists (see
+            CampaignPlanner.py); otherwise the CSV is planned and the plan written there
+            (default: output/plans/<input>_qr_plan.csv).
+        metrics (StageMetrics, optional): Receives the time spent on each email (see RunMetrics.py).
     """
-    try:
-        df = pd.read_csv(csv_path, dtype=str)
-    except FileNotFoundError:
-        print(f"Error: CSV file not found at '{csv_path}'")
-        log_email_error('N/A', 'N/A', f'Input CSV not found: {csv_path}')
-        return
-    except Exception as e:
-        print(f"Error reading CSV file '{csv_path}': {e}")
-        log_email_error('N/A', 'N/A', f'Error reading CSV: {e}')
-        return
+    if scheduler is None:
+        scheduler = MailScheduler('qr')
+    source = MailScheduler.fingerprint(csv_path)
 
-    sent_emails = get_sent_emails()
-    print(f"Found {len(sent_emails)} previously sent emails in log file.")
+    delivery_log = get_delivery_log('qr')
+    print(f"Found {len(delivery_log.sent_emails())} previously sent emails in the delivery log.")
 
-    # --- Pre-calculate skips and identify candidates ---
     candidates = []
     skipped_already_sent = 0
     skipped_missing_data = 0
     skipped_missing_qr = 0
-    
-    print("Analyzing CSV data and checking prerequisites...")
-    for index, row in df.iterrows():
-        recipient_email = row.get('mail', '').strip()
-        mobile = row.get('mobile', '').strip()
-
-        if not recipient_email or not mobile:
-            skipped_missing_data += 1
-            log_email_error(recipient_email or 'N/A', mobile or 'N/A', 'Missing email or mobile in CSV row')
-            continue
-
-        if recipient_email.lower() in sent_emails:
-            skipped_already_sent += 1
-            continue
-
-        expected_filename = f"{mobile}_designed.png"
-        qr_file_path = os.path.join(qr_dir, expected_filename)
-
-        if not os.path.exists(qr_file_path):
-            skipped_missing_qr += 1
-            log_email_error(recipient_email, mobile, f'Missing designed QR file: {expected_filename}')
-            continue
-            
-        # If all checks pass, add index and details to candidates list
-        candidates.append({'index': index, 'email': recipient_email, 'mobile': mobile, 'qr_path': qr_file_path})
+    skipped_duplicate = 0
+    total_rows = None
+    resumed = scheduler.load_queue(source)
+    if resumed is not None:
+        # A previous run paused (quota) or was interrupted: continue its queue without re-analyzing the CSV
+        candidates = [job for job in resumed if not delivery_log.is_sent(job['email'])]
+        skipped_already_sent = len(resumed) - len(candidates)
+        print(f"Resuming paused campaign with {len(candidates)} queued emails (CSV analysis skipped).")
+    elif plan_path and os.path.exists(plan_path):
+        # A plan written earlier (e.g. by CampaignPlanner.py); rows sent since are skipped at send time
+        plan = read_plan(plan_path)
+        total_rows = len(plan)
+        jobs = plan_jobs(plan, qr_dir)
+        candidates = [job for job in jobs if not delivery_log.is_sent(job['email'])]
+        skipped_already_sent = len(jobs) - len(candidates)
+        print(f"Using campaign plan '{plan_path}' with {len(candidates)} emails to send.")
+    else:
+        try:
+            df = pd.read_csv(csv_path, dtype=str)
+        except FileNotFoundError:
+            print(f"Error: CSV file not found at '{csv_path}'")
+            log_email_error('N/A', 'N/A', f'Input CSV not found: {csv_path}')
+            return
+        except Exception as e:
+            print(f"Error reading CSV file '{csv_path}': {e}")
+            log_email_error('N/A', 'N/A', f'Error reading CSV: {e}')
+            return
+
+        total_rows = len(df)
+
+        # --- Plan the campaign (skips and candidates) in one vectorized pass ---
+        print("Analyzing CSV data and checking prerequisites...")
+        plan = plan_qr_campaign(df, qr_dir, delivery_log.sent_emails())
+        plan_path = plan_path or default_plan_path(csv_path)
+        write_plan(plan, plan_path)
+        counts = plan_counts(plan)
+        skipped_already_sent = counts[SKIP_ALREADY_SENT]
+        skipped_missing_data = counts[SKIP_MISSING_DATA]
+        skipped_missing_qr = counts[SKIP_MISSING_QR]
+        skipped_duplicate = counts[SKIP_DUPLICATE]
+        delivery_log.log_errors(plan_skip_errors(plan))
+        candidates = plan_jobs(plan, qr_dir)
+        print(f"Campaign plan written to '{plan_path}'.")
 
     total_candidates = len(candidates)
     print(f"Identified {total_candidates} emails to attempt sending.")
@@ -179,102 +656,48 @@ def send_qr_codes(csv_path, qr_dir, sender_email, sender_password, smtp_server,
     # --- Initialize counters for sending process ---
     sent_count = 0
     failed_send_count = 0
-    processed_candidates_count = 0
+    deferred_count = 0
+    reconnect_count = 0
+    pending = []
+    send_rate = 0.0
 
     if total_candidates == 0:
         print("No emails to send after filtering.")
     else:
-        # --- Connect to SMTP Server ---
-        server = None
+        # --- Render messages in a process pool while the SMTP sessions send ---
+        template_args = (sender_email, QR_EMAIL_SUBJECT)
+        prerenderer = None
+        if render_workers > 0:
+            prerenderer = MessagePrerenderer(candidates, _render_qr_job, initializer=_init_qr_renderer,
+                                             initargs=template_args, workers=render_workers)
+            build_message = prerenderer.get
+        else:
+            template = QREmailTemplate(*template_args)
+            build_message = lambda candidate: template.render(candidate['email'], candidate['name'], *qr_job_attachments(candidate))
+        pool = SMTPSenderPool(smtp_server, smtp_port, sender_email, sender_password, concurrency=concurrency)
         try:
-            server = smtplib.SMTP(smtp_server, smtp_port)
-            server.starttls()
-            server.login(sender_email, sender_password)
-            print("Logged in to the SMTP server successfully.")
-        except Exception as e:
-            print(f"Error connecting to SMTP server: {e}")
-            log_email_error('N/A', 'N/A', f'SMTP Connection/Login Failed: {e}')
-            # Log error for all candidates since connection failed
-            for candidate in candidates:
-                 log_email_error(candidate['email'], candidate['mobile'], f'Sending skipped due to SMTP connection failure: {e}')
-            failed_send_count = total_candidates # Mark all as failed for summary
-            candidates = [] # Clear candidates as we can't process them
-
-        # --- Process Candidates ---
-        if server: # Proceed only if connection was successful
-            for candidate in candidates:
-                processed_candidates_count += 1
-                remaining_candidates = total_candidates - processed_candidates_count
-                
-                index = candidate['index']
-                recipient_email = candidate['email']
-                mobile = candidate['mobile']
-                qr_file_path = candidate['qr_path']
-                row = df.loc[index] # Get the full row data for name formatting
-
-                # --- Prepare Email ---
-                subject = "AI Summit Erzurum E-Biletiniz"
-                full_name = row.get('isim', 'Participant').strip()
-                formatted_name = 'Participant'
-                if full_name and full_name != 'Participant':
-                    name_parts = full_name.split()
-                    if len(name_parts) > 1:
-                        last_name = name_parts[-1].upper()
-                        first_middle_names = [name.capitalize() for name in name_parts[:-1]]
-                        formatted_name = " ".join(first_middle_names) + " " + last_name
-                    elif len(name_parts) == 1:
-                        formatted_name = name_parts[0].capitalize()
-                
-                body = (
-                    f"Sevgili {formatted_name},\n\n"
-                    "Zirveye katılım için hazırladığımız e-biletiniz ekte yer almaktadır.\n\n"
-                    "Lütfen etkinlik alanında E-Biletinizi hazır bulundurunuz.❗❗\n\n"
-                    "Heyecan dolu bu deneyimin bir parçası olmaya hazır olun! Sizlerle buluşmak için sabırsızlanıyoruz.\n\n"
-                    "Etkinlik detayları ve güncellemeler için bizi Instagram’dan takip etmeyi unutmayın:\n\n"
-                    "https://www.instagram.com/atauniaisummiterzurum\n\n"
-                    "Görüşmek üzere!\n"
-                    "ATASOFT Ekibi"
-                )
-                msg = MIMEMultipart()
-                msg['From'] = sender_email
-                msg['To'] = recipient_email
-                msg['Subject'] = subject
-                msg.attach(MIMEText(body, 'plain'))
-
-                # --- Attach QR Code ---
-                try:
-                    with open(qr_file_path, 'rb') as attachment:
-                        part = MIMEBase('application', 'octet-stream')
-                        part.set_payload(attachment.read())
-                    encoders.encode_base64(part)
-                    part.add_header(
-                        'Content-Disposition',
-                        f'attachment; filename={os.path.basename(qr_file_path)}',
-                    )
-                    msg.attach(part)
-                except Exception as e:
-                    print(f"Error attaching QR code {qr_file_path} for {recipient_email}: {e}")
-                    failed_send_count += 1
-                    log_email_error(recipient_email, mobile, f'Error attaching QR file: {e}')
-                    print(f"Failed attaching for {recipient_email}. Remaining candidates: {remaining_candidates}")
-                    continue # Skip to next candidate
-
-                # --- Send Email ---
-                try:
-                    server.sendmail(sender_email, recipient_email, msg.as_string())
-                    print(f"Email sent to {recipient_email}. Remaining candidates: {remaining_candidates}")
-                    record_sent_email(recipient_email, mobile)
-                    sent_count += 1
-                except Exception as e:
-                    print(f"Error sending email to {recipient_email}: {e}")
-                    failed_send_count += 1
-                    log_email_error(recipient_email, mobile, f'Sending failed: {e}')
-                    print(f"Failed sending to {recipient_email}. Remaining candidates: {remaining_candidates}")
-            
-            # --- Close SMTP Connection ---
-            if server:
-                server.quit()
-                print("SMTP server connection closed.")
+            result = pool.run(
+                candidates,
+                build_message=build_message,
+                on_sent=lambda candidate: delivery_log.record_sent(candidate['email'], candidate['mobile']),
+                on_failed=lambda candidate, reason: delivery_log.log_error(candidate['email'], candidate['mobile'], reason),
+                scheduler=scheduler,
+                checkpoint=lambda unsent: _checkpoint(delivery_log, scheduler, source, unsent),
+                metrics=metrics,
+            )
+        finally:
+            if prerenderer:
+                prerenderer.close()
+        sent_count = result['sent']
+        failed_send_count = result['failed']
+        deferred_count = result['deferred']
+        reconnect_count = result['reconnects']
+        pending = result['pending']
+        send_rate = result['rate']
+        print(f"SMTP sessions closed. Sent {sent_count} emails in {result['elapsed']:.1f}s ({send_rate:.1f} messages/s).")
+    # Persist the log, quota levels and whatever is still queued (nothing once the campaign is complete)
+    delivery_log.flush()
+    scheduler.save(source, pending)
 
     # --- Final Summary ---
     print("\nEmail Sending Summary:")
@@ -282,10 +705,19 @@ def send_qr_codes(csv_path, qr_dir, sender_email, sender_password, smtp_server,
     print(f" - Skipped (already sent): {skipped_already_sent}")
     print(f" - Skipped (missing data): {skipped_missing_data}")
     print(f" - Skipped (missing QR): {skipped_missing_qr}")
+    print(f" - Skipped (duplicate ticket in CSV): {skipped_duplicate}")
     print(f" - Failed to send/attach (out of {total_candidates} candidates): {failed_send_count}")
-    print(f" - Total rows in CSV: {len(df)}")
-    print(f"Note: Errors/skips logged to '{EMAIL_ERROR_LOG_FILE}'")
-    print("All emails have been processed.")
+    print(f" - Throttled and retried (4xx): {deferred_count}")
+    print(f" - SMTP reconnects: {reconnect_count}")
+    print(f" - Throughput: {send_rate:.1f} messages/s")
+    if total_rows is not None:
+        print(f" - Total rows in CSV: {total_rows}")
+    print(f"Note: Errors/skips logged to '{DELIVERY_LOG_PATH}' (python DeliveryLog.py export errors <csv>)")
+    if pending:
+        print(f"Campaign paused at the sending quota with {len(pending)} emails queued in '{scheduler.state_file}'. "
+              "Run again later to continue where it stopped.")
+    else:
+        print("All emails have been processed.")
 
 # --- Main block for debugging ---
 if __name__ == "__main__":
@@ -293,98 +725,54 @@ if __name__ == "__main__":
 
     DESIGNED_QR_DIR = os.path.join('output', 'designed_qr')
     SENDER_EMAIL = os.getenv('SENDER_EMAIL')
-    SENDER_PASSWORD = os.getenv('SENDER_PASSWORD')
+    SENDER_PASSWORD = os.getenv('SENDER_PASSWORD') # May be empty for a local SMTP sink
     SMTP_SERVER = os.getenv('SMTP_SERVER')
     SMTP_PORT_STR = os.getenv('SMTP_PORT')
 
-    DEFAULT_RECIPIENT_EMAIL = "yildirimciomer237@gmail.com"
-    DEFAULT_MOBILE = "5380718571"
-    DEFAULT_NAME = "Test User"
+    # The test email goes to an address you control; nothing is sent unless it is set
+    DEBUG_RECIPIENT_EMAIL = os.getenv('DEBUG_RECIPIENT_EMAIL')
+    DEBUG_MOBILE = os.getenv('DEBUG_MOBILE')
+    DEBUG_NAME = "Test User"
+
+    if not all([DEBUG_RECIPIENT_EMAIL, DEBUG_MOBILE]):
+        print("Error: Set DEBUG_RECIPIENT_EMAIL and DEBUG_MOBILE (a mobile number with a designed QR code) in the .env file.")
+        exit(1)
 
-    if not all([SENDER_EMAIL, SENDER_PASSWORD, SMTP_SERVER, SMTP_PORT_STR]):
+    if not all([SENDER_EMAIL, SMTP_SERVER, SMTP_PORT_STR]):
         print("Error: Missing one or more email configuration variables in .env file.")
-        log_email_error(DEFAULT_RECIPIENT_EMAIL, DEFAULT_MOBILE, 'Missing .env configuration for debug send')
+        log_email_error(DEBUG_RECIPIENT_EMAIL, DEBUG_MOBILE, 'Missing .env configuration for debug send', campaign='debug')
         exit(1)
 
     try:
         SMTP_PORT = int(SMTP_PORT_STR)
     except ValueError:
         print(f"Error: Invalid SMTP_PORT value '{SMTP_PORT_STR}'. Must be an integer.")
-        log_email_error(DEFAULT_RECIPIENT_EMAIL, DEFAULT_MOBILE, f'Invalid SMTP_PORT in .env: {SMTP_PORT_STR}')
-        exit(1)
-
-    if not os.path.isdir(DESIGNED_QR_DIR):
-        print(f"Error: Designed QR directory '{DESIGNED_QR_DIR}' not found.")
-        log_email_error(DEFAULT_RECIPIENT_EMAIL, DEFAULT_MOBILE, f'Designed QR directory not found: {DESIGNED_QR_DIR}')
+        log_email_error(DEBUG_RECIPIENT_EMAIL, DEBUG_MOBILE, f'Invalid SMTP_PORT in .env: {SMTP_PORT_STR}', campaign='debug')
         exit(1)
 
-    expected_filename = f"{DEFAULT_MOBILE}_designed.png"
-    qr_file_path = os.path.join(DESIGNED_QR_DIR, expected_filename)
-
+    qr_file_path = os.path.join(DESIGNED_QR_DIR, f"{DEBUG_MOBILE}_designed.png")
     if not os.path.exists(qr_file_path):
-        print(f"Error: Designed QR code for test mobile '{DEFAULT_MOBILE}' not found.")
-        log_email_error(DEFAULT_RECIPIENT_EMAIL, DEFAULT_MOBILE, f'Missing designed QR for test: {expected_filename}')
+        print(f"Error: Designed QR code for test mobile '{DEBUG_MOBILE}' not found at '{qr_file_path}'.")
+        log_email_error(DEBUG_RECIPIENT_EMAIL, DEBUG_MOBILE, f'Missing designed QR for test: {qr_file_path}', campaign='debug')
         exit(1)
 
-    print(f"Attempting to send test email to: {DEFAULT_RECIPIENT_EMAIL}")
+    print(f"Attempting to send test email to: {DEBUG_RECIPIENT_EMAIL}")
     print(f"Using QR code: {qr_file_path}")
 
-    server = None
-    try:
-        server = smtplib.SMTP(SMTP_SERVER, SMTP_PORT)
-        server.starttls()
-        server.login(SENDER_EMAIL, SENDER_PASSWORD)
-        print("Logged in to SMTP server successfully for debug send.")
-    except Exception as e:
-        print(f"Error connecting or logging in to SMTP server: {e}")
-        log_email_error(DEFAULT_RECIPIENT_EMAIL, DEFAULT_MOBILE, f'SMTP Connection/Login Failed (Debug): {e}')
-        exit(1)
-
-    subject = "TEST - Your A.I. Summit Erzurum E-Ticket"
-    body = (
-        f"Sevgili {DEFAULT_NAME},\n\n"
-        "Bu bir test e-postasıdır.\n\n"
-        "Zirveye katılım için hazırladığımız e-biletiniz ekte yer almaktadır.\n\n"
-        "Lütfen etkinlik alanında E-Biletinizi hazır bulundurunuz.❗❗\n\n"
-        "Heyecan dolu bu deneyimin bir parçası olmaya hazır olun! Sizlerle buluşmak için sabırsızlanıyoruz.\n\n"
-        "Etkinlik detayları ve güncellemeler için bizi Instagram’dan takip etmeyi unutmayın:\n\n"
-        "https://www.instagram.com/atauniaisummiterzurum\n\n"
-        "Görüşmek üzere!\n"
-        "ATASOFT Ekibi"
-    )
-    msg = MIMEMultipart()
-    msg['From'] = SENDER_EMAIL
-    msg['To'] = DEFAULT_RECIPIENT_EMAIL
-    msg['Subject'] = subject
-    msg.attach(MIMEText(body, 'plain'))
-
-    try:
-        with open(qr_file_path, 'rb') as attachment:
-            part = MIMEBase('application', 'octet-stream')
-            part.set_payload(attachment.read())
-        encoders.encode_base64(part)
-        part.add_header(
-            'Content-Disposition',
-            f'attachment; filename={os.path.basename(qr_file_path)}',
-        )
-        msg.attach(part)
-        print("Test QR code attached successfully.")
-    except Exception as e:
-        print(f"Error attaching test QR code {qr_file_path}: {e}")
-        log_email_error(DEFAULT_RECIPIENT_EMAIL, DEFAULT_MOBILE, f'Error attaching test QR: {e}')
-        if server: server.quit()
-        exit(1)
-
+    session = SMTPSession(SMTP_SERVER, SMTP_PORT, SENDER_EMAIL, SENDER_PASSWORD)
     try:
-        server.sendmail(SENDER_EMAIL, DEFAULT_RECIPIENT_EMAIL, msg.as_string())
-        print(f"Test email successfully sent to {DEFAULT_RECIPIENT_EMAIL}")
+        session.open()
+        print("Connected to SMTP server successfully for debug send.")
+        msg = build_qr_email(SENDER_EMAIL, DEBUG_RECIPIENT_EMAIL, DEBUG_NAME, qr_file_path,
+                             subject="TEST - Your A.I. Summit Erzurum E-Ticket")
+        session.send(DEBUG_RECIPIENT_EMAIL, msg)
+        print(f"Test email successfully sent to {DEBUG_RECIPIENT_EMAIL}")
     except Exception as e:
-        print(f"Error sending test email to {DEFAULT_RECIPIENT_EMAIL}: {e}")
-        log_email_error(DEFAULT_RECIPIENT_EMAIL, DEFAULT_MOBILE, f'Test email sending failed: {e}')
+        print(f"Error sending test email to {DEBUG_RECIPIENT_EMAIL}: {e}")
+        log_email_error(DEBUG_RECIPIENT_EMAIL, DEBUG_MOBILE, f'Test email sending failed: {e}', campaign='debug')
     finally:
-        if server:
-            server.quit()
-            print("SMTP server connection closed.")
+        session.close()
+        print("SMTP server connection closed.")
 
-    print(f"Note: Errors/skips logged to '{EMAIL_ERROR_LOG_FILE}'")
+    print(f"Note: Errors/skips logged to '{DELIVERY_LOG_PATH}' (campaign 'debug')")
     print("--- MailSender Debug Mode Finished ---")
@@ -0,0 +1,304 @@
+import os
+import sys
+import uuid
+import socket
+import sqlite3
+import argparse
+from datetime import datetime, timezone
+import pandas as pd
+from CommitController import CommitController
+from ParticipantStore import BACKENDS, PARTICIPANT_STORE, MAX_BATCH_SIZE, get_store
+
+# --- Configuration ---
+JOURNAL_DIR = os.path.join('output', 'journal')
+JOURNAL_PATH = os.path.join(JOURNAL_DIR, f"{socket.gethostname()}.sqlite")
+RECONCILE_LEDGER_PATH = os.path.join(JOURNAL_DIR, 'reconcile_ledger.sqlite')
+CSV_UUID_COL = 'UUID'
+CSV_NAME_COL = 'isim'
+CSV_EMAIL_COL = 'mail'
+CSV_PHONE_COL = 'mobile'
+
+def _connect(db_path):
+    db_dir = os.path.dirname(db_path)
+    if db_dir and not os.path.exists(db_dir):
+        os.makedirs(db_dir)
+        print(f"Created directory: {db_dir}")
+    conn = sqlite3.connect(db_path)
+    conn.execute("PRAGMA journal_mode=WAL")
+    # WAL + NORMAL: a power cut can lose the last few scans but never corrupts the journal
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
+
+# --- Gate Journal ---
+
+class CheckinJournal:
+    """
+    Append-only check-in journal for one gate machine.
+
+    The journal holds a copy of the participant table (seeded from *_clean.csv) and a
+    scans table that only ever receives INSERTs. Scanning needs no network at all;
+    every scan is one primary-key lookup and one appended row. Each journal has a
+    random journal ID, so reconciliation can tell journals apart even if two gates
+    share a host name or a journal file is copied twice.
+    """
+
+    def __init__(self, db_path=JOURNAL_PATH, gate=None):
+        self.db_path = db_path
+        self._conn = _connect(db_path)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS participants ("
+            " uuid TEXT PRIMARY KEY, name TEXT, email TEXT, mobile TEXT)"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS scans ("
+            " seq INTEGER PRIMARY KEY AUTOINCREMENT,"
+            " uuid TEXT NOT NULL,"
+            " scanned_at TEXT NOT NULL,"
+            " valid INTEGER NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_scans_uuid ON scans(uuid)")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+        self._conn.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('journal_id', ?)", (str(uuid.uuid4()),))
+        self._conn.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('gate', ?)", (gate or socket.gethostname(),))
+        self._conn.commit()
+        self.journal_id = self._meta('journal_id')
+        self.gate = self._meta('gate')
+
+    def _meta(self, key):
+        row = self._conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def close(self):
+        self._conn.close()
+
+    def seed(self, df):
+        """Replaces the participant table with the rows of a *_clean.csv frame. Scans are kept."""
+        rows = []
+        for uuid_value, name, email, mobile in zip(df[CSV_UUID_COL], df[CSV_NAME_COL], df[CSV_EMAIL_COL], df[CSV_PHONE_COL]):
+            if pd.isna(uuid_value) or not str(uuid_value).strip():
+                continue
+            rows.append((str(uuid_value).strip(),
+                         None if pd.isna(name) else name,
+                         None if pd.isna(email) else email,
+                         None if pd.isna(mobile) else str(mobile)))
+        with self._conn:
+            self._conn.execute("DELETE FROM participants")
+            self._conn.executemany("INSERT OR REPLACE INTO participants (uuid, name, email, mobile) VALUES (?, ?, ?, ?)", rows)
+            self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('seeded_at', ?)",
+                               (datetime.now(timezone.utc).isoformat(),))
+        print(f"Seeded journal '{self.db_path}' (gate '{self.gate}') with {len(rows)} participants.")
+        return len(rows)
+
+    def record_scan(self, uuid_value):
+        """
+        Looks up a scanned UUID and appends the scan to the journal.
+
+        Returns:
+            dict: The participant ('uuid', 'name', 'email', 'mobile', 'scans') or None if the
+                UUID is unknown. Unknown scans are journaled too, but never reconciled.
+        """
+        uuid_value = uuid_value.strip()
+        row = self._conn.execute("SELECT uuid, name, email, mobile FROM participants WHERE uuid = ?", (uuid_value,)).fetchone()
+        with self._conn:
+            self._conn.execute("INSERT INTO scans (uuid, scanned_at, valid) VALUES (?, ?, ?)",
+                               (uuid_value, datetime.now(timezone.utc).isoformat(), 1 if row else 0))
+        if row is None:
+            return None
+        scans = self._conn.execute("SELECT COUNT(*) FROM scans WHERE uuid = ? AND valid = 1", (uuid_value,)).fetchone()[0]
+        return {'uuid': row[0], 'name': row[1], 'email': row[2], 'mobile': row[3], 'scans': scans}
+
+    def counts(self):
+        """Returns (participants, valid scans, unknown scans)."""
+        participants = self._conn.execute("SELECT COUNT(*) FROM participants").fetchone()[0]
+        valid, unknown = self._conn.execute(
+            "SELECT COALESCE(SUM(valid), 0), COALESCE(SUM(1 - valid), 0) FROM scans"
+        ).fetchone()
+        return participants, valid, unknown
+
+# --- Reconciliation ---
+
+def open_ledger(ledger_path=RECONCILE_LEDGER_PATH):
+    """
+    Opens the reconciliation ledger.
+
+    journals: how far each journal (by journal ID) has been claimed.
+    pending:  aggregated Counter deltas claimed from journals but not yet assigned to a push batch.
+    pushing:  deltas assigned to a push batch (write ID) that the store has not confirmed yet.
+    """
+    conn = _connect(ledger_path)
+    conn.execute("CREATE TABLE IF NOT EXISTS journals (journal_id TEXT PRIMARY KEY, gate TEXT, last_seq INTEGER NOT NULL)")
+    conn.execute("CREATE TABLE IF NOT EXISTS pending (uuid TEXT PRIMARY KEY, delta INTEGER NOT NULL)")
+    conn.execute("CREATE TABLE IF NOT EXISTS pushing ("
+                 " write_id TEXT NOT NULL, uuid TEXT NOT NULL, delta INTEGER NOT NULL, PRIMARY KEY (write_id, uuid))")
+    conn.commit()
+    return conn
+
+def claim_journal_scans(ledger, journal_path):
+    """
+    Moves the not yet reconciled valid scans of one journal into the pending deltas.
+
+    Claiming and advancing the journal position happen in one ledger transaction, so a
+    scan is counted exactly once even if reconciliation is interrupted or rerun.
+
+    Returns:
+        int: Number of scans claimed.
+    """
+    journal = sqlite3.connect(f"file:{journal_path}?mode=ro", uri=True)
+    try:
+        meta = dict(journal.execute("SELECT key, value FROM meta"))
+        journal_id = meta.get('journal_id')
+        row = ledger.execute("SELECT last_seq FROM journals WHERE journal_id = ?", (journal_id,)).fetchone()
+        last_seq = row[0] if row else 0
+        max_seq = journal.execute("SELECT COALESCE(MAX(seq), 0) FROM scans").fetchone()[0]
+        deltas = journal.execute(
+            "SELECT uuid, COUNT(*) FROM scans WHERE valid = 1 AND seq > ? AND seq <= ? GROUP BY uuid",
+            (last_seq, max_seq)
+        ).fetchall()
+    finally:
+        journal.close()
+
+    with ledger:
+        ledger.executemany(
+            "INSERT INTO pending (uuid, delta) VALUES (?, ?) ON CONFLICT(uuid) DO UPDATE SET delta = delta + excluded.delta",
+            deltas
+        )
+        ledger.execute("INSERT OR REPLACE INTO journals (journal_id, gate, last_seq) VALUES (?, ?, ?)",
+                       (journal_id, meta.get('gate'), max_seq))
+    claimed = sum(delta for _, delta in deltas)
+    print(f"Journal '{journal_path}' (gate '{meta.get('gate')}'): claimed {claimed} new scans of {len(deltas)} participants.")
+    return claimed
+
+def stage_push_batches(ledger, batch_size):
+    """
+    Moves all pending deltas into push batches of at most batch_size participants, each
+    with a new write ID, in one ledger transaction. Returns the number of batches.
+    """
+    ledger.execute("BEGIN IMMEDIATE") # No claim can add to pending between the read and the delete
+    try:
+        pending = ledger.execute("SELECT uuid, delta FROM pending WHERE delta != 0").fetchall()
+        rows = []
+        for i in range(0, len(pending), batch_size):
+            write_id = str(uuid.uuid4())
+            rows.extend((write_id, uuid_value, delta) for uuid_value, delta in pending[i:i + batch_size])
+        ledger.executemany("INSERT INTO pushing (write_id, uuid, delta) VALUES (?, ?, ?)", rows)
+        ledger.execute("DELETE FROM pending")
+        ledger.commit()
+    except Exception:
+        ledger.rollback()
+        raise
+    return (len(pending) + batch_size - 1) // batch_size
+
+def load_push_batches(ledger):
+    """All unconfirmed push batches as (write ID, [(uuid, delta), ...]) pairs."""
+    batches = {}
+    for write_id, uuid_value, delta in ledger.execute("SELECT write_id, uuid, delta FROM pushing ORDER BY write_id, uuid"):
+        batches.setdefault(write_id, []).append((uuid_value, delta))
+    return list(batches.items())
+
+def reconcile(store, journal_paths, ledger_path=RECONCILE_LEDGER_PATH, controller=None):
+    """
+    Merges gate journals and pushes the aggregated Counter deltas to the store in bulk.
+
+    Scans from all journals are summed per UUID, so a participant scanned at three gates
+    gets one Increment(3) write. Before pushing, the deltas are grouped into batches
+    with a write ID in the ledger. The store applies each write ID at most once (see
+    ParticipantStore.increment_counters), and a batch leaves the ledger only after the
+    store confirmed it. A batch that failed, or whose confirmation was lost to a crash,
+    is pushed again with the same write ID by the next run and counted once.
+
+    Returns:
+        dict: Counts for 'claimed' scans, 'pushed' and 'failed' documents.
+    """
+    ledger = open_ledger(ledger_path)
+    try:
+        claimed = 0
+        for journal_path in journal_paths:
+            if not os.path.exists(journal_path):
+                print(f"Warning: Journal '{journal_path}' not found. Skipping.")
+                continue
+            claimed += claim_journal_scans(ledger, journal_path)
+
+        if controller is None:
+            controller = CommitController(max_batch_size=MAX_BATCH_SIZE - 1) # One write per batch is the write ID marker
+        stage_push_batches(ledger, controller.batch_size)
+        batches = load_push_batches(ledger) # Includes batches left unconfirmed by earlier runs
+        participants = sum(len(batch) for _, batch in batches)
+        scans = sum(delta for _, batch in batches for _, delta in batch)
+        print(f"Pushing Counter deltas for {participants} participants ({scans} scans) to the {store.name} store...")
+        pushed = 0
+        failed = 0
+        commit = lambda records, write_id: store.increment_counters(records, write_id=write_id)
+        for write_id, batch, error in controller.commit_batches(batches, commit):
+            if error is not None:
+                print(f"Error pushing {len(batch)} deltas: {error}. They stay pending for the next run.")
+                failed += len(batch)
+                continue
+            with ledger:
+                ledger.execute("DELETE FROM pushing WHERE write_id = ?", (write_id,))
+            pushed += len(batch)
+        if batches:
+            controller.print_summary()
+    finally:
+        ledger.close()
+
+    print(f"\nReconciliation Summary ({store.name} store):")
+    print(f" - Scans claimed from journals: {claimed}")
+    print(f" - Participants updated: {pushed}")
+    print(f" - Participants failed (pending): {failed}")
+    return {'claimed': claimed, 'pushed': pushed, 'failed': failed}
+
+# --- Main Execution ---
+def scan_loop(journal):
+    """Reads scanned UUIDs from stdin (USB scanners type the QR payload plus Enter)."""
+    participants, valid, unknown = journal.counts()
+    print(f"Offline check-in at gate '{journal.gate}': {participants} participants, {valid} scans so far. Ctrl+C or empty line to stop.")
+    try:
+        for line in sys.stdin:
+            uuid_value = line.strip()
+            if not uuid_value:
+                break
+            participant = journal.record_scan(uuid_value)
+            if participant is None:
+                print(f"UNKNOWN  {uuid_value}")
+            else:
+                print(f"OK       {participant['name']} (scan #{participant['scans']})")
+    except KeyboardInterrupt:
+        pass
+    participants, valid, unknown = journal.counts()
+    print(f"\nJournal '{journal.db_path}': {valid} valid scans, {unknown} unknown scans.")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Offline check-in journal with later reconciliation.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    seed_parser = subparsers.add_parser("seed", help="Load participants from a *_clean.csv file into the journal")
+    seed_parser.add_argument("csv_file", help="Path to the *_clean.csv file")
+    seed_parser.add_argument("--journal", default=JOURNAL_PATH, help=f"Journal file (default: {JOURNAL_PATH})")
+    seed_parser.add_argument("--gate", help="Gate name recorded in the journal (default: host name)")
+    scan_parser = subparsers.add_parser("scan", help="Record scans read from stdin")
+    scan_parser.add_argument("--journal", default=JOURNAL_PATH, help=f"Journal file (default: {JOURNAL_PATH})")
+    reconcile_parser = subparsers.add_parser("reconcile", help="Merge journals and push Counter deltas")
+    reconcile_parser.add_argument("journals", nargs='+', help="Journal files collected from the gates")
+    reconcile_parser.add_argument("--ledger", default=RECONCILE_LEDGER_PATH, help=f"Reconciliation ledger (default: {RECONCILE_LEDGER_PATH})")
+    reconcile_parser.add_argument("--backend", choices=BACKENDS, default=PARTICIPANT_STORE, help=f"Participant store backend (default: {PARTICIPANT_STORE})")
+    args = parser.parse_args()
+
+    if args.command == "seed":
+        if not os.path.exists(args.csv_file):
+            print(f"Error: CSV file not found at '{args.csv_file}'")
+            sys.exit(1)
+        journal = CheckinJournal(args.journal, gate=args.gate)
+        journal.seed(pd.read_csv(args.csv_file, dtype=str))
+        journal.close()
+    elif args.command == "scan":
+        if not os.path.exists(args.journal):
+            print(f"Error: Journal '{args.journal}' not found. Seed it first with 'python OfflineCheckin.py seed <csv>'.")
+            sys.exit(1)
+        journal = CheckinJournal(args.journal)
+        scan_loop(journal)
+        journal.close()
+    else:
+        print("--- Starting Check-in Reconciliation ---")
+        store = get_store(args.backend)
+        reconcile(store, args.journals, ledger_path=args.ledger)
+        store.close()
+        print("--- Check-in Reconciliation Finished ---")
@@ -0,0 +1,473 @@
+import os
+import json
+import time
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from datetime import datetime, timezone
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from firebase_admin import firestore
+from google.api_core import exceptions as api_exceptions
+
+# --- Configuration ---
+# Backend used by the scripts unless --backend is given: firestore, sqlite or memory
+PARTICIPANT_STORE = os.getenv('PARTICIPANT_STORE', 'firestore')
+COLLECTION_NAME = os.getenv('FIREBASE_COLLECTION', 'users')
+# One marker document per applied increment batch (write ID), so retried batches are not counted twice
+APPLIED_WRITES_COLLECTION = os.getenv('FIREBASE_APPLIED_WRITES_COLLECTION', f'{COLLECTION_NAME}_applied_writes')
+SQLITE_STORE_PATH = os.path.join('output', 'cache', 'participants.sqlite')
+# Local record of what was last written to Firestore (document ID -> content hash)
+SYNC_MANIFEST_PATH = os.path.join('logs', 'firebase_sync_manifest.json')
+# Per-run commit latency histograms and final batch size/concurrency (see CommitController.py)
+COMMIT_STATS_PATH = os.path.join('logs', 'firestore_commit_stats.json')
+# Attendees are participants whose Counter is greater than this value
+ATTENDEE_MIN_COUNTER = 1
+DELETE_WORKERS = 8
+MAX_BATCH_SIZE = 500 # Firestore limit for writes per batch
+POLL_INTERVAL_SECONDS = 1.0
+
+# --- Document field names ---
+FIELD_NAME = os.getenv('FIREBASE_NAME_FIELD', 'Ad-Soyad')
+FIELD_EMAIL = os.getenv('FIREBASE_EMAIL_FIELD', 'Eposta')
+FIELD_MOBILE = os.getenv('FIREBASE_MOBILE_FIELD', 'Telefon numaranız')
+FIELD_COUNTER = os.getenv('FIREBASE_COUNTER_FIELD', 'Counter')
+# Server timestamp of the last change; lets AttendeeSnapshot.py refresh incrementally
+FIELD_UPDATED_AT = os.getenv('FIREBASE_UPDATED_AT_FIELD', 'UpdatedAt')
+
+BACKENDS = ('firestore', 'sqlite', 'memory')
+
+# --- Store Interface ---
+
+class ParticipantStore(ABC):
+    """
+    Storage backend for participant documents.
+
+    Documents are dicts keyed by document ID (the participant UUID) using the FIELD_*
+    names above. Changes passed to stream_changes callbacks are lists of
+    (change_type, doc_id, data) tuples where change_type is 'ADDED', 'MODIFIED' or 'REMOVED'.
+    """
+    name = 'base'
+    # Manifest used by FirebaseSync change detection; None disables it for this backend
+    sync_manifest_path = None
+    # Where FirebaseSync saves commit statistics; None disables it for this backend
+    commit_stats_path = None
+
+    @abstractmethod
+    def upsert_batch(self, records):
+        """Merges a batch of (doc_id, data) records into the store and stamps UpdatedAt."""
+
+    @abstractmethod
+    def increment_counters(self, records, write_id=None):
+        """
+        Adds delta to Counter for a batch of (doc_id, delta) records and stamps UpdatedAt.
+
+        Increments are not idempotent: a batch that is retried after an ambiguous error
+        (timeout, dropped connection) may be counted twice. With a write_id, the store
+        records the ID atomically with the increments and skips a batch whose ID it has
+        already recorded, so a batch can be retried safely as long as it keeps its ID.
+
+        Returns:
+            bool: False if the batch was skipped because write_id was already applied.
+        """
+
+    @abstractmethod
+    def delete_all(self, workers=DELETE_WORKERS):
+        """Deletes every document. Returns the number of deleted documents."""
+
+    @abstractmethod
+    def list_all(self):
+        """Returns (doc_id, data) for every document."""
+
+    @abstractmethod
+    def query_by_counter(self, min_counter=ATTENDEE_MIN_COUNTER):
+        """Returns (doc_id, data) for every document with Counter > min_counter."""
+
+    @abstractmethod
+    def stream_changes(self, callback):
+        """
+        Calls callback(changes) with all documents as 'ADDED' first, then with every later change.
+        Returns a handle with an unsubscribe() method.
+        """
+
+    def close(self):
+        """Releases resources held by the store."""
+        pass
+
+# --- Firestore Backend ---
+
+class FirestoreStore(ParticipantStore):
+    """Participant store backed by a Firestore collection."""
+    name = 'firestore'
+    sync_manifest_path = SYNC_MANIFEST_PATH
+    commit_stats_path = COMMIT_STATS_PATH
+
+    def __init__(self, db, collection_name=COLLECTION_NAME):
+        self.db = db
+        self.collection_name = collection_name
+        self.collection_ref = db.collection(collection_name)
+
+    def upsert_batch(self, records):
+        batch = self.db.batch()
+        for doc_id, data in records:
+            data = dict(data)
+            data[FIELD_UPDATED_AT] = firestore.SERVER_TIMESTAMP
+            # merge=True updates existing docs or creates new ones
+            batch.set(self.collection_ref.document(doc_id), data, merge=True)
+        batch.commit()
+
+    def increment_counters(self, records, write_id=None):
+        batch = self.db.batch()
+        if write_id is not None:
+            # create() fails if the marker exists, which rejects the whole batch: applied at most once
+            batch.create(self.db.collection(APPLIED_WRITES_COLLECTION).document(write_id),
+                         {'collection': self.collection_name, 'documents': len(records), 'appliedAt': firestore.SERVER_TIMESTAMP})
+        for doc_id, delta in records:
+            # Server-side increment, so concurrent scanners never overwrite each other's counts
+            batch.set(self.collection_ref.document(doc_id),
+                      {FIELD_COUNTER: firestore.Increment(delta), FIELD_UPDATED_AT: firestore.SERVER_TIMESTAMP},
+                      merge=True)
+        try:
+            batch.commit()
+        except api_exceptions.AlreadyExists:
+            return False # An earlier attempt of this batch was applied
+        return True
+
+    def delete_all(self, workers=DELETE_WORKERS, batch_size=MAX_BATCH_SIZE):
+        """
+        Lists document keys only (no bodies), cuts them into partitions of batch_size keys
+        and deletes each partition as one batch on a pool of worker threads. Listing
+        continues while earlier partitions are being deleted.
+        """
+        def delete_partition(doc_refs):
+            batch = self.db.batch()
+            for doc_ref in doc_refs:
+                batch.delete(doc_ref)
+            batch.commit()
+            return len(doc_refs)
+
+        deleted = 0
+        failed = 0
+        start_time = time.monotonic()
+
+        def collect(done_futures):
+            nonlocal deleted, failed
+            for future in done_futures:
+                try:
+                    deleted += future.result()
+                except Exception as e:
+                    failed += 1
+                    print(f"Error deleting a partition: {e}")
+            elapsed = time.monotonic() - start_time
+            rate = deleted / elapsed if elapsed > 0 else 0
+            print(f"Deleted {deleted} documents... ({rate:.0f} docs/s)")
+
+        print(f"Deleting documents in '{self.collection_name}' with {workers} workers (keys-only listing)...")
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            in_flight = set()
+            partition = []
+            # page_size matches the batch size so each listed page becomes one partition
+            for doc_ref in self.collection_ref.list_documents(page_size=batch_size):
+                partition.append(doc_ref)
+                if len(partition) >= batch_size:
+                    in_flight.add(executor.submit(delete_partition, partition))
+                    partition = []
+                    # Bound the number of queued partitions so listing doesn't run far ahead
+                    if len(in_flight) >= workers * 2:
+                        done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                        collect(done)
+            if partition:
+                in_flight.add(executor.submit(delete_partition, partition))
+            if in_flight:
+                done, _ = wait(in_flight)
+                collect(done)
+
+        if failed:
+            print(f"Warning: {failed} partitions failed to delete. Re-run the deletion to remove the remaining documents.")
+        return deleted
+
+    def list_all(self):
+        query = self.collection_ref.select([FIELD_NAME, FIELD_EMAIL, FIELD_MOBILE, FIELD_COUNTER])
+        return [(doc.id, doc.to_dict()) for doc in query.stream()]
+
+    def query_by_counter(self, min_counter=ATTENDEE_MIN_COUNTER):
+        query = self.collection_ref.where(filter=firestore.FieldFilter(FIELD_COUNTER, '>', min_counter))
+        return [(doc.id, doc.to_dict()) for doc in query.stream()]
+
+    def stream_changes(self, callback):
+        def on_snapshot(col_snapshot, changes, read_time):
+            callback([
+                (change.type.name, change.document.id,
+                 change.document.to_dict() if change.type.name != 'REMOVED' else None)
+                for change in changes
+            ])
+        return self.collection_ref.on_snapshot(on_snapshot)
+
+# --- SQLite Backend ---
+
+class _PollingWatch:
+    """Handle returned by SQLiteStore.stream_changes."""
+
+    def __init__(self, thread, stop_event):
+        self._thread = thread
+        self._stop_event = stop_event
+
+    def unsubscribe(self):
+        self._stop_event.set()
+        self._thread.join()
+
+class SQLiteStore(ParticipantStore):
+    """
+    Participant store backed by a local SQLite file.
+
+    Documents are stored as JSON with an indexed Counter column. Every write is appended to a
+    change log, which stream_changes polls. Usable as an offline backend for load tests or as
+    a fast local mirror.
+    """
+    name = 'sqlite'
+
+    def __init__(self, db_path=SQLITE_STORE_PATH):
+        self.db_path = db_path
+        self.sync_manifest_path = db_path + '.manifest.json'
+        db_dir = os.path.dirname(db_path)
+        if db_dir and not os.path.exists(db_dir):
+            os.makedirs(db_dir)
+            print(f"Created directory: {db_dir}")
+        self._lock = threading.Lock()
+        self._conn = self._connect()
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS participants ("
+            " doc_id TEXT PRIMARY KEY,"
+            " data TEXT NOT NULL,"
+            " counter INTEGER NOT NULL DEFAULT 0)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_participants_counter ON participants(counter)")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS changes ("
+            " seq INTEGER PRIMARY KEY AUTOINCREMENT,"
+            " change_type TEXT NOT NULL,"
+            " doc_id TEXT NOT NULL)"
+        )
+        self._conn.execute("CREATE TABLE IF NOT EXISTS applied_writes (write_id TEXT PRIMARY KEY)")
+        self._conn.commit()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA busy_timeout=5000")
+        return conn
+
+    @staticmethod
+    def _decode(data_json):
+        data = json.loads(data_json)
+        updated_at = data.get(FIELD_UPDATED_AT)
+        if isinstance(updated_at, str):
+            data[FIELD_UPDATED_AT] = datetime.fromisoformat(updated_at)
+        return data
+
+    @staticmethod
+    def _counter(data):
+        try:
+            return int(data.get(FIELD_COUNTER) or 0)
+        except (ValueError, TypeError):
+            return 0
+
+    def _apply(self, records, update):
+        """Merges update(existing_data, value) into each (doc_id, value) record. Caller holds the lock."""
+        now = datetime.now(timezone.utc).isoformat()
+        existing = {}
+        doc_ids = [doc_id for doc_id, _ in records]
+        # Look up existing documents in chunks (SQLite caps bound parameters)
+        for i in range(0, len(doc_ids), 900):
+            chunk = doc_ids[i:i + 900]
+            placeholders = ",".join("?" * len(chunk))
+            for doc_id, data_json in self._conn.execute(
+                    f"SELECT doc_id, data FROM participants WHERE doc_id IN ({placeholders})", chunk):
+                existing[doc_id] = json.loads(data_json)
+        rows = []
+        change_rows = []
+        for doc_id, value in records:
+            merged = existing.get(doc_id, {})
+            change_rows.append(('MODIFIED' if doc_id in existing else 'ADDED', doc_id))
+            update(merged, value)
+            merged[FIELD_UPDATED_AT] = now
+            existing[doc_id] = merged
+            rows.append((doc_id, json.dumps(merged, ensure_ascii=False, default=str), self._counter(merged)))
+        self._conn.executemany("INSERT OR REPLACE INTO participants (doc_id, data, counter) VALUES (?, ?, ?)", rows)
+        self._conn.executemany("INSERT INTO changes (change_type, doc_id) VALUES (?, ?)", change_rows)
+        self._conn.commit()
+
+    def upsert_batch(self, records):
+        with self._lock:
+            self._apply(records, lambda merged, data: merged.update(data))
+
+    def increment_counters(self, records, write_id=None):
+        def increment(merged, delta):
+            merged[FIELD_COUNTER] = self._counter(merged) + delta
+        with self._lock:
+            if write_id is not None:
+                if self._conn.execute("SELECT 1 FROM applied_writes WHERE write_id = ?", (write_id,)).fetchone():
+                    return False
+                # Committed by _apply in the same transaction as the increments
+                self._conn.execute("INSERT INTO applied_writes (write_id) VALUES (?)", (write_id,))
+            try:
+                self._apply(records, increment)
+            except Exception:
+                self._conn.rollback() # Keep the marker out of the next commit
+                raise
+        return True
+
+    def delete_all(self, workers=DELETE_WORKERS):
+        with self._lock:
+            deleted = self._conn.execute("SELECT COUNT(*) FROM participants").fetchone()[0]
+            self._conn.execute("INSERT INTO changes (change_type, doc_id) SELECT 'REMOVED', doc_id FROM participants")
+            self._conn.execute("DELETE FROM participants")
+            self._conn.commit()
+        return deleted
+
+    def list_all(self):
+        with self._lock:
+            rows = self._conn.execute("SELECT doc_id, data FROM participants").fetchall()
+        return [(doc_id, self._decode(data_json)) for doc_id, data_json in rows]
+
+    def query_by_counter(self, min_counter=ATTENDEE_MIN_COUNTER):
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT doc_id, data FROM participants WHERE counter > ? ORDER BY doc_id", (min_counter,)
+            ).fetchall()
+        return [(doc_id, self._decode(data_json)) for doc_id, data_json in rows]
+
+    def stream_changes(self, callback, poll_interval=POLL_INTERVAL_SECONDS):
+        stop_event = threading.Event()
+        conn = self._connect() # Own connection for the polling thread
+
+        def poll():
+            # Read the change log position and the initial listing from one consistent snapshot
+            conn.execute("BEGIN")
+            last_seq = conn.execute("SELECT COALESCE(MAX(seq), 0) FROM changes").fetchone()[0]
+            initial = [('ADDED', doc_id, self._decode(data_json))
+                       for doc_id, data_json in conn.execute("SELECT doc_id, data FROM participants")]
+            conn.execute("COMMIT")
+            callback(initial)
+            while not stop_event.wait(poll_interval):
+                rows = conn.execute(
+                    "SELECT c.seq, c.change_type, c.doc_id, p.data FROM changes c"
+                    " LEFT JOIN participants p ON p.doc_id = c.doc_id"
+                    " WHERE c.seq > ? ORDER BY c.seq", (last_seq,)
+                ).fetchall()
+                if not rows:
+                    continue
+                last_seq = rows[-1][0]
+                callback([
+                    (change_type, doc_id, self._decode(data_json) if data_json and change_type != 'REMOVED' else None)
+                    for _, change_type, doc_id, data_json in rows
+                ])
+            conn.close()
+
+        thread = threading.Thread(target=poll, daemon=True)
+        thread.start()
+        return _PollingWatch(thread, stop_event)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+# --- In-Memory Backend ---
+
+class _CallbackWatch:
+    """Handle returned by MemoryStore.stream_changes."""
+
+    def __init__(self, store, callback):
+        self._store = store
+        self._callback = callback
+
+    def unsubscribe(self):
+        with self._store._lock:
+            if self._callback in self._store._listeners:
+                self._store._listeners.remove(self._callback)
+
+class MemoryStore(ParticipantStore):
+    """In-memory participant store for benchmarks and load tests. Listeners are called synchronously."""
+    name = 'memory'
+
+    def __init__(self):
+        self.documents = {}
+        self.applied_writes = set()
+        self._listeners = []
+        self._lock = threading.Lock()
+
+    def _notify(self, changes):
+        for listener in list(self._listeners):
+            listener(changes)
+
+    def upsert_batch(self, records):
+        now = datetime.now(timezone.utc)
+        changes = []
+        with self._lock:
+            for doc_id, data in records:
+                change_type = 'MODIFIED' if doc_id in self.documents else 'ADDED'
+                merged = self.documents.setdefault(doc_id, {})
+                merged.update(data)
+                merged[FIELD_UPDATED_AT] = now
+                changes.append((change_type, doc_id, dict(merged)))
+        self._notify(changes)
+
+    def increment_counters(self, records, write_id=None):
+        now = datetime.now(timezone.utc)
+        changes = []
+        with self._lock:
+            if write_id is not None:
+                if write_id in self.applied_writes:
+                    return False
+                self.applied_writes.add(write_id)
+            for doc_id, delta in records:
+                change_type = 'MODIFIED' if doc_id in self.documents else 'ADDED'
+                merged = self.documents.setdefault(doc_id, {})
+                merged[FIELD_COUNTER] = (merged.get(FIELD_COUNTER) or 0) + delta
+                merged[FIELD_UPDATED_AT] = now
+                changes.append((change_type, doc_id, dict(merged)))
+        self._notify(changes)
+        return True
+
+    def delete_all(self, workers=DELETE_WORKERS):
+        with self._lock:
+            changes = [('REMOVED', doc_id, None) for doc_id in self.documents]
+            self.documents.clear()
+        self._notify(changes)
+        return len(changes)
+
+    def list_all(self):
+        with self._lock:
+            return [(doc_id, dict(data)) for doc_id, data in self.documents.items()]
+
+    def query_by_counter(self, min_counter=ATTENDEE_MIN_COUNTER):
+        with self._lock:
+            return [(doc_id, dict(data)) for doc_id, data in sorted(self.documents.items())
+                    if (data.get(FIELD_COUNTER) or 0) > min_counter]
+
+    def stream_changes(self, callback):
+        with self._lock:
+            initial = [('ADDED', doc_id, dict(data)) for doc_id, data in self.documents.items()]
+            self._listeners.append(callback)
+        callback(initial)
+        return _CallbackWatch(self, callback)
+
+# --- Factory ---
+
+def get_store(backend=PARTICIPANT_STORE, db=None, sqlite_path=SQLITE_STORE_PATH):
+    """
+    Returns a participant store for the given backend name.
+
+    For 'firestore', db may be an existing Firestore client; otherwise Firebase is
+    initialized through FirebaseSync.initialize_firebase_sync.
+    """
+    if backend == 'firestore':
+        if db is None:
+            from FirebaseSync import initialize_firebase_sync # Imported here to avoid a circular import
+            db = initialize_firebase_sync()
+        return FirestoreStore(db)
+    if backend == 'sqlite':
+        return SQLiteStore(sqlite_path)
+    if backend == 'memory':
+        return MemoryStore()
+    raise ValueError(f"Unknown participant store backend '{backend}'. Expected one of: {', '.join(BACKENDS)}")
@@ -0,0 +1,304 @@
+import os
+import json
+import time
+import hashlib
+from datetime import datetime
+from contextlib import nullcontext
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, wait, FIRST_COMPLETED
+from RenderManifest import file_digest, render_key
+
+# --- Configuration ---
+PIPELINE_STATE_PATH = os.path.join('output', '.pipeline_state.json')
+
+# --- Stage Results ---
+STAGE_RAN = 'ran'
+STAGE_SKIPPED = 'unchanged' # Inputs identical to the last successful run
+STAGE_FAILED = 'failed'
+STAGE_DECLINED = 'declined' # Confirmation answered with anything but 'yes'
+STAGE_BLOCKED = 'blocked' # An upstream stage failed or was declined
+
+class Stage:
+    """
+    One step of a Pipeline.
+
+    Args:
+        name (str): Stage name, used by --stages and in the state file.
+        run (callable): run(context) does the work; returning False marks the stage
+            as failed (any other value, including None, is success).
+        inputs (list): Files or directories the stage reads. Their contents (files) or
+            listings with sizes and modification times (directories) are fingerprinted.
+        outputs (list): Files or directories the stage writes. A stage whose outputs are
+            missing runs even if its inputs are unchanged.
+        after (list): Names of the stages that must finish first.
+        params (dict): Settings that affect the result, fingerprinted with the inputs.
+        always_run (bool): Never skip (for stages that track their own progress, like mailing).
+        confirm (str): Question asked before running, unless the pipeline runs with assume_yes.
+        executor (str): Where the stage runs in parallel mode: 'thread' (I/O-bound work,
+            shares the context) or 'process' (CPU-bound work; run must be picklable,
+            e.g. a functools.partial of a module-level function, and gets a copy of the
+            context, so its changes to it are not seen by other stages).
+    """
+
+    def __init__(self, name, run, inputs=(), outputs=(), after=(), params=None, always_run=False, confirm=None,
+                 executor='thread'):
+        if executor not in ('thread', 'process'):
+            raise ValueError(f"Stage '{name}' has unknown executor '{executor}'")
+        self.name = name
+        self.run = run
+        self.inputs = list(inputs)
+        self.outputs = list(outputs)
+        self.after = list(after)
+        self.params = params or {}
+        self.always_run = always_run
+        self.confirm = confirm
+        self.executor = executor
+
+def _execute_stage(name, run, context, metrics=None):
+    """
+    Runs one stage function, measured by metrics (a RunMetrics) if given. Returns
+    (succeeded, seconds, stage report or None). Module-level so process pools can call it.
+    """
+    print(f"\n--- Stage '{name}' ---")
+    start = time.perf_counter()
+    with metrics.stage(name) if metrics is not None else nullcontext():
+        try:
+            ok = run(context) is not False
+        except Exception as e:
+            print(f"Error: Stage '{name}' failed: {type(e).__name__} - {e}")
+            ok = False
+    report = metrics.stages.get(name) if metrics is not None else None
+    return ok, time.perf_counter() - start, report
+
+def path_fingerprint(path):
+    """Content hash of a file, hash of (name, size, mtime) of a directory's entries, None if missing."""
+    if os.path.isdir(path):
+        sha = hashlib.sha256()
+        for entry in sorted(os.scandir(path), key=lambda entry: entry.name):
+            stat = entry.stat()
+            sha.update(f"{entry.name}\0{stat.st_size}\0{stat.st_mtime_ns}\n".encode('utf-8', errors='surrogateescape'))
+        return sha.hexdigest()
+    return file_digest(path)
+
+class Pipeline:
+    """
+    Runs stages in dependency order and skips the ones whose inputs did not change.
+
+    After a stage succeeds, the fingerprint of its inputs and params is written to the
+    state file (output/.pipeline_state.json by default). On the next run, a stage with
+    the same fingerprint whose outputs still exist is skipped. Fingerprints are taken
+    right before a stage runs, so a stage reruns whenever an upstream stage actually
+    changed its files.
+    """
+
+    def __init__(self, stages, state_path=PIPELINE_STATE_PATH):
+        self.stages = {}
+        for stage in stages:
+            if stage.name in self.stages:
+                raise ValueError(f"Duplicate pipeline stage '{stage.name}'")
+            self.stages[stage.name] = stage
+        for stage in stages:
+            for name in stage.after:
+                if name not in self.stages:
+                    raise ValueError(f"Stage '{stage.name}' runs after unknown stage '{name}'")
+        self.order = self._topological_order()
+        self.state_path = state_path
+        self.state = self._load_state()
+
+    def _topological_order(self):
+        """Stage names with every stage after its dependencies, otherwise in declaration order."""
+        order, visiting, done = [], set(), set()
+        def visit(name):
+            if name in done:
+                return
+            if name in visiting:
+                raise ValueError(f"Pipeline stages form a cycle through '{name}'")
+            visiting.add(name)
+            for dependency in self.stages[name].after:
+                visit(dependency)
+            visiting.discard(name)
+            done.add(name)
+            order.append(name)
+        for name in self.stages:
+            visit(name)
+        return order
+
+    def select(self, targets=None):
+        """The stages needed for targets (all stages if None): the targets plus everything upstream, in run order."""
+        if targets is None:
+            return list(self.order)
+        unknown = [name for name in targets if name not in self.stages]
+        if unknown:
+            raise ValueError(f"Unknown pipeline stage(s): {', '.join(unknown)}")
+        needed = set()
+        pending = list(targets)
+        while pending:
+            name = pending.pop()
+            if name not in needed:
+                needed.add(name)
+                pending.extend(self.stages[name].after)
+        return [name for name in self.order if name in needed]
+
+    def _load_state(self):
+        if not os.path.exists(self.state_path):
+            return {}
+        try:
+            with open(self.state_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (IOError, ValueError) as e:
+            print(f"Warning: Could not read pipeline state '{self.state_path}': {e}. Running every stage.")
+            return {}
+
+    def _save_state(self):
+        """Atomically writes the state file."""
+        state_dir = os.path.dirname(self.state_path)
+        if state_dir and not os.path.exists(state_dir):
+            os.makedirs(state_dir)
+        tmp_path = self.state_path + '.tmp'
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self.state, f, indent=2)
+            os.replace(tmp_path, self.state_path)
+        except IOError as e:
+            print(f"Warning: Could not write pipeline state '{self.state_path}': {e}")
+
+    def fingerprint(self, stage):
+        return render_key(
+            stage=stage.name,
+            inputs={path: path_fingerprint(path) for path in stage.inputs},
+            params=stage.params,
+        )
+
+    def is_unchanged(self, stage, fingerprint):
+        if stage.always_run:
+            return False
+        previous = self.state.get(stage.name, {})
+        return previous.get('fingerprint') == fingerprint and all(os.path.exists(path) for path in stage.outputs)
+
+    def _finish_stage(self, stage, fingerprint, ok, elapsed):
+        """Records a finished stage's fingerprint on success. Returns STAGE_RAN or STAGE_FAILED."""
+        if not ok:
+            return STAGE_FAILED
+        self.state[stage.name] = {
+            'fingerprint': fingerprint,
+            'finished_at': datetime.now().isoformat(timespec='seconds'),
+            'seconds': round(elapsed, 3),
+        }
+        self._save_state()
+        return STAGE_RAN
+
+    def _confirmed(self, stage, assume_yes):
+        if not stage.confirm or assume_yes:
+            return True
+        return input(f"{stage.confirm} (yes/no): ").strip().lower() == 'yes'
+
+    def _ready_result(self, stage, results, force):
+        """
+        For a stage that is next in line: its result if it does not need to run
+        (blocked or unchanged), otherwise None. Also returns the fingerprint.
+        """
+        if any(results[dependency] not in (STAGE_RAN, STAGE_SKIPPED) for dependency in stage.after):
+            return STAGE_BLOCKED, None
+        fingerprint = self.fingerprint(stage)
+        if not force and self.is_unchanged(stage, fingerprint):
+            print(f"Stage '{stage.name}' is up to date (inputs unchanged since {self.state[stage.name].get('finished_at')}). Skipping.")
+            return STAGE_SKIPPED, fingerprint
+        return None, fingerprint
+
+    def run(self, targets=None, context=None, assume_yes=False, force=False, parallel=False, metrics=None):
+        """
+        Runs the stages needed for targets one after another, or with parallel=True
+        every stage as soon as the stages it runs after have finished.
+
+        Args:
+            targets (list, optional): Stage names to bring up to date (default: all).
+            context (dict, optional): Shared dict passed to every stage's run function.
+            assume_yes (bool): Do not ask the stages' confirmation questions.
+            force (bool): Run every selected stage, even if its inputs are unchanged.
+            parallel (bool): Run independent stages at the same time, each in a thread
+                or, for executor='process' stages, in a worker process.
+            metrics (RunMetrics, optional): Measures every stage that runs (see RunMetrics.py);
+                stage functions reach their StageMetrics through RunMetrics.current_stage().
+
+        Returns:
+            dict: Stage name -> STAGE_* result, in run order.
+        """
+        context = {} if context is None else context
+        selected = self.select(targets)
+        if parallel:
+            results = self._run_parallel(selected, context, assume_yes, force, metrics)
+        else:
+            results = {}
+            for name in selected:
+                stage = self.stages[name]
+                result, fingerprint = self._ready_result(stage, results, force)
+                if result is None and not self._confirmed(stage, assume_yes):
+                    result = STAGE_DECLINED
+                if result is None:
+                    ok, elapsed, _ = _execute_stage(name, stage.run, context, metrics)
+                    result = self._finish_stage(stage, fingerprint, ok, elapsed)
+                results[name] = result
+        results = {name: results[name] for name in selected}
+        print_summary(results)
+        return results
+
+    def _run_parallel(self, selected, context, assume_yes, force, metrics):
+        """
+        Starts every stage once all stages it runs after have finished, and waits for
+        whichever stage finishes first before looking again.
+
+        Confirmation questions are asked up front, before anything runs, so prompts
+        do not interleave with the output of running stages.
+        """
+        declined = {name for name in selected if not self._confirmed(self.stages[name], assume_yes)}
+        results = {}
+        waiting = list(selected)
+        running = {} # future -> (stage, fingerprint)
+        threads = ThreadPoolExecutor(max_workers=len(selected) or 1, thread_name_prefix='pipeline')
+        processes = None # Started on first use
+        try:
+            while waiting or running:
+                started = True
+                while started: # Skipped stages can unblock others right away
+                    started = False
+                    for name in list(waiting):
+                        stage = self.stages[name]
+                        if any(dependency not in results for dependency in stage.after):
+                            continue
+                        waiting.remove(name)
+                        started = True
+                        result, fingerprint = self._ready_result(stage, results, force)
+                        if result is None and name in declined:
+                            result = STAGE_DECLINED
+                        if result is not None:
+                            results[name] = result
+                            continue
+                        if stage.executor == 'process':
+                            if processes is None:
+                                processes = ProcessPoolExecutor()
+                            future = processes.submit(_execute_stage, name, stage.run, dict(context), metrics)
+                        else:
+                            future = threads.submit(_execute_stage, name, stage.run, context, metrics)
+                        running[future] = (stage, fingerprint)
+                if not running:
+                    break
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    stage, fingerprint = running.pop(future)
+                    try:
+                        ok, elapsed, report = future.result()
+                    except Exception as e: # e.g. the worker process died or the stage could not be pickled
+                        print(f"Error: Stage '{stage.name}' failed: {type(e).__name__} - {e}")
+                        ok, elapsed, report = False, 0.0, None
+                    if metrics is not None:
+                        metrics.add_stage(stage.name, report) # Process stages were measured in the worker
+                    results[stage.name] = self._finish_stage(stage, fingerprint, ok, elapsed)
+        finally:
+            threads.shutdown(wait=True)
+            if processes is not None:
+                processes.shutdown(wait=True)
+        return results
+
+def print_summary(results):
+    print("\nPipeline Summary:")
+    for name, result in results.items():
+        print(f" - {name}: {result}")
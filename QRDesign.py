@@ -1,9 +1,41 @@
 import os
+import sys
 from PIL import Image, ImageDraw, ImageFont # Added ImageDraw, ImageFont
 import pandas as pd
 from FileOperations import create_directory_if_not_exists
+from RenderManifest import RenderManifest, file_digest, render_key
+from RunMetrics import timed_items
 from tqdm import tqdm
 
+DESIGN_QR_SIZE = 1500 # Size of the QR code pasted onto the template
+DESIGN_NAME_OFFSET = 550 # Distance of the name below the QR code
+DESIGN_FONT_PATH = "arial.ttf" # Or specify a full path if needed
+
+def resolve_font_path(font_path):
+    """
+    Returns the file ImageFont.truetype loads for font_path: the path itself if it
+    exists, else the first file of that name in the system font directories PIL
+    searches. None if there is none (the default PIL font is used).
+    """
+    if os.path.exists(font_path):
+        return font_path
+    if sys.platform == "win32":
+        dirs = [os.path.join(os.environ["WINDIR"], "fonts")] if os.environ.get("WINDIR") else []
+    elif sys.platform.startswith("linux"):
+        data_home = os.environ.get("XDG_DATA_HOME") or os.path.expanduser("~/.local/share")
+        data_dirs = os.environ.get("XDG_DATA_DIRS") or "/usr/local/share:/usr/share"
+        dirs = [os.path.join(data_dir, "fonts") for data_dir in [data_home] + data_dirs.split(":")]
+    elif sys.platform == "darwin":
+        dirs = ["/Library/Fonts", "/System/Library/Fonts", os.path.expanduser("~/Library/Fonts")]
+    else:
+        dirs = []
+    font_name = os.path.basename(font_path)
+    for directory in dirs:
+        for root, _, files in os.walk(directory):
+            if font_name in files:
+                return os.path.join(root, font_name)
+    return None
+
 # --- Helper function for Turkish character capitalization ---
 def turkish_capitalize_name(name):
     """Capitalizes a name string respecting Turkish characters."""
@@ -45,16 +77,23 @@ def turkish_capitalize_name(name):
     return " ".join(capitalized_parts)
 # --- End of helper function ---
 
-def overlay_qr_on_template(qr_dir, template_path, output_dir, uuid_column=None, csv_path=None):
+def _design_qr_codes(qr_dir, template_path, output_dir, manifest, csv_path=None, force=False, metrics=None):
     """
-    Overlay QR codes and participant names on a template image. Skips if the designed QR already exists.
+    Overlay QR codes and participant names on a template image.
+
+    A designed QR is only rendered again if one of its inputs changed since the last
+    run: the basic QR code, the name, the template, the font or the layout (see
+    RenderManifest.py). After a template change every ticket is rebuilt, after a name
+    correction only that participant's.
     
     Args:
         qr_dir (str): Directory containing generated QR codes
         template_path (str): Path to the template image
         output_dir (str): Directory to save the designed QR codes
-        uuid_column (str, optional): Column name for UUIDs in CSV (Not directly used here but kept for signature consistency)
+        manifest (RenderManifest): Render manifest of output_dir; the caller closes it
         csv_path (str, optional): Path to the CSV file containing data (mobile, isim)
+        force (bool, optional): Render every designed QR again, even if unchanged
+        metrics (StageMetrics, optional): Receives the time spent on each ticket (see RunMetrics.py)
     """
     create_directory_if_not_exists(output_dir)
     
@@ -62,7 +101,7 @@ def overlay_qr_on_template(qr_dir, template_path, output_dir, uuid_column=None,
     try:
         # Ensure a suitable font file (e.g., Arial) is available
         # You might need to adjust the path or install the font
-        font_path = "arial.ttf" # Or specify a full path if needed
+        font_path = DESIGN_FONT_PATH
         font_size = 100 # Adjust as needed
         font = ImageFont.truetype(font_path, font_size)
         print(f"Loaded font: {font_path}")
@@ -84,9 +123,18 @@ def overlay_qr_on_template(qr_dir, template_path, output_dir, uuid_column=None,
         print(f"Error loading template image: {e}")
         return False
     
+    shared_inputs = {
+        'template': file_digest(template_path),
+        'font': (file_digest(resolve_font_path(font_path) or font_path) or 'default') if font else None,
+        'font_size': font_size,
+        'text_color': list(text_color),
+        'qr_size': DESIGN_QR_SIZE,
+        'name_offset': DESIGN_NAME_OFFSET,
+    }
+
     # Check how to process the QR codes
     processed_count = 0
-    skipped_existing = 0 # Counter for existing designed QRs
+    skipped_existing = 0 # Counter for designed QRs whose inputs have not changed
     skipped_not_found = 0 # Counter for missing basic QRs
     skipped_missing_name = 0 # Counter for missing names in CSV
 
@@ -94,7 +142,7 @@ def overlay_qr_on_template(qr_dir, template_path, output_dir, uuid_column=None,
         # Process based on CSV data
         df = pd.read_csv(csv_path, dtype=str)
         print(f"Processing {len(df)} records from CSV for QR design...")
-        for index, row in tqdm(df.iterrows(), total=len(df), desc="Designing QR codes (CSV)"):
+        for index, row in timed_items(tqdm(df.iterrows(), total=len(df), desc="Designing QR codes (CSV)"), metrics):
             mobile = row.get('mobile', '').strip()
             participant_name = row.get('isim', '').strip() # Get participant name
 
@@ -102,18 +150,20 @@ def overlay_qr_on_template(qr_dir, template_path, output_dir, uuid_column=None,
                 continue # Skip rows with no mobile number
 
             # Construct the expected output path first
-            output_path = os.path.join(output_dir, f"{mobile}_designed.png")
-
-            # Check if the designed QR code file already exists
-            if os.path.exists(output_path):
-                skipped_existing += 1
-                continue
+            output_filename = f"{mobile}_designed.png"
+            output_path = os.path.join(output_dir, output_filename)
 
             # Find the basic QR code file
             qr_file_path = os.path.join(qr_dir, f"{mobile}.png")
             if not os.path.exists(qr_file_path):
                 skipped_not_found += 1
                 continue
+
+            # Skip if the designed QR was already rendered from the same inputs
+            key = render_key(qr=file_digest(qr_file_path), name=participant_name, **shared_inputs)
+            if not force and manifest.is_current(output_filename, key):
+                skipped_existing += 1
+                continue
             
             # Create a copy of the template for each QR code
             new_img = template.copy()
@@ -127,7 +177,7 @@ def overlay_qr_on_template(qr_dir, template_path, output_dir, uuid_column=None,
                 continue # Skip this QR if it can't be opened
 
             # Calculate position to center the QR code on the blue area
-            qr_size = 1500 # Size of the QR code to be pasted
+            qr_size = DESIGN_QR_SIZE
             qr_x_position = (template_width - qr_size) // 2
             qr_y_position = (template_height - qr_size) // 2
             
@@ -164,7 +214,7 @@ def overlay_qr_on_template(qr_dir, template_path, output_dir, uuid_column=None,
                     text_x_position = (template_width - text_width) / 2
                     # Position text below the QR code area
                     # QR bottom edge is at qr_y_position + qr_size
-                    text_y_position = qr_y_position + qr_size + 550 # Adjust vertical spacing if needed
+                    text_y_position = qr_y_position + qr_size + DESIGN_NAME_OFFSET
 
                     # Draw the text
                     try:
@@ -179,6 +229,7 @@ def overlay_qr_on_template(qr_dir, template_path, output_dir, uuid_column=None,
             # Save the result
             try:
                 new_img.save(output_path)
+                manifest.record(output_filename, key)
                 processed_count += 1
             except Exception as save_e:
                  print(f"Error saving designed QR image {output_path} for phone {mobile}: {save_e}")
@@ -189,7 +240,7 @@ def overlay_qr_on_template(qr_dir, template_path, output_dir, uuid_column=None,
         print("Processing QR files directly from directory (CSV not provided)...")
         print("Warning: Participant names will not be added to images in this mode.")
         qr_files = [f for f in os.listdir(qr_dir) if f.endswith('.png')]
-        for qr_file in tqdm(qr_files, desc="Designing QR codes (Dir)"):
+        for qr_file in timed_items(tqdm(qr_files, desc="Designing QR codes (Dir)"), metrics):
             qr_file_path = os.path.join(qr_dir, qr_file)
             base_name = os.path.splitext(qr_file)[0] # Usually the mobile number
 
@@ -197,8 +248,9 @@ def overlay_qr_on_template(qr_dir, template_path, output_dir, uuid_column=None,
             output_filename = f"{base_name}_designed.png"
             output_path = os.path.join(output_dir, output_filename)
 
-            # Check if the designed QR code file already exists
-            if os.path.exists(output_path):
+            # Skip if the designed QR was already rendered from the same inputs
+            key = render_key(qr=file_digest(qr_file_path), name='', **shared_inputs)
+            if not force and manifest.is_current(output_filename, key):
                 skipped_existing += 1
                 continue
 
@@ -213,7 +265,7 @@ def overlay_qr_on_template(qr_dir, template_path, output_dir, uuid_column=None,
                 continue
 
             # Calculate position to center the QR code on the blue area
-            qr_size = 1500
+            qr_size = DESIGN_QR_SIZE
             x_position = (template_width - qr_size) // 2
             y_position = (template_height - qr_size) // 2
             
@@ -230,15 +282,32 @@ def overlay_qr_on_template(qr_dir, template_path, output_dir, uuid_column=None,
             # Save the result
             try:
                 new_img.save(output_path)
+                manifest.record(output_filename, key)
                 processed_count += 1
             except Exception as save_e:
                  print(f"Error saving designed QR image {output_path}: {save_e}")
     
     print(f"\nQR Design Summary:")
     print(f" - Successfully created/overlaid: {processed_count}")
-    print(f" - Skipped (designed QR already exists): {skipped_existing}")
+    print(f" - Skipped (designed QR up to date): {skipped_existing}")
     if csv_path: # Only relevant if processing via CSV
         print(f" - Skipped (basic QR not found): {skipped_not_found}")
         print(f" - Skipped adding name (missing in CSV): {skipped_missing_name}")
     print(f" - Output directory: '{output_dir}'")
     return True
+
+def overlay_qr_on_template(qr_dir, template_path, output_dir, uuid_column=None, csv_path=None, force=False, metrics=None):
+    """
+    Designs the tickets (see _design_qr_codes). The render manifest is saved even if
+    rendering is interrupted, so finished tickets are not rendered again.
+
+    uuid_column is not used; it is kept for signature consistency.
+
+    Returns:
+        bool: False if the template could not be loaded, True otherwise.
+    """
+    manifest = RenderManifest(output_dir, 'designed_qr')
+    try:
+        return _design_qr_codes(qr_dir, template_path, output_dir, manifest, csv_path, force, metrics)
+    finally:
+        manifest.close()
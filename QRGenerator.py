@@ -1,8 +1,9 @@
 import os
 import qrcode
 import pandas as pd
+from RunMetrics import timed_items
 
-def generate_qr_codes_from_csv(csv_path, uuid_column, phone_column, output_dir):
+def generate_qr_codes_from_csv(csv_path, uuid_column, phone_column, output_dir, metrics=None):
     """
     Generate QR codes from a CSV file, using phone numbers for filenames.
     Skips generation if a QR code file for the phone number already exists.
@@ -12,6 +13,7 @@ def generate_qr_codes_from_csv(csv_path, uuid_column, phone_column, output_dir):
         uuid_column (str): Column name for UUIDs (data for QR code).
         phone_column (str): Column name for phone numbers (used for filename).
         output_dir (str): Directory to save the QR codes.
+        metrics (StageMetrics, optional): Receives the time spent on each row (see RunMetrics.py).
     """
     if not os.path.exists(output_dir):
         os.makedirs(output_dir)
@@ -21,7 +23,7 @@ def generate_qr_codes_from_csv(csv_path, uuid_column, phone_column, output_dir):
     skipped_uuid = 0
     skipped_phone = 0
     skipped_existing = 0 # Counter for existing QR codes
-    for index, row in df.iterrows():
+    for index, row in timed_items(df.iterrows(), metrics):
         uuid_value = row.get(uuid_column, '').strip()
         if not uuid_value:
             skipped_uuid += 1
@@ -0,0 +1,140 @@
+import os
+import sys
+import json
+import hashlib
+import argparse
+
+# --- Configuration ---
+RENDER_MANIFEST_NAME = '.render_manifest.json' # Kept inside the output directory it describes
+RENDER_MANIFEST_SAVE_EVERY = 100 # Rendered files recorded between manifest writes
+
+_digest_cache = {} # (path, size, mtime) -> SHA-256, per process
+
+def file_digest(path):
+    """
+    Returns the SHA-256 of a file's contents, or None if it cannot be read.
+
+    Digests are cached per process by (path, size, mtime), so a template or font is
+    read once however many outputs depend on it.
+    """
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    cache_key = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+    digest = _digest_cache.get(cache_key)
+    if digest is None:
+        sha = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                sha.update(block)
+        digest = _digest_cache[cache_key] = sha.hexdigest()
+    return digest
+
+def render_key(**inputs):
+    """Returns a stable hash of the inputs an output file is rendered from."""
+    payload = json.dumps(inputs, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+class RenderManifest:
+    """
+    Output file name -> render key of the rendered files in one output directory.
+
+    A file is re-rendered only if it is missing or its render key changed, i.e. one
+    of its inputs (name, template, font, size, color, position, ...) differs from the
+    last render. Changing the template changes every key and rebuilds everything;
+    renaming one participant rebuilds one file.
+
+    The manifest is <output_dir>/.render_manifest.json. It is written atomically every
+    RENDER_MANIFEST_SAVE_EVERY records and on close(), so an interrupted run only
+    re-renders the files rendered since the last write.
+    """
+
+    def __init__(self, output_dir, kind, save_every=RENDER_MANIFEST_SAVE_EVERY):
+        self.path = os.path.join(output_dir, RENDER_MANIFEST_NAME)
+        self.kind = kind
+        self.save_every = save_every
+        self._entries = self._load()
+        self._unsaved = 0
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return {}
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+        except (IOError, ValueError) as e:
+            print(f"Warning: Could not read render manifest '{self.path}': {e}. Rendering everything again.")
+            return {}
+        if manifest.get('kind') != self.kind:
+            print(f"Warning: Render manifest '{self.path}' belongs to '{manifest.get('kind')}' outputs. Rendering everything again.")
+            return {}
+        return manifest.get('files', {})
+
+    def is_current(self, filename, key):
+        """True if filename exists in the output directory and was rendered from key."""
+        return self._entries.get(filename) == key and os.path.exists(os.path.join(os.path.dirname(self.path), filename))
+
+    def record(self, filename, key):
+        """Marks filename as rendered from key."""
+        self._entries[filename] = key
+        self._unsaved += 1
+        if self._unsaved >= self.save_every:
+            self.save()
+
+    def save(self):
+        """Atomically writes the manifest."""
+        manifest_dir = os.path.dirname(self.path)
+        if manifest_dir and not os.path.exists(manifest_dir):
+            os.makedirs(manifest_dir)
+        tmp_path = self.path + '.tmp'
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({'kind': self.kind, 'files': self._entries}, f)
+            os.replace(tmp_path, self.path)
+            self._unsaved = 0
+        except IOError as e:
+            print(f"Warning: Could not write render manifest '{self.path}': {e}")
+
+    def close(self):
+        if self._unsaved:
+            self.save()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+def clear_render_manifest(output_dir):
+    """Removes the render manifest of output_dir so the next run renders everything again."""
+    path = os.path.join(output_dir, RENDER_MANIFEST_NAME)
+    if os.path.exists(path):
+        try:
+            os.remove(path)
+            print(f"Removed render manifest '{path}'.")
+        except OSError as e:
+            print(f"Warning: Could not remove render manifest '{path}': {e}")
+
+# --- Main Execution ---
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Inspect or clear the render manifest of an output directory.")
+    parser.add_argument("output_dir", help="Rendered output directory (e.g. output/certificates or output/designed_qr)")
+    parser.add_argument("--clear", action="store_true", help="Remove the manifest so everything is rendered again")
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.output_dir):
+        print(f"Error: Directory '{args.output_dir}' not found.")
+        sys.exit(1)
+    if args.clear:
+        clear_render_manifest(args.output_dir)
+        sys.exit(0)
+    path = os.path.join(args.output_dir, RENDER_MANIFEST_NAME)
+    if not os.path.exists(path):
+        print(f"No render manifest in '{args.output_dir}'.")
+        sys.exit(0)
+    with open(path, 'r', encoding='utf-8') as f:
+        manifest = json.load(f)
+    files = manifest.get('files', {})
+    present = sum(os.path.exists(os.path.join(args.output_dir, name)) for name in files)
+    print(f"Render manifest '{path}' ({manifest.get('kind')}): {len(files)} files recorded, {present} present on disk.")
@@ -0,0 +1,289 @@
+import os
+import sys
+import json
+import time
+import bisect
+import cProfile
+import argparse
+import threading
+from datetime import datetime
+from contextlib import contextmanager
+
+# --- Configuration ---
+RUN_REPORT_DIR = os.path.join('output', 'reports')
+# Upper bucket bounds in seconds of per-item latencies; the last bucket collects everything slower
+ITEM_LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+class LatencyHistogram:
+    """Fixed-bucket histogram of latencies."""
+
+    def __init__(self, buckets=ITEM_LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, seconds):
+        self.counts[bisect.bisect_left(self.buckets, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+    def percentile(self, p):
+        """Returns the upper bound of the bucket holding the p-th percentile (0-100)."""
+        if not self.count:
+            return 0.0
+        rank = self.count * p / 100.0
+        seen = 0
+        for i, bucket_count in enumerate(self.counts):
+            seen += bucket_count
+            if seen >= rank:
+                return self.buckets[i] if i < len(self.buckets) else self.max
+        return self.max
+
+    def to_dict(self):
+        labels = [f"<={bound}s" for bound in self.buckets] + [f">{self.buckets[-1]}s"]
+        return {
+            'count': self.count,
+            'mean_seconds': round(self.total / self.count, 4) if self.count else 0.0,
+            'max_seconds': round(self.max, 4),
+            'p50_seconds': self.percentile(50),
+            'p95_seconds': self.percentile(95),
+            'p99_seconds': self.percentile(99),
+            'buckets': dict(zip(labels, self.counts)),
+        }
+
+    def format(self):
+        if not self.count:
+            return "no samples"
+        return (f"{self.count} samples, mean {self.total / self.count:.3f}s, p50 <= {self.percentile(50)}s, "
+                f"p95 <= {self.percentile(95)}s, max {self.max:.3f}s")
+
+# --- Memory ---
+def peak_rss_mb():
+    """Peak resident memory of this process in MB (None where it cannot be read)."""
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    try:
+        import resource
+    except ImportError: # Windows
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024 # bytes on macOS, KB on Linux
+
+def children_peak_rss_mb():
+    """Peak resident memory of the largest finished child process (worker pools) in MB, or None."""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+def reset_peak_rss():
+    """Restarts the peak RSS measurement at the current RSS (Linux only; elsewhere peaks cover the whole run)."""
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+    except OSError:
+        pass
+
+def _max_mb(*values):
+    values = [value for value in values if value is not None]
+    return max(values) if values else None
+
+# --- Stage Metrics ---
+class StageMetrics:
+    """
+    Measurements of one stage: wall time, items, per-item latencies and peak RSS.
+
+    Loops time their items with timed_items(); code that handles items in several
+    threads times each item itself and calls observe(seconds). Vectorized code only
+    reports a count with add_items(). All methods are thread-safe.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.items = 0
+        self.latency = LatencyHistogram()
+        self.extra = {} # Stage-specific figures, reported as is
+        self.report = None # Set when the stage finishes
+        self._lock = threading.Lock()
+
+    def observe(self, seconds):
+        with self._lock:
+            self.latency.record(seconds)
+            self.items += 1
+
+    def add_items(self, count):
+        with self._lock:
+            self.items += count
+
+    def finish(self, wall_seconds, peak_mb, profile_path=None):
+        self.report = {
+            'wall_seconds': round(wall_seconds, 3),
+            'items': self.items,
+            'items_per_second': round(self.items / wall_seconds, 2) if wall_seconds > 0 else None,
+            'latency': self.latency.to_dict() if self.latency.count else None,
+            'peak_rss_mb': round(peak_mb, 1) if peak_mb is not None else None,
+        }
+        if profile_path:
+            self.report['profile'] = profile_path
+        if self.extra:
+            self.report.update(self.extra)
+        return self.report
+
+def timed_items(iterable, metrics=None):
+    """
+    Yields the items of iterable. With metrics (a StageMetrics), the loop body run for
+    each item, including items skipped with continue, is recorded as one observation.
+    """
+    if metrics is None:
+        yield from iterable
+        return
+    for item in iterable:
+        start = time.perf_counter()
+        yield item
+        metrics.observe(time.perf_counter() - start)
+
+_local = threading.local()
+
+def current_stage():
+    """The StageMetrics of the stage running in this thread, or None outside RunMetrics.stage()."""
+    return getattr(_local, 'stage', None)
+
+class RunMetrics:
+    """
+    Collects StageMetrics for one run and writes them as a JSON run report.
+
+    Every stage runs inside stage(name). With profile=True, each stage also runs
+    under cProfile and its statistics are written to <report_dir>/<run_id>/<stage>.prof
+    (open with python -m pstats or snakeviz). cProfile only sees the thread that runs
+    the stage, not SMTP worker threads or render processes.
+
+    Peak RSS is restarted at the start of a stage when no other stage is running
+    (Linux), so sequential stages report their own peak; overlapping stages report
+    the process peak during their run. Stages run in worker processes (see
+    Pipeline.py) report the worker's peak and are merged with add_stage().
+    """
+
+    def __init__(self, run_name, profile=False, report_dir=RUN_REPORT_DIR, run_id=None):
+        self.run_name = run_name
+        self.run_id = run_id or f"{run_name}_{datetime.now():%Y%m%d_%H%M%S}"
+        self.profile = profile
+        self.report_dir = report_dir
+        self.started_at = datetime.now()
+        self.stages = {} # stage name -> report dict, in start order
+        self._start = time.perf_counter()
+        self._active = 0
+        self._peak = None # Process peak before the last reset
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        # Sent to worker processes: settings only, stages are reported back with add_stage()
+        return {'run_name': self.run_name, 'run_id': self.run_id, 'profile': self.profile, 'report_dir': self.report_dir}
+
+    def __setstate__(self, state):
+        self.__init__(**state)
+
+    @contextmanager
+    def stage(self, name):
+        """Measures the enclosed block as stage name. Yields its StageMetrics."""
+        stage = StageMetrics(name)
+        with self._lock:
+            if not self._active:
+                self._peak = _max_mb(self._peak, peak_rss_mb())
+                reset_peak_rss()
+            self._active += 1
+            self.stages[name] = None # Keep start order
+        previous, _local.stage = current_stage(), stage
+        profiler = cProfile.Profile() if self.profile else None
+        start = time.perf_counter()
+        try:
+            if profiler:
+                profiler.enable()
+            yield stage
+        finally:
+            if profiler:
+                profiler.disable()
+            elapsed = time.perf_counter() - start
+            _local.stage = previous
+            profile_path = None
+            if profiler:
+                profile_path = os.path.join(self.report_dir, self.run_id, f"{name}.prof")
+                os.makedirs(os.path.dirname(profile_path), exist_ok=True)
+                profiler.dump_stats(profile_path)
+            report = stage.finish(elapsed, peak_rss_mb(), profile_path)
+            with self._lock:
+                self._active -= 1
+                self.stages[name] = report
+            print(f"Stage '{name}': {elapsed:.2f}s, {stage.items} items"
+                  + (f", {report['items_per_second']} items/s" if stage.items and report['items_per_second'] else "")
+                  + (f", latency {stage.latency.format()}" if stage.latency.count else "")
+                  + (f", peak RSS {report['peak_rss_mb']} MB" if report['peak_rss_mb'] is not None else ""))
+
+    def add_stage(self, name, report):
+        """Adds the report of a stage measured elsewhere (e.g. in a worker process)."""
+        if report is not None:
+            with self._lock:
+                self.stages[name] = report
+
+    def report(self):
+        wall_seconds = time.perf_counter() - self._start
+        peak, children_peak = _max_mb(self._peak, peak_rss_mb()), children_peak_rss_mb()
+        return {
+            'run': self.run_id,
+            'started_at': self.started_at.isoformat(timespec='seconds'),
+            'finished_at': datetime.now().isoformat(timespec='seconds'),
+            'wall_seconds': round(wall_seconds, 3),
+            'peak_rss_mb': round(peak, 1) if peak is not None else None,
+            'children_peak_rss_mb': round(children_peak, 1) if children_peak is not None else None,
+            'stages': {name: report for name, report in self.stages.items() if report is not None},
+        }
+
+    def write(self, report_path=None):
+        """Writes the run report (default: <report_dir>/<run_id>.json). Returns its path."""
+        report_path = report_path or os.path.join(self.report_dir, f"{self.run_id}.json")
+        report_dir = os.path.dirname(report_path)
+        if report_dir and not os.path.exists(report_dir):
+            os.makedirs(report_dir)
+        tmp_path = report_path + '.tmp'
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self.report(), f, indent=2)
+            os.replace(tmp_path, report_path)
+            print(f"Run report written to '{report_path}'.")
+        except IOError as e:
+            print(f"Warning: Could not write run report '{report_path}': {e}")
+        return report_path
+
+def print_report(report):
+    print(f"Run {report['run']}: {report['wall_seconds']}s, peak RSS {report['peak_rss_mb']} MB")
+    print(f"  {'stage':<22} {'seconds':>9} {'items':>8} {'items/s':>9} {'p50':>8} {'p95':>8} {'peak MB':>8}")
+    for name, stage in report['stages'].items():
+        latency = stage.get('latency') or {}
+        print(f"  {name:<22} {stage['wall_seconds']:>9} {stage['items']:>8} {str(stage['items_per_second']):>9} "
+              f"{str(latency.get('p50_seconds', '-')):>8} {str(latency.get('p95_seconds', '-')):>8} {str(stage['peak_rss_mb']):>8}")
+
+# --- Main Execution ---
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Show a run report written with --profile/RunMetrics.")
+    parser.add_argument("report", nargs='?', help=f"Run report JSON (default: the newest in {RUN_REPORT_DIR})")
+    args = parser.parse_args()
+
+    report_path = args.report
+    if not report_path:
+        reports = [os.path.join(RUN_REPORT_DIR, name) for name in os.listdir(RUN_REPORT_DIR)
+                   if name.endswith('.json')] if os.path.isdir(RUN_REPORT_DIR) else []
+        if not reports:
+            print(f"Error: No run reports found in '{RUN_REPORT_DIR}'.")
+            sys.exit(1)
+        report_path = max(reports, key=os.path.getmtime)
+    with open(report_path, 'r', encoding='utf-8') as f:
+        print_report(json.load(f))
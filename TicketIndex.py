@@ -0,0 +1,202 @@
+import os
+import sys
+import mmap
+import uuid
+import struct
+import argparse
+
+# pandas is deliberately not imported here: the reader must stay small on gate machines.
+# write_ticket_index takes any DataFrame-like object with column access.
+
+# --- Configuration ---
+TICKET_INDEX_DIR = os.path.join('output', 'index')
+CSV_UUID_COL = 'UUID'
+CSV_NAME_COL = 'isim'
+CSV_EMAIL_COL = 'mail'
+CSV_PHONE_COL = 'mobile'
+
+# --- File Format ---
+# Little-endian layout:
+#   header   magic, version, record count, heap offset, heap size (HEADER, padded to HEADER_SIZE)
+#   records  count x (16-byte UUID, u32 heap offset, u16 name/email/phone byte lengths), sorted by UUID
+#   heap     UTF-8 name, email and phone of each record, stored back to back
+MAGIC = b'ATIX'
+VERSION = 1
+HEADER = struct.Struct('<4sHxxIQQ')
+HEADER_SIZE = 32
+RECORD = struct.Struct('<16sIHHH')
+MAX_FIELD_BYTES = 0xFFFF
+
+def _encode_field(value):
+    if value is None or value != value: # None or NaN
+        return b''
+    encoded = str(value).strip().encode('utf-8')
+    if len(encoded) > MAX_FIELD_BYTES:
+        # Cut at a character boundary so the stored bytes still decode
+        encoded = encoded[:MAX_FIELD_BYTES].decode('utf-8', 'ignore').encode('utf-8')
+    return encoded
+
+def write_ticket_index(df, index_path, uuid_col=CSV_UUID_COL, name_col=CSV_NAME_COL,
+                       email_col=CSV_EMAIL_COL, phone_col=CSV_PHONE_COL):
+    """
+    Writes a binary ticket index for fast offline lookups (see TicketIndex).
+
+    Rows without a valid UUID are skipped; for duplicate UUIDs the last row wins.
+    The file is written to a temporary path and moved into place, so readers never
+    see a half-written index.
+
+    Args:
+        df (pd.DataFrame): Cleaned participant rows (e.g. the *_clean.csv frame).
+        index_path (str): Output file path.
+
+    Returns:
+        int: Number of tickets in the index.
+    """
+    entries = {}
+    skipped = 0
+    columns = [df[col] if col in df.columns else [None] * len(df) for col in (uuid_col, name_col, email_col, phone_col)]
+    for uuid_value, name, email, phone in zip(*columns):
+        try:
+            key = uuid.UUID(str(uuid_value).strip()).bytes
+        except (ValueError, TypeError, AttributeError):
+            skipped += 1
+            continue
+        entries[key] = (_encode_field(name), _encode_field(email), _encode_field(phone))
+
+    keys = sorted(entries)
+    records_size = len(keys) * RECORD.size
+    heap_offset = HEADER_SIZE + records_size
+    records = bytearray(records_size)
+    heap = bytearray()
+    for i, key in enumerate(keys):
+        name, email, phone = entries[key]
+        RECORD.pack_into(records, i * RECORD.size, key, len(heap), len(name), len(email), len(phone))
+        heap += name + email + phone
+
+    index_dir = os.path.dirname(index_path)
+    if index_dir and not os.path.exists(index_dir):
+        os.makedirs(index_dir)
+        print(f"Created directory: {index_dir}")
+    tmp_path = index_path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, VERSION, len(keys), heap_offset, len(heap)).ljust(HEADER_SIZE, b'\0'))
+        f.write(records)
+        f.write(heap)
+    os.replace(tmp_path, index_path)
+    if skipped:
+        print(f"Warning: Skipped {skipped} rows without a valid UUID while writing the ticket index.")
+    print(f"Ticket index with {len(keys)} tickets written to '{index_path}' ({HEADER_SIZE + records_size + len(heap)} bytes).")
+    return len(keys)
+
+class TicketIndex:
+    """
+    Read-only, memory-mapped view of a ticket index file.
+
+    Opening only maps the file; lookups binary-search the sorted UUID records directly
+    in the mapping, so only the touched pages are read from disk and memory use stays
+    small even for millions of tickets.
+    """
+
+    def __init__(self, index_path):
+        self.index_path = index_path
+        self._file = open(index_path, 'rb')
+        try:
+            self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            self._file.close()
+            raise ValueError(f"Ticket index '{index_path}' is empty.")
+        magic, version, self.count, self._heap_offset, heap_size = HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC or version != VERSION:
+            self.close()
+            raise ValueError(f"'{index_path}' is not a version {VERSION} ticket index.")
+        if self._heap_offset + heap_size > len(self._mm):
+            self.close()
+            raise ValueError(f"Ticket index '{index_path}' is truncated.")
+
+    def __len__(self):
+        return self.count
+
+    def __contains__(self, uuid_value):
+        return self._find(uuid_value) is not None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        if self._mm is not None:
+            self._mm.close()
+            self._mm = None
+        self._file.close()
+
+    def _find(self, uuid_value):
+        """Returns the byte position of the record for a UUID string, or None."""
+        try:
+            key = uuid.UUID(str(uuid_value).strip()).bytes
+        except (ValueError, TypeError, AttributeError):
+            return None
+        mm = self._mm
+        low, high = 0, self.count - 1
+        while low <= high:
+            mid = (low + high) // 2
+            position = HEADER_SIZE + mid * RECORD.size
+            candidate = mm[position:position + 16]
+            if candidate < key:
+                low = mid + 1
+            elif candidate > key:
+                high = mid - 1
+            else:
+                return position
+        return None
+
+    def lookup(self, uuid_value):
+        """
+        Looks up a ticket by UUID string.
+
+        Returns:
+            dict: 'uuid', 'name', 'email' and 'mobile', or None if the UUID is unknown or invalid.
+        """
+        position = self._find(uuid_value)
+        if position is None:
+            return None
+        key, offset, name_len, email_len, phone_len = RECORD.unpack_from(self._mm, position)
+        start = self._heap_offset + offset
+        data = self._mm[start:start + name_len + email_len + phone_len]
+        return {
+            'uuid': str(uuid.UUID(bytes=key)),
+            'name': data[:name_len].decode('utf-8'),
+            'email': data[name_len:name_len + email_len].decode('utf-8'),
+            'mobile': data[name_len + email_len:].decode('utf-8'),
+        }
+
+# --- Main Execution ---
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build or query the binary ticket index.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    build_parser = subparsers.add_parser("build", help="Build an index from a *_clean.csv file")
+    build_parser.add_argument("csv_file", help="Path to the *_clean.csv file")
+    build_parser.add_argument("index_file", help="Output index path")
+    lookup_parser = subparsers.add_parser("lookup", help="Look up one or more UUIDs")
+    lookup_parser.add_argument("index_file", help="Index path")
+    lookup_parser.add_argument("uuids", nargs='+', help="UUIDs to look up")
+    args = parser.parse_args()
+
+    if args.command == "build":
+        import pandas as pd # Only needed for building; lookups stay light on gate machines
+        if not os.path.exists(args.csv_file):
+            print(f"Error: CSV file not found at '{args.csv_file}'")
+            sys.exit(1)
+        write_ticket_index(pd.read_csv(args.csv_file, dtype=str), args.index_file)
+    else:
+        if not os.path.exists(args.index_file):
+            print(f"Error: Ticket index not found at '{args.index_file}'")
+            sys.exit(1)
+        with TicketIndex(args.index_file) as index:
+            for uuid_value in args.uuids:
+                ticket = index.lookup(uuid_value)
+                if ticket is None:
+                    print(f"{uuid_value}: not found")
+                else:
+                    print(f"{uuid_value}: {ticket['name']} | {ticket['email']} | {ticket['mobile']}")
@@ -0,0 +1,83 @@
+"""
+Benchmark of campaign planning: the vectorized CampaignPlanner against the former
+row-by-row loop (iterrows, one os.path.exists per row).
+
+Usage:
+    python benchmarks/bench_campaign_planner.py --recipients 100000
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from CampaignPlanner import QR_FILE_SUFFIX, plan_qr_campaign, plan_counts, write_plan
+from bench_participant_store import make_participants
+
+def legacy_plan(df, qr_dir, sent_emails):
+    """The candidate loop send_qr_codes used before CampaignPlanner (error logging left out)."""
+    candidates = []
+    skipped = 0
+    for index, row in df.iterrows():
+        recipient_email = row.get('mail', '').strip()
+        mobile = row.get('mobile', '').strip()
+        if not recipient_email or not mobile:
+            skipped += 1
+            continue
+        if recipient_email.lower() in sent_emails:
+            skipped += 1
+            continue
+        qr_file_path = os.path.join(qr_dir, f"{mobile}{QR_FILE_SUFFIX}")
+        if not os.path.exists(qr_file_path):
+            skipped += 1
+            continue
+        candidates.append({'index': index, 'email': recipient_email, 'mobile': mobile, 'qr_path': qr_file_path, 'name': row.get('isim', 'Participant')})
+    return candidates
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark campaign planning.")
+    parser.add_argument("--recipients", type=int, default=100000)
+    parser.add_argument("--sent-ratio", type=float, default=0.3, help="Share of recipients already in the sent log")
+    parser.add_argument("--missing-qr-ratio", type=float, default=0.05, help="Share of recipients without a designed QR file")
+    parser.add_argument("--output", help="Write results as JSON to this path")
+    args = parser.parse_args()
+
+    df = make_participants(args.recipients)
+    rng = random.Random(3)
+    emails = df['mail'].tolist()
+    sent_emails = {email for email in emails if rng.random() < args.sent_ratio}
+    report = {'recipients': args.recipients}
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        qr_dir = os.path.join(tmp_dir, 'designed_qr')
+        os.makedirs(qr_dir)
+        for mobile in df['mobile']:
+            if rng.random() >= args.missing_qr_ratio:
+                open(os.path.join(qr_dir, mobile + QR_FILE_SUFFIX), 'wb').close()
+
+        start = time.perf_counter()
+        candidates = legacy_plan(df, qr_dir, sent_emails)
+        report['legacy_seconds'] = round(time.perf_counter() - start, 3)
+
+        start = time.perf_counter()
+        plan = plan_qr_campaign(df, qr_dir, sent_emails)
+        report['planner_seconds'] = round(time.perf_counter() - start, 3)
+        start = time.perf_counter()
+        write_plan(plan, os.path.join(tmp_dir, 'plan.csv'))
+        report['plan_write_seconds'] = round(time.perf_counter() - start, 3)
+        report['plan_bytes'] = os.path.getsize(os.path.join(tmp_dir, 'plan.csv'))
+
+    counts = plan_counts(plan)
+    report['counts'] = counts
+    report['speedup'] = round(report['legacy_seconds'] / report['planner_seconds'], 1) if report['planner_seconds'] else None
+    if counts['send'] != len(candidates):
+        print(f"Warning: planner sends {counts['send']} rows, legacy loop {len(candidates)}.")
+    for key, value in report.items():
+        print(f"  {key:<20} {value}")
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"Results written to '{args.output}'.")
@@ -0,0 +1,86 @@
+"""
+Benchmark of the certificate flow against a local SMTP sink (see smtp_sink.py): the
+two-phase run (generate_certificates, then send_certificates) against
+stream_certificates, which sends every certificate as soon as it is rendered.
+
+Rendering alone and sending alone are timed too; streaming should take about as long
+as the slower of the two, the two-phase run about their sum.
+
+Usage:
+    python benchmarks/bench_certificate_stream.py --attendees 20 --latency 0.5
+    python benchmarks/bench_certificate_stream.py --attendees 200 --format pdf --latency 0.05
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import contextlib
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+from smtp_sink import SMTPSink
+from DeliveryLog import DeliveryLog
+from CertificateGeneratorSender import generate_certificates, send_certificates, stream_certificates
+from bench_participant_store import make_participants
+
+SENDER_EMAIL = 'benchmark@example.com'
+
+def timed(report, label, func):
+    start = time.perf_counter()
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull), contextlib.redirect_stderr(devnull):
+        func()
+    elapsed = time.perf_counter() - start
+    report[label] = round(elapsed, 3)
+    print(f"  {label:<12} {elapsed:8.2f}s")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark two-phase against streaming certificate sending.")
+    parser.add_argument("--attendees", type=int, default=20)
+    parser.add_argument("--template", default=os.path.join(REPO_DIR, 'tasarim.jpg'))
+    parser.add_argument("--font", default=os.path.join(REPO_DIR, 'arial.ttf'), help="TrueType font (the default PIL font is used if missing)")
+    parser.add_argument("--format", choices=['png', 'pdf'], default='png')
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Render processes")
+    parser.add_argument("--latency", type=float, default=0.5, help="Sink: seconds before each message is answered")
+    parser.add_argument("--output", help="Write results as JSON to this path")
+    args = parser.parse_args()
+
+    attendees = make_participants(args.attendees).to_dict('records')
+    report = {'attendees': args.attendees, 'format': args.format, 'workers': args.workers, 'latency': args.latency}
+    sink = SMTPSink(latency=args.latency).start()
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        def run_dir(name):
+            path = os.path.join(tmp_dir, name)
+            os.makedirs(path)
+            return path
+        def fresh_log(name):
+            # Every run starts with an empty delivery log, so nobody is skipped as already sent
+            return DeliveryLog('certificate', db_path=os.path.join(tmp_dir, f'{name}.sqlite'), import_legacy=False)
+
+        render_dir = run_dir('render')
+        timed(report, 'render', lambda: generate_certificates(attendees, args.template, render_dir, font_path=args.font,
+                                                              workers=args.workers, file_format=args.format))
+        timed(report, 'send', lambda: send_certificates(attendees, render_dir, SENDER_EMAIL, '', '127.0.0.1', sink.port,
+                                                        delivery_log=fresh_log('send'), file_format=args.format))
+        def two_phase():
+            output_dir = run_dir('two_phase')
+            generate_certificates(attendees, args.template, output_dir, font_path=args.font, workers=args.workers, file_format=args.format)
+            send_certificates(attendees, output_dir, SENDER_EMAIL, '', '127.0.0.1', sink.port,
+                              delivery_log=fresh_log('two_phase'), file_format=args.format)
+        timed(report, 'two_phase', two_phase)
+        stream_log = fresh_log('stream')
+        timed(report, 'stream', lambda: stream_certificates(attendees, args.template, run_dir('stream'), SENDER_EMAIL, '', '127.0.0.1', sink.port,
+                                                            font_path=args.font, workers=args.workers, file_format=args.format,
+                                                            delivery_log=stream_log))
+        report['stream_delivered'] = stream_log.counts()
+    sink.stop()
+
+    report['ideal_seconds'] = max(report['render'], report['send'])
+    report['stream_speedup'] = round(report['two_phase'] / report['stream'], 2) if report['stream'] else None
+    print(f"  max(render, send) {report['ideal_seconds']:.2f}s; streaming is {report['stream_speedup']}x the two-phase run.")
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"Results written to '{args.output}'.")
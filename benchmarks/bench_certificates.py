@@ -0,0 +1,75 @@
+"""
+Benchmark of certificate generation: the per-attendee generate_certificate loop
+(template decoded and font loaded for every certificate) against generate_certificates
+with a warm renderer in one process and across worker processes, and the PDF output
+(template embedded as is, name as vector text) per attendee and as one archive.
+
+Usage:
+    python benchmarks/bench_certificates.py --attendees 100 --font arial.ttf
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import contextlib
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+from CertificateGeneratorSender import generate_certificate, generate_certificates
+from CertificatePDF import CertificatePDFRenderer
+from bench_participant_store import make_participants
+
+def timed(report, label, attendees, func):
+    start = time.perf_counter()
+    # Silence progress bars and per-certificate warnings so they don't dominate the timing
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull), contextlib.redirect_stderr(devnull):
+        generated = func()
+    elapsed = time.perf_counter() - start
+    report[label] = {
+        'seconds': round(elapsed, 3),
+        'generated': generated,
+        'certificates_per_second': round(len(attendees) / elapsed, 1) if elapsed else None,
+    }
+    print(f"  {label:<24} {elapsed:8.2f}s  {len(attendees) / elapsed if elapsed else 0:8.1f} certificates/s  ({generated} generated)")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark certificate rendering.")
+    parser.add_argument("--attendees", type=int, default=100)
+    parser.add_argument("--template", default=os.path.join(REPO_DIR, 'tasarim.jpg'))
+    parser.add_argument("--font", default=os.path.join(REPO_DIR, 'arial.ttf'), help="TrueType font (the default PIL font is used if missing)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Processes for the parallel run")
+    parser.add_argument("--output", help="Write results as JSON to this path")
+    args = parser.parse_args()
+
+    df = make_participants(args.attendees)
+    attendees = df.rename(columns={'UUID': 'uuid'}).to_dict('records')
+    report = {'attendees': args.attendees, 'workers': args.workers, 'cpu_count': os.cpu_count()}
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        def legacy_loop():
+            return sum(generate_certificate(a['isim'], a['mobile'], args.template, tmp_dir, font_path=args.font) for a in attendees)
+        timed(report, 'per_attendee_loop', attendees, legacy_loop)
+        timed(report, 'warm_single_process', attendees,
+              lambda: generate_certificates(attendees, args.template, tmp_dir, font_path=args.font, workers=1))
+        timed(report, f'pool_{args.workers}_workers', attendees,
+              lambda: generate_certificates(attendees, args.template, tmp_dir, font_path=args.font, workers=args.workers))
+        png_bytes = sum(os.path.getsize(os.path.join(tmp_dir, name)) for name in os.listdir(tmp_dir) if name.endswith('.png'))
+        timed(report, 'pdf_per_attendee', attendees,
+              lambda: generate_certificates(attendees, args.template, tmp_dir, file_format='pdf'))
+        pdf_bytes = sum(os.path.getsize(os.path.join(tmp_dir, name)) for name in os.listdir(tmp_dir) if name.endswith('.pdf'))
+        archive_path = os.path.join(tmp_dir, 'archive.pdf')
+        timed(report, 'pdf_archive', attendees,
+              lambda: CertificatePDFRenderer(args.template).write([a['isim'] for a in attendees], archive_path) and len(attendees))
+        report['bytes_per_certificate'] = {
+            'png': png_bytes // len(attendees),
+            'pdf': pdf_bytes // len(attendees),
+            'pdf_archive': os.path.getsize(archive_path) // len(attendees),
+        }
+        print(f"  bytes per certificate    {report['bytes_per_certificate']}")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"Results written to '{args.output}'.")
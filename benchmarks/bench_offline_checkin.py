@@ -0,0 +1,97 @@
+"""
+Benchmark of offline check-in scanning and journal reconciliation.
+
+Scans are recorded against per-gate journals and compared with the scan rate a
+sequential online check-in could reach at a given network round trip. The journals
+are then reconciled into an in-memory store and the resulting Counter totals checked.
+
+Usage:
+    python benchmarks/bench_offline_checkin.py --participants 100000 --gates 4 --scans 20000
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import tempfile
+import contextlib
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from OfflineCheckin import CheckinJournal, reconcile
+from ParticipantStore import MemoryStore, FIELD_COUNTER
+from bench_participant_store import make_participants
+
+def percentile(sorted_values, p):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * p / 100.0))]
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark offline check-in journals and reconciliation.")
+    parser.add_argument("--participants", type=int, default=100000)
+    parser.add_argument("--gates", type=int, default=4, help="Number of gate journals")
+    parser.add_argument("--scans", type=int, default=20000, help="Scans per gate")
+    parser.add_argument("--unknown-ratio", type=float, default=0.02, help="Share of scans with an unknown UUID")
+    parser.add_argument("--online-rtt-ms", type=float, default=80.0, help="Round trip of an online check-in, for comparison")
+    parser.add_argument("--output", help="Write results as JSON to this path")
+    args = parser.parse_args()
+
+    df = make_participants(args.participants)
+    uuids = df['UUID'].tolist()
+    rng = random.Random(11)
+    report = {'participants': args.participants, 'gates': args.gates, 'scans_per_gate': args.scans}
+    latencies = []
+    valid_scans = 0
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        journal_paths = []
+        scan_seconds = 0.0
+        for gate in range(args.gates):
+            journal_path = os.path.join(tmp_dir, f"gate{gate}.sqlite")
+            journal_paths.append(journal_path)
+            journal = CheckinJournal(journal_path, gate=f"gate{gate}")
+            with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+                journal.seed(df)
+            for _ in range(args.scans):
+                uuid_value = f"unknown-{rng.randrange(10**9)}" if rng.random() < args.unknown_ratio else rng.choice(uuids)
+                start = time.perf_counter()
+                participant = journal.record_scan(uuid_value)
+                elapsed = time.perf_counter() - start
+                latencies.append(elapsed)
+                scan_seconds += elapsed
+                if participant is not None:
+                    valid_scans += 1
+            journal.close()
+
+        latencies.sort()
+        offline_rate = len(latencies) / scan_seconds
+        online_rate = 1000.0 / args.online_rtt_ms
+        report.update({
+            'scans_per_second_per_gate': round(offline_rate, 1),
+            'scan_p50_ms': round(percentile(latencies, 50) * 1000, 3),
+            'scan_p99_ms': round(percentile(latencies, 99) * 1000, 3),
+            'online_scans_per_second_per_gate': round(online_rate, 1),
+            'speedup_vs_online': round(offline_rate / online_rate, 1),
+        })
+
+        store = MemoryStore()
+        ledger_path = os.path.join(tmp_dir, 'ledger.sqlite')
+        start = time.perf_counter()
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            summary = reconcile(store, journal_paths, ledger_path=ledger_path)
+            rerun = reconcile(store, journal_paths, ledger_path=ledger_path)
+        report['reconcile_seconds'] = round(time.perf_counter() - start, 3)
+        report['reconciled_participants'] = summary['pushed']
+        stored_total = sum(data.get(FIELD_COUNTER, 0) for _, data in store.list_all())
+        assert stored_total == valid_scans, f"Expected Counter total {valid_scans}, got {stored_total}"
+        assert rerun['claimed'] == 0, "Rerunning reconciliation must not count scans twice"
+        report['counter_total'] = stored_total
+
+    for key, value in report.items():
+        print(f"  {key:<34} {value}")
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"Results written to '{args.output}'.")
@@ -0,0 +1,84 @@
+"""
+Offline benchmark of the sync, export and delete flows against the local participant stores.
+
+Usage:
+    python benchmarks/bench_participant_store.py --participants 100000 --backends memory sqlite
+"""
+import os
+import sys
+import json
+import time
+import uuid
+import random
+import argparse
+import tempfile
+import contextlib
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from FirebaseSync import sync_dataframe
+from ParticipantStore import MemoryStore, SQLiteStore, FIELD_COUNTER, MAX_BATCH_SIZE
+
+def make_participants(count, seed=42):
+    """Builds a synthetic *_clean.csv-shaped DataFrame."""
+    rng = random.Random(seed)
+    mobiles = [f"5{rng.randrange(10**9):09d}" for _ in range(count)]
+    return pd.DataFrame({
+        'UUID': [str(uuid.uuid5(uuid.NAMESPACE_DNS, mobile)) for mobile in mobiles],
+        'Counter': ['0'] * count,
+        'isim': [f"Katilimci {i}" for i in range(count)],
+        'mail': [f"katilimci{i}@example.com" for i in range(count)],
+        'mobile': mobiles,
+    })
+
+def timed(results, label, func, items):
+    start = time.perf_counter()
+    # Silence per-batch progress output so it doesn't dominate the timing
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull), contextlib.redirect_stderr(devnull):
+        value = func()
+    elapsed = time.perf_counter() - start
+    results[label] = {'seconds': round(elapsed, 4), 'items': items, 'items_per_second': round(items / elapsed, 1) if elapsed else None}
+    print(f"  {label:<24} {elapsed:8.3f}s  {items / elapsed if elapsed else 0:12.0f} items/s")
+    return value
+
+def bench_store(store, df, attendee_ratio):
+    results = {}
+    doc_ids = df['UUID'].tolist()
+    checked_in = doc_ids[:int(len(doc_ids) * attendee_ratio)]
+
+    timed(results, 'sync (initial)', lambda: sync_dataframe(store, df), len(df))
+    if store.sync_manifest_path:
+        timed(results, 'sync (unchanged)', lambda: sync_dataframe(store, df), len(df))
+
+    def check_in():
+        for i in range(0, len(checked_in), MAX_BATCH_SIZE):
+            store.upsert_batch([(doc_id, {FIELD_COUNTER: 2}) for doc_id in checked_in[i:i + MAX_BATCH_SIZE]])
+    timed(results, 'counter updates', check_in, len(checked_in))
+
+    attendees = timed(results, 'query attendees', store.query_by_counter, len(checked_in))
+    assert len(attendees) == len(checked_in), f"Expected {len(checked_in)} attendees, got {len(attendees)}"
+    timed(results, 'delete all', store.delete_all, len(df))
+    return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark participant store backends offline.")
+    parser.add_argument("--participants", type=int, default=100000)
+    parser.add_argument("--attendee-ratio", type=float, default=0.6, help="Share of participants that check in")
+    parser.add_argument("--backends", nargs='+', choices=['memory', 'sqlite'], default=['memory', 'sqlite'])
+    parser.add_argument("--output", help="Write results as JSON to this path")
+    args = parser.parse_args()
+
+    df = make_participants(args.participants)
+    report = {'participants': args.participants, 'attendee_ratio': args.attendee_ratio, 'backends': {}}
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for backend in args.backends:
+            print(f"\n--- {backend} store, {args.participants} participants ---")
+            store = MemoryStore() if backend == 'memory' else SQLiteStore(os.path.join(tmp_dir, 'participants.sqlite'))
+            report['backends'][backend] = bench_store(store, df, args.attendee_ratio)
+            store.close()
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"\nResults written to '{args.output}'.")
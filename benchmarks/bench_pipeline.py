@@ -0,0 +1,65 @@
+"""
+Benchmark of Pipeline scheduling: the same stage graph run sequentially and with
+parallel=True. The graph mirrors DataExtractor's shape after the basic QR codes exist:
+an I/O-bound stage (sync: waits, like Firestore commits) in a thread, a CPU-bound stage
+(design) in a worker process and a second CPU-bound stage (export) in a thread, joined
+by a final stage (mail).
+
+With enough cores the parallel run takes about as long as its longest branch; on a
+single core only the waiting overlaps with the CPU work.
+
+Usage:
+    python benchmarks/bench_pipeline.py --io-seconds 2 --cpu-seconds 2
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import contextlib
+from functools import partial
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from Pipeline import Pipeline, Stage
+
+def cpu_stage(context, seconds):
+    deadline = time.process_time() + seconds
+    while time.process_time() < deadline:
+        sum(i * i for i in range(10000))
+
+def io_stage(context, seconds):
+    time.sleep(seconds)
+
+def build(state_path, io_seconds, cpu_seconds):
+    return Pipeline([
+        Stage('qr', partial(io_stage, seconds=0.0)),
+        Stage('sync', partial(io_stage, seconds=io_seconds), after=['qr']),
+        Stage('design', partial(cpu_stage, seconds=cpu_seconds), after=['qr'], executor='process'),
+        Stage('excel_export', partial(cpu_stage, seconds=cpu_seconds / 2), after=['qr']),
+        Stage('mail', partial(io_stage, seconds=0.0), after=['sync', 'design', 'excel_export']),
+    ], state_path=state_path)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark sequential against parallel pipeline runs.")
+    parser.add_argument("--io-seconds", type=float, default=2.0, help="Wait of the I/O-bound stage")
+    parser.add_argument("--cpu-seconds", type=float, default=2.0, help="CPU time of the design stage (export uses half)")
+    parser.add_argument("--output", help="Write results as JSON to this path")
+    args = parser.parse_args()
+
+    report = {'io_seconds': args.io_seconds, 'cpu_seconds': args.cpu_seconds, 'cpu_count': os.cpu_count()}
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for mode, parallel in (('sequential', False), ('parallel', True)):
+            pipeline = build(os.path.join(tmp_dir, f'{mode}.json'), args.io_seconds, args.cpu_seconds)
+            start = time.perf_counter()
+            with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+                results = pipeline.run(parallel=parallel)
+            report[f'{mode}_seconds'] = round(time.perf_counter() - start, 3)
+            print(f"  {mode:<11} {report[f'{mode}_seconds']:6.2f}s  {results}")
+    report['speedup'] = round(report['sequential_seconds'] / report['parallel_seconds'], 2)
+    print(f"  speedup {report['speedup']}x on {os.cpu_count()} CPU(s)")
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"Results written to '{args.output}'.")
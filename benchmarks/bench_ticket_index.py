@@ -0,0 +1,90 @@
+"""
+Benchmark of building, opening and querying the binary ticket index.
+
+Usage:
+    python benchmarks/bench_ticket_index.py --tickets 1000000
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import tempfile
+import contextlib
+import subprocess
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from TicketIndex import TicketIndex, write_ticket_index
+from bench_participant_store import make_participants
+
+# Runs in a fresh interpreter so the synthetic DataFrame doesn't count towards peak memory
+# Reports private (RssAnon) and mapped-file (RssFile, shared page cache) memory separately
+RSS_PROBE = """
+import sys
+sys.path.insert(0, sys.argv[1])
+from TicketIndex import TicketIndex
+with TicketIndex(sys.argv[2]) as index:
+    for uuid_value in sys.argv[3:]:
+        assert index.lookup(uuid_value) is not None
+with open('/proc/self/status') as f:
+    status = dict(line.split(':', 1) for line in f)
+print(int(status['RssAnon'].split()[0]) / 1024, int(status['RssFile'].split()[0]) / 1024)
+"""
+
+def lookup_process_rss_mb(index_path, uuids):
+    """(private, mapped-file) RSS in MB of a separate process that opens the index and looks up the given UUIDs."""
+    if not os.path.exists('/proc/self/status'): # Linux only
+        return None
+    repo_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    result = subprocess.run([sys.executable, '-c', RSS_PROBE, repo_dir, index_path] + uuids,
+                            capture_output=True, text=True, check=True)
+    private_mb, file_mb = (round(float(value), 1) for value in result.stdout.split())
+    return private_mb, file_mb
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the memory-mapped ticket index.")
+    parser.add_argument("--tickets", type=int, default=1000000)
+    parser.add_argument("--lookups", type=int, default=200000)
+    parser.add_argument("--output", help="Write results as JSON to this path")
+    args = parser.parse_args()
+
+    df = make_participants(args.tickets)
+    uuids = df['UUID'].tolist()
+    rng = random.Random(7)
+    hits = [rng.choice(uuids) for _ in range(args.lookups)]
+    misses = [str(rng.getrandbits(128)) for _ in range(1000)] # Not valid UUID strings
+
+    report = {'tickets': args.tickets, 'lookups': args.lookups}
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        index_path = os.path.join(tmp_dir, 'tickets.idx')
+        start = time.perf_counter()
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            write_ticket_index(df, index_path)
+        report['build_seconds'] = round(time.perf_counter() - start, 3)
+        report['index_bytes'] = os.path.getsize(index_path)
+        del df
+
+        start = time.perf_counter()
+        index = TicketIndex(index_path)
+        report['open_ms'] = round((time.perf_counter() - start) * 1000, 3)
+
+        start = time.perf_counter()
+        found = sum(1 for uuid_value in hits if index.lookup(uuid_value) is not None)
+        elapsed = time.perf_counter() - start
+        assert found == len(hits), f"Expected {len(hits)} hits, found {found}"
+        assert not any(uuid_value in index for uuid_value in misses)
+        report['lookup_us'] = round(elapsed / len(hits) * 1e6, 2)
+        report['lookups_per_second'] = round(len(hits) / elapsed, 1)
+        index.close()
+        rss = lookup_process_rss_mb(index_path, hits[:1000])
+        if rss:
+            report['lookup_process_private_rss_mb'], report['lookup_process_file_rss_mb'] = rss
+
+    for key, value in report.items():
+        print(f"  {key:<30} {value}")
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"Results written to '{args.output}'.")
@@ -0,0 +1,148 @@
+"""
+Load test for CheckinService.py with concurrent simulated scanners.
+
+By default an in-process service is started on an in-memory store seeded with synthetic
+participants; pass --url to target a service that is already running (its participant
+UUIDs are then read from --csv).
+
+Usage:
+    python benchmarks/checkin_load_test.py --participants 100000 --scanners 16 --scans 2000
+    python benchmarks/checkin_load_test.py --url http://127.0.0.1:8765 --csv output/csv/your_input_file_clean.csv
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import threading
+import contextlib
+import http.client
+import pandas as pd
+from urllib.parse import urlparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from CheckinService import CheckinService, serve, CHECKIN_TOKEN
+from ParticipantStore import MemoryStore, FIELD_COUNTER
+from bench_participant_store import make_participants
+
+def percentile(sorted_values, p):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(len(sorted_values) * p / 100.0))
+    return sorted_values[index]
+
+def scanner(host, port, uuids, scans, checkin_ratio, unknown_ratio, seed, latencies, errors):
+    """Simulates one gate scanner on a kept-alive connection."""
+    rng = random.Random(seed)
+    conn = http.client.HTTPConnection(host, port)
+    headers = {'X-Checkin-Token': CHECKIN_TOKEN} if CHECKIN_TOKEN else {}
+    local_latencies = []
+    checkins = 0
+    for _ in range(scans):
+        uuid_value = f"unknown-{rng.randrange(10**9)}" if rng.random() < unknown_ratio else rng.choice(uuids)
+        is_checkin = rng.random() < checkin_ratio
+        method, path = ('POST', '/checkin') if is_checkin else ('GET', '/validate')
+        start = time.perf_counter()
+        try:
+            conn.request(method, f"{path}?uuid={uuid_value}", headers=headers)
+            response = conn.getresponse()
+            response.read()
+        except (OSError, http.client.HTTPException) as e:
+            errors.append(str(e))
+            conn.close()
+            conn = http.client.HTTPConnection(host, port)
+            continue
+        local_latencies.append(time.perf_counter() - start)
+        if is_checkin and response.status == 200:
+            checkins += 1
+    conn.close()
+    latencies.append((local_latencies, checkins))
+
+def run_load(host, port, uuids, args):
+    latencies = []
+    errors = []
+    threads = [
+        threading.Thread(target=scanner, args=(host, port, uuids, args.scans, args.checkin_ratio, args.unknown_ratio, seed, latencies, errors))
+        for seed in range(args.scanners)
+    ]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    all_latencies = sorted(latency for scanner_latencies, _ in latencies for latency in scanner_latencies)
+    checkins = sum(scanner_checkins for _, scanner_checkins in latencies)
+    return {
+        'scanners': args.scanners,
+        'requests': len(all_latencies),
+        'checkins': checkins,
+        'errors': len(errors),
+        'seconds': round(elapsed, 3),
+        'requests_per_second': round(len(all_latencies) / elapsed, 1) if elapsed else None,
+        'p50_ms': round(percentile(all_latencies, 50) * 1000, 3),
+        'p95_ms': round(percentile(all_latencies, 95) * 1000, 3),
+        'p99_ms': round(percentile(all_latencies, 99) * 1000, 3),
+        'max_ms': round(all_latencies[-1] * 1000, 3) if all_latencies else 0.0,
+    }
+
+def time_lookups(service, uuids, count=200000):
+    """Measures the in-process index lookup alone, without HTTP."""
+    sample = [uuids[i % len(uuids)] for i in range(count)]
+    start = time.perf_counter()
+    for uuid_value in sample:
+        service.validate(uuid_value)
+    return (time.perf_counter() - start) / count * 1e6
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Simulate concurrent gate scanners against the check-in service.")
+    parser.add_argument("--participants", type=int, default=100000)
+    parser.add_argument("--scanners", type=int, default=16, help="Concurrent scanner connections")
+    parser.add_argument("--scans", type=int, default=2000, help="Requests per scanner")
+    parser.add_argument("--checkin-ratio", type=float, default=0.5, help="Share of requests that are check-ins")
+    parser.add_argument("--unknown-ratio", type=float, default=0.02, help="Share of scans with an unknown UUID")
+    parser.add_argument("--url", help="Target an already running service instead of an in-process one")
+    parser.add_argument("--csv", help="*_clean.csv with the UUIDs known to the service given by --url")
+    parser.add_argument("--output", help="Write results as JSON to this path")
+    args = parser.parse_args()
+
+    if args.url:
+        if not args.csv:
+            parser.error("--url requires --csv to know which UUIDs to scan")
+        uuids = pd.read_csv(args.csv, dtype=str)['UUID'].dropna().tolist()
+        target = urlparse(args.url)
+        print(f"Running {args.scanners} scanners x {args.scans} scans against {args.url}...")
+        report = run_load(target.hostname, target.port, uuids, args)
+    else:
+        df = make_participants(args.participants)
+        uuids = df['UUID'].tolist()
+        store = MemoryStore()
+        store.upsert_batch([(uuid_value, {FIELD_COUNTER: 0}) for uuid_value in uuids])
+        service = CheckinService(store)
+        service.load()
+        print(f"In-process index lookup: {time_lookups(service, uuids):.2f} us per validate")
+        service.start()
+        server = serve(service, '127.0.0.1', 0)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        host, port = server.server_address
+        print(f"Running {args.scanners} scanners x {args.scans} scans against the in-process service...")
+        report = run_load(host, port, uuids, args)
+        server.shutdown()
+        server.server_close()
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            service.stop()
+        stored = sum(data.get(FIELD_COUNTER, 0) for _, data in store.list_all())
+        report['stored_counter_total'] = stored
+        report['flush_commits'] = service.controller.latency.count
+        if stored != report['checkins']:
+            print(f"Warning: {report['checkins']} check-ins but Counter total in the store is {stored}.")
+
+    for key, value in report.items():
+        print(f"  {key:<22} {value}")
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"Results written to '{args.output}'.")
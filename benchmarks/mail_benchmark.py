@@ -0,0 +1,178 @@
+"""
+Mail throughput benchmark against a local SMTP sink (see smtp_sink.py).
+
+Generates synthetic recipients with designed tickets and sends them once per mode, each
+mode in a fresh process so peak memory is measured separately:
+
+    serial        send_qr_codes over one SMTP session, messages rendered by the sender
+    pool          send_qr_codes over --concurrency sessions, messages rendered by the senders
+    prerender     as pool, with --render-workers processes rendering messages ahead
+    certificates  send_certificates over one session
+
+Reports messages per second, p50/p99 latency of one send (including reconnects and
+retries), the sink's view of the traffic and peak RSS. No real provider is contacted.
+
+Usage:
+    python benchmarks/mail_benchmark.py --recipients 500 --latency 0.05
+    python benchmarks/mail_benchmark.py --recipients 2000 --modes pool prerender --drop-rate 0.01 --output mail_bench.json
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import contextlib
+import subprocess
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+from smtp_sink import SMTPSink
+
+MODES = ['serial', 'pool', 'prerender', 'certificates']
+SENDER_EMAIL = 'benchmark@example.com'
+
+def percentile(sorted_values, p):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(len(sorted_values) * p / 100.0))
+    return sorted_values[index]
+
+def peak_rss_mb():
+    """(this process, largest child process) peak RSS in MB."""
+    import resource
+    children_mb = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024 # KB on Linux
+    try:
+        # VmHWM starts fresh at exec, unlike ru_maxrss which Linux carries over from the parent
+        with open('/proc/self/status') as f:
+            status = dict(line.split(':', 1) for line in f)
+        return int(status['VmHWM'].split()[0]) / 1024, children_mb
+    except (OSError, KeyError):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, children_mb
+
+def prepare_recipients(work_dir, count, ticket_path):
+    """Writes a *_clean.csv with synthetic recipients and one designed ticket per mobile number."""
+    from bench_participant_store import make_participants
+    df = make_participants(count)
+    csv_path = os.path.join(work_dir, 'recipients_clean.csv')
+    df.to_csv(csv_path, index=False)
+    ticket_dir = os.path.join(work_dir, 'tickets')
+    os.makedirs(ticket_dir)
+    for mobile in df['mobile']:
+        for name in (f"{mobile}_designed.png", f"{mobile}.png"): # QR ticket and certificate
+            target = os.path.join(ticket_dir, name)
+            try:
+                os.link(ticket_path, target) # Same content for every recipient; no copies needed
+            except OSError:
+                shutil.copyfile(ticket_path, target)
+    return csv_path, ticket_dir
+
+def run_mode(args):
+    """Child process: sends all recipients in one mode and prints the measurements as JSON."""
+    import pandas as pd
+    import MailSender
+    from MailScheduler import MailScheduler
+
+    latencies = []
+    original_send = MailSender.SMTPSession.send
+    def timed_send(session, recipient_email, msg):
+        start = time.perf_counter()
+        try:
+            return original_send(session, recipient_email, msg)
+        finally:
+            latencies.append(time.perf_counter() - start)
+    MailSender.SMTPSession.send = timed_send
+
+    os.chdir(args.mode_dir) # Delivery log and scheduler state start empty for every mode
+    start = time.perf_counter()
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull), contextlib.redirect_stderr(devnull):
+        if args.mode == 'certificates':
+            from CertificateGeneratorSender import send_certificates
+            attendees = pd.read_csv(args.csv, dtype=str).to_dict('records')
+            send_certificates(attendees, args.ticket_dir, SENDER_EMAIL, '', '127.0.0.1', args.port)
+        else:
+            concurrency = 1 if args.mode == 'serial' else args.concurrency
+            render_workers = args.render_workers if args.mode == 'prerender' else 0
+            scheduler = MailScheduler('qr', per_minute=0, per_day=0)
+            MailSender.send_qr_codes(args.csv, args.ticket_dir, SENDER_EMAIL, '', '127.0.0.1', args.port,
+                                     concurrency=concurrency, scheduler=scheduler, render_workers=render_workers)
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    peak_mb, children_peak_mb = peak_rss_mb()
+    print(json.dumps({
+        'seconds': round(elapsed, 3),
+        'sends': len(latencies),
+        'p50_ms': round(percentile(latencies, 50) * 1000, 2),
+        'p99_ms': round(percentile(latencies, 99) * 1000, 2),
+        'max_ms': round(latencies[-1] * 1000, 2) if latencies else 0.0,
+        'peak_rss_mb': round(peak_mb, 1),
+        'children_peak_rss_mb': round(children_peak_mb, 1),
+    }))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark mail sending modes against a local SMTP sink.")
+    parser.add_argument("--recipients", type=int, default=500)
+    parser.add_argument("--modes", nargs='+', choices=MODES, default=MODES)
+    parser.add_argument("--concurrency", type=int, default=4, help="SMTP sessions for the pool modes")
+    parser.add_argument("--render-workers", type=int, default=2, help="Render processes for the prerender mode")
+    parser.add_argument("--ticket", default=os.path.join(REPO_DIR, 'tasarim.jpg'), help="Image attached as every recipient's ticket")
+    parser.add_argument("--latency", type=float, default=0.02, help="Sink: seconds before each message is answered")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="Sink: share of messages answered with 451")
+    parser.add_argument("--reject-rate", type=float, default=0.0, help="Sink: share of messages answered with 550")
+    parser.add_argument("--drop-rate", type=float, default=0.0, help="Sink: share of messages after which the connection is dropped")
+    parser.add_argument("--output", help="Write results as JSON to this path")
+    # Internal: run one mode in a child process
+    parser.add_argument("--mode", help=argparse.SUPPRESS)
+    parser.add_argument("--mode-dir", help=argparse.SUPPRESS)
+    parser.add_argument("--csv", help=argparse.SUPPRESS)
+    parser.add_argument("--ticket-dir", help=argparse.SUPPRESS)
+    parser.add_argument("--port", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.mode:
+        run_mode(args)
+        sys.exit(0)
+
+    if not os.path.exists(args.ticket):
+        parser.error(f"Ticket image '{args.ticket}' not found")
+    report = {
+        'recipients': args.recipients,
+        'ticket_bytes': os.path.getsize(args.ticket),
+        'concurrency': args.concurrency,
+        'render_workers': args.render_workers,
+        'sink': {'latency': args.latency, 'throttle_rate': args.throttle_rate, 'reject_rate': args.reject_rate, 'drop_rate': args.drop_rate},
+        'modes': {},
+    }
+    sink = SMTPSink(latency=args.latency, throttle_rate=args.throttle_rate, reject_rate=args.reject_rate, drop_rate=args.drop_rate).start()
+    print(f"SMTP sink on {sink.host}:{sink.port} (latency {args.latency * 1000:.0f} ms).")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        csv_path, ticket_dir = prepare_recipients(tmp_dir, args.recipients, args.ticket)
+        for mode in args.modes:
+            mode_dir = os.path.join(tmp_dir, mode)
+            os.makedirs(mode_dir)
+            before = sink.snapshot()
+            command = [sys.executable, os.path.abspath(__file__), '--mode', mode, '--mode-dir', mode_dir, '--csv', csv_path,
+                       '--ticket-dir', ticket_dir, '--port', str(sink.port), '--concurrency', str(args.concurrency),
+                       '--render-workers', str(args.render_workers)]
+            env = dict(os.environ, PYTHONPATH=REPO_DIR)
+            completed = subprocess.run(command, capture_output=True, text=True, env=env)
+            if completed.returncode != 0:
+                print(f"  {mode:<13} failed: {completed.stderr.strip().splitlines()[-1] if completed.stderr.strip() else completed.returncode}")
+                report['modes'][mode] = {'error': completed.stderr.strip()[-2000:]}
+                continue
+            result = json.loads(completed.stdout.strip().splitlines()[-1])
+            after = sink.snapshot()
+            result['sink'] = {key: after[key] - before[key] for key in after}
+            accepted = result['sink']['accepted']
+            result['messages_per_second'] = round(accepted / result['seconds'], 1) if result['seconds'] else None
+            report['modes'][mode] = result
+            print(f"  {mode:<13} {accepted:>6} delivered  {result['messages_per_second']:>8} msg/s  "
+                  f"p50 {result['p50_ms']:>8} ms  p99 {result['p99_ms']:>8} ms  peak RSS {result['peak_rss_mb']} MB")
+    sink.stop()
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"Results written to '{args.output}'.")
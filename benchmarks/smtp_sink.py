@@ -0,0 +1,159 @@
+"""
+Local SMTP sink for load-testing the mail senders without a real provider.
+
+Accepts any sender and recipient and discards the messages. Per-message latency and
+failure injection (throttling replies, permanent rejections, dropped connections) make
+it possible to exercise the pacing, retry and reconnect paths. Advertises neither
+STARTTLS nor AUTH, so leave SENDER_PASSWORD empty when pointing MailSender.py at it.
+
+Usage:
+    python benchmarks/smtp_sink.py --port 8025 --latency 0.05 --throttle-rate 0.01
+"""
+import time
+import random
+import argparse
+import threading
+import socketserver
+
+END_OF_DATA = b'\r\n.\r\n'
+
+class SMTPSinkHandler(socketserver.StreamRequestHandler):
+    def _reply(self, line):
+        self.wfile.write(line.encode('ascii') + b'\r\n')
+
+    def _read_data(self):
+        """Reads a DATA payload up to the terminating '.' line. Returns its size, or None on EOF."""
+        size = 0
+        tail = b'\r\n' # DATA starts on a fresh line
+        while True:
+            chunk = self.rfile.read1(65536)
+            if not chunk:
+                return None
+            size += len(chunk)
+            tail = (tail + chunk)[-len(END_OF_DATA):]
+            if tail == END_OF_DATA:
+                return size
+
+    def handle(self):
+        sink = self.server.sink
+        sink.count('sessions')
+        self._reply('220 smtp-sink ready')
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line[:4].upper()
+            if command in (b'EHLO', b'HELO'):
+                self._reply('250 smtp-sink')
+            elif command == b'DATA':
+                self._reply('354 End data with <CR><LF>.<CR><LF>')
+                size = self._read_data()
+                if size is None:
+                    return
+                outcome = sink.outcome()
+                if sink.latency:
+                    time.sleep(sink.latency)
+                sink.count(outcome, size)
+                if outcome == 'dropped':
+                    return # Close without a reply
+                if outcome == 'throttled':
+                    self._reply('451 4.7.1 Rate limited, try again later')
+                elif outcome == 'rejected':
+                    self._reply('550 5.1.1 Mailbox unavailable')
+                else:
+                    self._reply('250 2.0.0 Ok: queued')
+            elif command == b'RCPT' and sink.refuses(line):
+                self._reply('550 5.1.1 Recipient address rejected')
+            elif command == b'QUIT':
+                self._reply('221 2.0.0 Bye')
+                return
+            else: # MAIL, RCPT, RSET, NOOP, ...
+                self._reply('250 2.0.0 Ok')
+
+class SMTPSink:
+    """
+    Threaded SMTP sink running in the background of the current process.
+
+    Args:
+        latency (float): Seconds to wait before answering each message.
+        throttle_rate (float): Share of messages answered with 451.
+        reject_rate (float): Share of messages answered with 550.
+        drop_rate (float): Share of messages after which the connection is closed without a reply.
+        refused_recipients (iterable): Addresses answered with 550 at RCPT TO.
+    """
+
+    def __init__(self, host='127.0.0.1', port=0, latency=0.0, throttle_rate=0.0, reject_rate=0.0, drop_rate=0.0, seed=1,
+                 refused_recipients=()):
+        self.latency = latency
+        self.throttle_rate = throttle_rate
+        self.reject_rate = reject_rate
+        self.drop_rate = drop_rate
+        self.refused_recipients = {address.lower() for address in refused_recipients}
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.stats = {'sessions': 0, 'accepted': 0, 'throttled': 0, 'rejected': 0, 'dropped': 0, 'bytes': 0}
+        self.server = socketserver.ThreadingTCPServer((host, port), SMTPSinkHandler, bind_and_activate=False)
+        self.server.allow_reuse_address = True
+        self.server.daemon_threads = True
+        self.server.sink = self
+        self.server.server_bind()
+        self.server.server_activate()
+        self.host, self.port = self.server.server_address
+        self._thread = None
+
+    def outcome(self):
+        with self._lock:
+            roll = self._rng.random()
+        if roll < self.drop_rate:
+            return 'dropped'
+        roll -= self.drop_rate
+        if roll < self.throttle_rate:
+            return 'throttled'
+        roll -= self.throttle_rate
+        if roll < self.reject_rate:
+            return 'rejected'
+        return 'accepted'
+
+    def refuses(self, rcpt_line):
+        address = rcpt_line.decode('ascii', errors='replace').partition(':')[2].strip().strip('<>').lower()
+        return address in self.refused_recipients
+
+    def count(self, key, size=0):
+        with self._lock:
+            self.stats[key] += 1
+            self.stats['bytes'] += size
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self.stats)
+
+    def start(self):
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run a local SMTP sink with optional latency and failure injection.")
+    parser.add_argument("--host", default='127.0.0.1')
+    parser.add_argument("--port", type=int, default=8025)
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds before each message is answered")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="Share of messages answered with 451")
+    parser.add_argument("--reject-rate", type=float, default=0.0, help="Share of messages answered with 550")
+    parser.add_argument("--drop-rate", type=float, default=0.0, help="Share of messages after which the connection is dropped")
+    args = parser.parse_args()
+
+    sink = SMTPSink(args.host, args.port, args.latency, args.throttle_rate, args.reject_rate, args.drop_rate).start()
+    print(f"SMTP sink listening on {sink.host}:{sink.port}. Press Ctrl+C to stop.")
+    try:
+        while True:
+            time.sleep(5)
+            print(sink.snapshot())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        sink.stop()
+    print(sink.snapshot())
@@ -4,23 +4,29 @@ import pandas as pd
 import firebase_admin
 from firebase_admin import credentials, firestore
 import glob
+import argparse
 from dotenv import load_dotenv
+from AttendeeSnapshot import SNAPSHOT_DB_PATH, refresh_snapshot, get_snapshot_attendees
+from FirebaseSync import initialize_firebase_sync
+from ParticipantStore import (
+    BACKENDS, PARTICIPANT_STORE,
+    FIELD_NAME, FIELD_EMAIL, FIELD_MOBILE, FIELD_COUNTER, get_store
+)
 
 # --- Configuration ---
 load_dotenv() # Load environment variables if needed, though not strictly used here
 
 SERVICE_ACCOUNT_KEY_PATH = 'qr-deneme.json'
-COLLECTION_NAME = 'users'
 CSV_INPUT_DIR = os.path.join('output', 'csv')
 EXCEL_OUTPUT_DIR = os.path.join('output', 'excel')
 OUTPUT_FILENAME = 'katilimcilar.xlsx'
 
 # --- Column Names ---
-# Firebase field names
-FIREBASE_NAME_COL = 'Ad-Soyad'
-FIREBASE_EMAIL_COL = 'Eposta'
-FIREBASE_MOBILE_COL = 'Telefon numaranız'
-FIREBASE_COUNTER_COL = 'Counter'
+# Firebase field names (configured in ParticipantStore.py)
+FIREBASE_NAME_COL = FIELD_NAME
+FIREBASE_EMAIL_COL = FIELD_EMAIL
+FIREBASE_MOBILE_COL = FIELD_MOBILE
+FIREBASE_COUNTER_COL = FIELD_COUNTER
 
 # CSV column names (from *_form.csv, matching original Excel)
 # Using 'mobile' as the key after cleaning in DataExtractor.py
@@ -45,7 +51,9 @@ def create_directory_if_not_exists(directory_path):
         print(f"Created directory: {directory_path}")
 
 def initialize_firebase():
-    """Initializes the Firebase Admin SDK."""
+    """Initializes the Firebase Admin SDK (or connects to the emulator if FIRESTORE_EMULATOR_HOST is set)."""
+    if os.getenv('FIRESTORE_EMULATOR_HOST'):
+        return initialize_firebase_sync() # Anonymous emulator credential, no service account key
     if not os.path.exists(SERVICE_ACCOUNT_KEY_PATH):
         print(f"Error: Service account key file not found at '{SERVICE_ACCOUNT_KEY_PATH}'")
         sys.exit(1)
@@ -78,39 +86,41 @@ def find_form_csv(csv_dir):
         print(f"Found form CSV file: {os.path.basename(form_csv_files[0])}")
         return form_csv_files[0]
 
-def get_attendees_from_firebase(db):
-    """Fetches users from Firestore where Counter > 1."""
-    users_ref = db.collection(COLLECTION_NAME)
+def get_attendees_from_snapshot(db_path=SNAPSHOT_DB_PATH):
+    """Reads attendees (Counter > 1) from the local users snapshot, keyed by mobile."""
     attendees_dict = {}
-    try:
-        # Query for documents where Counter is greater than 1
-        query = users_ref.where(filter=firestore.FieldFilter(FIREBASE_COUNTER_COL, '>', 1)).stream()
-        print(f"Fetching attendees from Firebase (where {FIREBASE_COUNTER_COL} > 1)...")
-
-        attendee_count = 0
-        for doc in query:
-            data = doc.to_dict()
-            mobile = data.get(FIREBASE_MOBILE_COL)
-            if mobile: # Use mobile number as the key
-                attendees_dict[str(mobile).strip()] = {
-                    OUT_NAME_COL: data.get(FIREBASE_NAME_COL),
-                    OUT_EMAIL_COL: data.get(FIREBASE_EMAIL_COL),
-                    OUT_MOBILE_COL: str(mobile).strip(), # Store mobile for the final output
-                    # Initialize TCKN and Birth Date as None, to be filled from CSV
-                    OUT_TCKN_COL: None,
-                    OUT_BIRTHDATE_COL: None
-                }
-                attendee_count += 1
-            else:
-                print(f"Warning: Found attendee document (ID: {doc.id}) with missing mobile number. Skipping.")
-
-        print(f"Found {attendee_count} attendees with {FIREBASE_COUNTER_COL} > 1 in Firebase.")
-        if attendee_count == 0:
-             print("No attendees met the criteria.")
-        return attendees_dict
-    except Exception as e:
-        print(f"Error fetching attendees from Firestore: {e}")
-        return {}
+    for row in get_snapshot_attendees(db_path):
+        mobile = row['mobile']
+        if mobile:
+            attendees_dict[mobile] = {
+                OUT_NAME_COL: row['name'],
+                OUT_EMAIL_COL: row['email'],
+                OUT_MOBILE_COL: mobile,
+                OUT_TCKN_COL: None,
+                OUT_BIRTHDATE_COL: None
+            }
+        else:
+            print(f"Warning: Found attendee document (ID: {row['doc_id']}) with missing mobile number. Skipping.")
+    print(f"Found {len(attendees_dict)} attendees with {FIREBASE_COUNTER_COL} > 1 in the local snapshot.")
+    return attendees_dict
+
+def get_attendees_from_store(store):
+    """Reads attendees (Counter > 1) directly from a local participant store (SQLite or in-memory)."""
+    attendees_dict = {}
+    for doc_id, data in store.query_by_counter():
+        mobile = data.get(FIREBASE_MOBILE_COL)
+        if mobile:
+            attendees_dict[str(mobile).strip()] = {
+                OUT_NAME_COL: data.get(FIREBASE_NAME_COL),
+                OUT_EMAIL_COL: data.get(FIREBASE_EMAIL_COL),
+                OUT_MOBILE_COL: str(mobile).strip(),
+                OUT_TCKN_COL: None,
+                OUT_BIRTHDATE_COL: None
+            }
+        else:
+            print(f"Warning: Found attendee document (ID: {doc_id}) with missing mobile number. Skipping.")
+    print(f"Found {len(attendees_dict)} attendees with {FIREBASE_COUNTER_COL} > 1 in the {store.name} store.")
+    return attendees_dict
 
 def read_form_csv_data(csv_path):
     """Reads the form CSV and extracts relevant columns, indexed by mobile."""
@@ -189,15 +199,31 @@ def read_form_csv_data(csv_path):
 
 # --- Main Execution ---
 if __name__ == "__main__":
-    print("--- Starting Attendee Data Export ---")
+    parser = argparse.ArgumentParser(description="Export attendees (Counter > 1) joined with form data to Excel.")
+    parser.add_argument("--offline", action="store_true", help="Read the local snapshot only, without contacting Firebase")
+    parser.add_argument("--full-refresh", action="store_true", help="Re-read the whole collection into the snapshot")
+    parser.add_argument("--backend", choices=BACKENDS, default=PARTICIPANT_STORE, help=f"Participant store backend (default: {PARTICIPANT_STORE})")
+    args = parser.parse_args()
 
-    # Initialize Firebase
-    db_client = initialize_firebase()
-    if not db_client:
-        sys.exit(1)
+    print("--- Starting Attendee Data Export ---")
 
-    # Fetch attendees from Firebase
-    firebase_attendees = get_attendees_from_firebase(db_client)
+    if args.backend != 'firestore':
+        # Local backends are queried directly
+        store = get_store(args.backend)
+        firebase_attendees = get_attendees_from_store(store)
+        store.close()
+    else:
+        if not args.offline:
+            # Initialize Firebase and pull only documents changed since the last refresh
+            db_client = initialize_firebase()
+            if not db_client:
+                sys.exit(1)
+            if refresh_snapshot(db_client, full=args.full_refresh) is None:
+                print("Error: Could not refresh the attendee snapshot. Run with --offline to use the existing (possibly stale) snapshot.")
+                sys.exit(1)
+
+        # Read attendees from the local snapshot
+        firebase_attendees = get_attendees_from_snapshot()
 
     if not firebase_attendees:
         print("No attendees found in Firebase matching criteria. Exiting.")
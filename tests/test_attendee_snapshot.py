@@ -0,0 +1,89 @@
+from datetime import datetime, timezone
+
+from AttendeeSnapshot import refresh_snapshot, get_snapshot_attendees, get_watermark, open_snapshot
+from ParticipantStore import FIELD_NAME, FIELD_MOBILE, FIELD_COUNTER, FIELD_UPDATED_AT
+
+UPDATED = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+class FakeDocument:
+    def __init__(self, doc_id, data):
+        self.id = doc_id
+        self._data = data
+
+    def to_dict(self):
+        return dict(self._data)
+
+class FakeQuery:
+    """Stands in for the users collection; the UpdatedAt filter skips documents without the field, like Firestore."""
+
+    def __init__(self, docs, filtered=False):
+        self.docs = docs
+        self.filtered = filtered
+        self.streams = []
+
+    def select(self, fields):
+        return self
+
+    def where(self, filter):
+        query = FakeQuery(self.docs, filtered=True)
+        query.streams = self.streams
+        return query
+
+    def order_by(self, field):
+        return self
+
+    def stream(self):
+        self.streams.append('incremental' if self.filtered else 'full')
+        return [FakeDocument(doc_id, data) for doc_id, data in self.docs.items()
+                if not self.filtered or FIELD_UPDATED_AT in data]
+
+class FakeClient:
+    def __init__(self, docs):
+        self.query = FakeQuery(docs)
+
+    def collection(self, name):
+        return self.query
+
+class FailingQuery(FakeQuery):
+    def where(self, filter):
+        return self
+
+    def stream(self):
+        raise RuntimeError('deadline exceeded')
+
+class FailingClient(FakeClient):
+    def __init__(self):
+        self.query = FailingQuery({})
+
+def test_refresh_is_incremental_once_a_watermark_exists(tmp_path):
+    db_path = str(tmp_path / 'snapshot.sqlite')
+    client = FakeClient({'a': {FIELD_NAME: 'A', FIELD_MOBILE: '5550001', FIELD_COUNTER: 2, FIELD_UPDATED_AT: UPDATED}})
+    refresh_snapshot(client, db_path)
+    refresh_snapshot(client, db_path)
+    refresh_snapshot(client, db_path, full=True)
+
+    assert client.query.streams == ['full', 'incremental', 'full']
+    conn = open_snapshot(db_path)
+    assert get_watermark(conn) == UPDATED
+    conn.close()
+
+def test_refresh_reads_everything_while_documents_lack_updated_at(tmp_path):
+    db_path = str(tmp_path / 'snapshot.sqlite')
+    docs = {
+        'a': {FIELD_NAME: 'A', FIELD_MOBILE: '5550001', FIELD_COUNTER: 2, FIELD_UPDATED_AT: UPDATED},
+        'b': {FIELD_NAME: 'B', FIELD_MOBILE: '5550002', FIELD_COUNTER: 0}, # Scanned by an app that sets no UpdatedAt
+    }
+    client = FakeClient(docs)
+    refresh_snapshot(client, db_path)
+    docs['b'][FIELD_COUNTER] = 3
+    refresh_snapshot(client, db_path)
+
+    assert client.query.streams == ['full', 'full']
+    assert sorted(row['doc_id'] for row in get_snapshot_attendees(db_path)) == ['a', 'b']
+
+def test_failed_refresh_returns_none_and_keeps_the_snapshot(tmp_path):
+    db_path = str(tmp_path / 'snapshot.sqlite')
+    client = FakeClient({'a': {FIELD_NAME: 'A', FIELD_MOBILE: '5550001', FIELD_COUNTER: 2, FIELD_UPDATED_AT: UPDATED}})
+    assert refresh_snapshot(client, db_path) == 1
+    assert refresh_snapshot(FailingClient(), db_path) is None
+    assert [row['doc_id'] for row in get_snapshot_attendees(db_path)] == ['a']
@@ -0,0 +1,54 @@
+import os
+from email import message_from_string
+
+import pandas as pd
+
+from CampaignPlanner import (
+    plan_qr_campaign, plan_jobs, plan_skip_errors,
+    PLAN_SEND, SKIP_MISSING_DATA, SKIP_MISSING_QR, SKIP_ALREADY_SENT, SKIP_DUPLICATE, QR_FILE_SUFFIX,
+)
+from MailSender import QREmailTemplate, qr_job_attachments
+
+def make_qr_dir(tmp_path, mobiles):
+    for mobile in mobiles:
+        (tmp_path / f"{mobile}{QR_FILE_SUFFIX}").write_bytes(b'')
+    return str(tmp_path)
+
+def statuses(plan):
+    return list(plan['status'].astype(str))
+
+def test_unsendable_first_row_does_not_hide_valid_duplicate(tmp_path):
+    df = pd.DataFrame({'mail': ['a@x.com', 'A@x.com'], 'mobile': ['', '555'], 'isim': ['A', 'A']})
+    plan = plan_qr_campaign(df, make_qr_dir(tmp_path, ['555']), set())
+    assert statuses(plan) == [SKIP_MISSING_DATA, PLAN_SEND]
+    assert [job['mobile'] for job in plan_jobs(plan, str(tmp_path))] == ['555']
+
+def test_first_row_missing_qr_does_not_hide_valid_duplicate(tmp_path):
+    df = pd.DataFrame({'mail': ['a@x.com', 'a@x.com'], 'mobile': ['111', '555'], 'isim': ['A', 'A']})
+    plan = plan_qr_campaign(df, make_qr_dir(tmp_path, ['555']), set())
+    assert statuses(plan) == [SKIP_MISSING_QR, PLAN_SEND]
+    assert not any('Duplicate' in reason for _, _, reason in plan_skip_errors(plan))
+
+def test_repeated_ticket_is_sent_once(tmp_path):
+    df = pd.DataFrame({'mail': ['a@x.com', 'b@x.com', 'A@X.com', 'c@x.com'],
+                       'mobile': ['111', '222', '111', '444'], 'isim': ['A', 'B', 'A', 'C']})
+    plan = plan_qr_campaign(df, make_qr_dir(tmp_path, ['111', '222', '444']), {'c@x.com'})
+    assert statuses(plan) == [PLAN_SEND, PLAN_SEND, SKIP_DUPLICATE, SKIP_ALREADY_SENT]
+    assert [reason for _, _, reason in plan_skip_errors(plan)] == ['Duplicate ticket in CSV (sent once)']
+    assert [job['mobile'] for job in plan_jobs(plan, str(tmp_path))] == ['111', '222']
+
+def test_shared_address_gets_every_ticket_in_one_job(tmp_path):
+    df = pd.DataFrame({'mail': ['a@x.com', 'b@x.com', 'A@X.com'],
+                       'mobile': ['111', '222', '333'], 'isim': ['A', 'B', 'A2']})
+    plan = plan_qr_campaign(df, make_qr_dir(tmp_path, ['111', '222', '333']), set())
+    assert statuses(plan) == [PLAN_SEND, PLAN_SEND, PLAN_SEND]
+    jobs = plan_jobs(plan, str(tmp_path))
+    assert [job['email'] for job in jobs] == ['a@x.com', 'b@x.com']
+    assert [os.path.basename(path) for path in jobs[0]['qr_paths']] == [f'111{QR_FILE_SUFFIX}', f'333{QR_FILE_SUFFIX}']
+
+def test_shared_address_email_attaches_every_ticket(tmp_path):
+    df = pd.DataFrame({'mail': ['a@x.com', 'a@x.com'], 'mobile': ['111', '333'], 'isim': ['A', 'A2']})
+    plan = plan_qr_campaign(df, make_qr_dir(tmp_path, ['111', '333']), set())
+    job, = plan_jobs(plan, str(tmp_path))
+    message = message_from_string(QREmailTemplate('sender@x.com', 'Ticket').render(job['email'], job['name'], *qr_job_attachments(job)))
+    assert [part.get_filename() for part in message.walk() if part.get_filename()] == [f'111{QR_FILE_SUFFIX}', f'333{QR_FILE_SUFFIX}']
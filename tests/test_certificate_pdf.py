@@ -0,0 +1,64 @@
+import re
+
+import pytest
+from PIL import Image
+
+from CertificatePDF import CertificatePDFRenderer, _pdf_string
+
+NAMES = ['İpek şahin', 'ağa (test) yılmaz']
+
+def make_renderer(tmp_path):
+    template = tmp_path / 'template.jpg'
+    Image.new('RGB', (300, 200), 'white').save(template, 'JPEG')
+    return CertificatePDFRenderer(str(template), font_size=20)
+
+def parse_xref(data):
+    """Returns {object id: offset} from the PDF's cross-reference table."""
+    startxref = int(re.search(rb'startxref\n(\d+)\n%%EOF\n$', data).group(1))
+    assert data[startxref:].startswith(b'xref\n')
+    header, rest = data[startxref + 5:].split(b'\n', 1)
+    first, count = map(int, header.split())
+    entries = rest[:20 * count].decode('ascii')
+    offsets = {}
+    for i in range(count):
+        offset, _, kind = entries[20 * i:20 * i + 18].split()
+        if kind == 'n':
+            offsets[first + i] = int(offset)
+    return offsets
+
+def test_turkish_letters_use_the_declared_font_codes():
+    # The /Differences array maps 221 -> Idotaccent, 254 -> scedilla, 240 -> gbreve
+    assert _pdf_string('İşğ') == b'(\xdd\xfe\xf0)'
+    assert _pdf_string('a(b)c\\') == b'(a\\(b\\)c\\\\)'
+
+def test_xref_offsets_point_at_their_objects(tmp_path):
+    data = make_renderer(tmp_path).render(NAMES)
+    offsets = parse_xref(data)
+    assert sorted(offsets) == list(range(1, 5 + 2 * len(NAMES)))
+    for object_id, offset in offsets.items():
+        assert data[offset:].startswith(b'%d 0 obj\n' % object_id)
+    assert re.search(rb'/Size (\d+)', data).group(1) == b'%d' % (len(offsets) + 1)
+
+def test_stream_lengths_match_their_data(tmp_path):
+    data = make_renderer(tmp_path).render(NAMES)
+    streams = list(re.finditer(rb'/Length (\d+)[^\n]*\nstream\n', data))
+    assert len(streams) == 1 + len(NAMES) # The template and one content stream per page
+    for match in streams:
+        end = match.end() + int(match.group(1))
+        assert data[end:end + len(b'\nendstream')] == b'\nendstream'
+
+def test_archive_embeds_the_template_once(tmp_path):
+    data = make_renderer(tmp_path).render(NAMES)
+    assert data.count(b'/Subtype /Image') == 1
+    assert data.count(b'/Type /Page ') == len(NAMES)
+    assert data.count(b'/XObject << /Template 4 0 R >>') == len(NAMES)
+    assert b'(\xddpek \xdeahin)' in data # Names are capitalized: 'Şahin'
+    assert b'(A\xf0a \\(test\\) Y\xfdlmaz)' in data
+
+def test_archive_opens_in_a_pdf_reader(tmp_path):
+    pypdf = pytest.importorskip('pypdf')
+    path = tmp_path / 'archive.pdf'
+    make_renderer(tmp_path).write(NAMES, str(path))
+    reader = pypdf.PdfReader(str(path), strict=True)
+    assert len(reader.pages) == len(NAMES)
+    assert 'İpek Şahin' in reader.pages[0].extract_text()
@@ -0,0 +1,137 @@
+import csv
+import queue
+import threading
+
+import pytest
+from PIL import Image
+
+import CertificateGeneratorSender
+from CertificateGeneratorSender import _render_ahead, stream_certificates, generate_certificates, send_certificates
+from DeliveryLog import DeliveryLog
+
+@pytest.fixture(params=[1, 2], ids=['in-process', 'two-workers'])
+def workers(request):
+    return request.param
+
+class MemorySession:
+    """Stands in for SMTPSession; keeps the sent messages in memory."""
+
+    sessions = []
+    refused = set() # Recipients whose send fails
+
+    def __init__(self, smtp_server, smtp_port, sender_email, sender_password):
+        self.sent = []
+        self.reconnects = 0
+        MemorySession.sessions.append(self)
+
+    def open(self):
+        pass
+
+    def send(self, recipient, msg):
+        if recipient in MemorySession.refused:
+            raise OSError('recipient refused')
+        self.sent.append(recipient)
+
+    def close(self):
+        pass
+
+@pytest.fixture
+def session(monkeypatch):
+    MemorySession.sessions = []
+    MemorySession.refused = set()
+    monkeypatch.setattr(CertificateGeneratorSender, 'SMTPSession', MemorySession)
+    return MemorySession.sessions
+
+def make_template(tmp_path):
+    path = tmp_path / 'template.png'
+    Image.new('RGB', (200, 100), 'white').save(path)
+    return str(path)
+
+def make_attendees(count):
+    return [{'isim': f'Participant {i}', 'mail': f'user{i}@example.com', 'mobile': f'555{i:07d}'} for i in range(count)]
+
+def drain(ready):
+    items = []
+    while True:
+        item = ready.get(timeout=30)
+        if item is None:
+            return items
+        items.append(item)
+
+def stream(tmp_path, attendees, template_path, workers, delivery_log):
+    """Runs stream_certificates in a thread so a hung consumer fails the test instead of blocking it."""
+    result = []
+    thread = threading.Thread(target=lambda: result.append(stream_certificates(
+        attendees, template_path, str(tmp_path / 'out'), 'sender@example.com', 'secret', 'localhost', 25,
+        font_path=str(tmp_path / 'missing.ttf'), font_size=20, workers=workers, chunk_size=1, file_format='png',
+        delivery_log=delivery_log, queue_size=2)))
+    thread.start()
+    thread.join(timeout=60)
+    assert not thread.is_alive()
+    return result[0]
+
+def test_render_ahead_emits_every_attendee_once(tmp_path, workers):
+    (tmp_path / 'out').mkdir()
+    attendees = make_attendees(7)
+    args = (make_template(tmp_path), str(tmp_path / 'out'), str(tmp_path / 'missing.ttf'), 20, (0, 0, 0), workers, 2, 'png', False)
+    for _ in range(2): # The second run sends up-to-date certificates without rendering
+        ready = queue.Queue(maxsize=2)
+        producer = threading.Thread(target=_render_ahead, args=(attendees, ready) + args)
+        producer.start()
+        items = drain(ready)
+        producer.join()
+        assert sorted(attendee['mobile'] for attendee, _ in items) == [attendee['mobile'] for attendee in attendees]
+        assert all(rendered for _, rendered in items)
+
+def test_failed_render_is_logged_and_not_sent(tmp_path, workers, session):
+    (tmp_path / 'out').mkdir()
+    attendees = make_attendees(4)
+    attendees[2]['isim'] = '' # The renderer refuses certificates without a name
+    delivery_log = DeliveryLog('certificate', db_path=str(tmp_path / 'log.sqlite'))
+    generated, sent, failed = stream(tmp_path, attendees, make_template(tmp_path), workers, delivery_log)
+
+    assert (generated, sent, failed) == (3, 3, 0)
+    assert sorted(session[0].sent) == ['user0@example.com', 'user1@example.com', 'user3@example.com']
+    errors_csv = tmp_path / 'errors.csv'
+    delivery_log.export_csv('errors', str(errors_csv))
+    with open(errors_csv, newline='') as f:
+        errors = [(row['email'], row['mobile'], row['reason']) for row in csv.DictReader(f)]
+    assert errors == [('user2@example.com', attendees[2]['mobile'], 'Certificate generation failed')]
+    delivery_log.close()
+
+def test_renderer_exception_ends_the_stream(tmp_path, workers, session):
+    (tmp_path / 'out').mkdir()
+    broken_template = tmp_path / 'template.png'
+    broken_template.write_text('not an image') # Decoding the template raises in the renderer
+    delivery_log = DeliveryLog('certificate', db_path=str(tmp_path / 'log.sqlite'))
+    assert stream(tmp_path, make_attendees(4), str(broken_template), workers, delivery_log) == (0, 0, 0)
+    assert session[0].sent == []
+    delivery_log.close()
+
+def test_rerun_after_partial_stream_sends_only_the_rest(tmp_path, workers, session):
+    (tmp_path / 'out').mkdir()
+    attendees = make_attendees(4)
+    template_path = make_template(tmp_path)
+    delivery_log = DeliveryLog('certificate', db_path=str(tmp_path / 'log.sqlite'))
+    MemorySession.refused = {'user1@example.com', 'user3@example.com'}
+    assert stream(tmp_path, attendees, template_path, workers, delivery_log) == (4, 2, 2)
+
+    MemorySession.refused = set()
+    assert stream(tmp_path, attendees, template_path, workers, delivery_log) == (2, 2, 0)
+    assert sorted(session[1].sent) == ['user1@example.com', 'user3@example.com']
+    delivery_log.close()
+
+def test_rerun_after_partial_send_sends_only_the_rest(tmp_path, session):
+    out_dir = str(tmp_path / 'out')
+    (tmp_path / 'out').mkdir()
+    attendees = make_attendees(4)
+    generate_certificates(attendees, make_template(tmp_path), out_dir, font_path=str(tmp_path / 'missing.ttf'), font_size=20, workers=1)
+    delivery_log = DeliveryLog('certificate', db_path=str(tmp_path / 'log.sqlite'))
+    MemorySession.refused = {'user2@example.com'}
+    send_certificates(attendees, out_dir, 'sender@example.com', 'secret', 'localhost', 25, delivery_log=delivery_log)
+
+    MemorySession.refused = set()
+    send_certificates(attendees, out_dir, 'sender@example.com', 'secret', 'localhost', 25, delivery_log=delivery_log)
+    assert len(session[0].sent) == 3
+    assert session[1].sent == ['user2@example.com']
+    delivery_log.close()
@@ -0,0 +1,79 @@
+import threading
+import http.client
+
+import pytest
+from google.api_core import exceptions as api_exceptions
+
+from CheckinService import CheckinService, serve
+from ParticipantStore import MemoryStore, FIELD_COUNTER, FIELD_NAME
+
+class AmbiguousStore(MemoryStore):
+    """Applies the first increment batches, then fails as if the reply was lost."""
+
+    def __init__(self, error, failures=1):
+        super().__init__()
+        self.error = error
+        self.failures = failures
+
+    def increment_counters(self, records, write_id=None):
+        applied = super().increment_counters(records, write_id=write_id)
+        if self.failures:
+            self.failures -= 1
+            raise self.error
+        return applied
+
+def make_service(store, uuids=('u1', 'u2')):
+    store.upsert_batch([(uuid, {FIELD_NAME: uuid, FIELD_COUNTER: 0}) for uuid in uuids])
+    service = CheckinService(store)
+    service.load()
+    return service
+
+def test_retried_increment_is_applied_once():
+    store = AmbiguousStore(api_exceptions.DeadlineExceeded('reply lost'))
+    service = make_service(store)
+    service.checkin('u1')
+    service.checkin('u1')
+    service.checkin('u2')
+
+    assert service.flush() == 2 # CommitController retried the batch after the timeout
+    assert store.documents['u1'][FIELD_COUNTER] == 2
+    assert store.documents['u2'][FIELD_COUNTER] == 1
+    assert service.status()['pending'] == 0
+
+def test_failed_batch_is_retried_with_its_write_id_on_next_flush():
+    store = AmbiguousStore(RuntimeError('connection reset')) # Not retried by CommitController
+    service = make_service(store)
+    service.checkin('u1')
+
+    assert service.flush() == 0
+    assert service.status()['pending'] == 1
+    service.checkin('u2')
+    assert service.flush() == 2
+    assert store.documents['u1'][FIELD_COUNTER] == 1
+    assert store.documents['u2'][FIELD_COUNTER] == 1
+    assert service.status()['pending'] == 0
+
+def test_listening_beyond_loopback_requires_a_token():
+    service = make_service(MemoryStore())
+    with pytest.raises(ValueError, match='CHECKIN_TOKEN'):
+        serve(service, '0.0.0.0', 0, token='')
+
+def test_requests_without_the_token_are_rejected():
+    service = make_service(MemoryStore())
+    server = serve(service, '127.0.0.1', 0, token='gate-secret')
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        conn = http.client.HTTPConnection(*server.server_address)
+        statuses = []
+        for headers in ({}, {'X-Checkin-Token': 'wrong'}, {'X-Checkin-Token': 'gate-secret'}):
+            conn.request('POST', '/checkin?uuid=u1', headers=headers)
+            response = conn.getresponse()
+            response.read()
+            statuses.append(response.status)
+        conn.close()
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    assert statuses == [401, 401, 200]
+    assert service.status()['checkins'] == 1
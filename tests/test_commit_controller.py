@@ -0,0 +1,11 @@
+from CommitController import CommitController
+
+def test_non_positive_max_concurrency_is_clamped_to_one():
+    committed = []
+    for max_concurrency in (0, -3):
+        controller = CommitController(batch_size=2, min_batch_size=1, max_concurrency=max_concurrency)
+        assert controller.max_concurrency == 1
+        assert controller.concurrency == 1
+        results = list(controller.commit_all(list(range(5)), committed.extend))
+        assert all(error is None for _, error in results)
+    assert sorted(committed) == sorted(list(range(5)) * 2)
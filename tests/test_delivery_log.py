@@ -0,0 +1,67 @@
+import csv
+import sqlite3
+
+from DeliveryLog import DeliveryLog
+
+def stored_rows(db_path, table):
+    """Rows committed to the database, as another process would see them."""
+    conn = sqlite3.connect(db_path)
+    try:
+        return conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+    finally:
+        conn.close()
+
+def write_csv(path, header, rows):
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(header)
+        writer.writerows(rows)
+
+def test_rows_are_written_every_flush_every_rows(tmp_path):
+    db_path = str(tmp_path / 'log.sqlite')
+    log = DeliveryLog('qr', db_path=db_path, flush_every=3, import_legacy=False)
+    log.record_sent('a@x.com', '111')
+    log.log_error('b@x.com', '222', 'Missing QR')
+    assert stored_rows(db_path, 'deliveries') == 0 and stored_rows(db_path, 'errors') == 0
+
+    log.record_sent('c@x.com', '333') # Third buffered row: one transaction
+    assert stored_rows(db_path, 'deliveries') == 2 and stored_rows(db_path, 'errors') == 1
+
+    log.record_sent('d@x.com', '444')
+    assert stored_rows(db_path, 'deliveries') == 2
+    log.close()
+    assert stored_rows(db_path, 'deliveries') == 3
+
+def test_is_sent_survives_reopening(tmp_path):
+    db_path = str(tmp_path / 'log.sqlite')
+    with DeliveryLog('qr', db_path=db_path, import_legacy=False) as log:
+        log.record_sent(' Ada@Example.com ', '111')
+        log.record_sent('ada@example.com', '222') # Same address: the first delivery is kept
+
+    with DeliveryLog('qr', db_path=db_path, import_legacy=False) as log:
+        assert log.is_sent('ADA@example.com')
+        assert not log.is_sent('grace@example.com')
+        assert log.counts() == {'sent': 1, 'errors': 0}
+    with DeliveryLog('certificate', db_path=db_path) as log:
+        assert not log.is_sent('ada@example.com') # Campaigns are tracked separately
+
+def test_legacy_csv_logs_are_imported_once(tmp_path):
+    sent_csv, errors_csv = str(tmp_path / 'sent_emails.csv'), str(tmp_path / 'email_errors.csv')
+    write_csv(sent_csv, ['email', 'mobile', 'sent_date'], [['a@x.com', '111', '2025-04-01 10:00:00'], ['b@x.com', '222', '']])
+    write_csv(errors_csv, ['email', 'mobile', 'reason', 'timestamp'], [['c@x.com', '333', 'Missing QR', '2025-04-01 10:01:00']])
+    log = DeliveryLog('qr', db_path=str(tmp_path / 'log.sqlite'), import_legacy=False)
+
+    assert log.import_csv_logs(sent_csv, errors_csv) == (2, 1)
+    assert log.is_sent('A@x.com') and log.is_sent('b@x.com')
+    assert log.import_csv_logs(sent_csv, errors_csv) == (0, 0) # Unchanged files are skipped
+
+    with open(sent_csv, 'a', encoding='utf-8', newline='') as f:
+        csv.writer(f).writerow(['d@x.com', '444', '2025-04-02 09:00:00'])
+    assert log.import_csv_logs(sent_csv, errors_csv) == (1, 0) # Only the appended row
+    assert log.counts() == {'sent': 3, 'errors': 1}
+
+    exported = str(tmp_path / 'sent.csv')
+    assert log.export_csv('sent', exported) == 3
+    with open(exported, encoding='utf-8', newline='') as f:
+        assert sorted(row['email'] for row in csv.DictReader(f)) == ['a@x.com', 'b@x.com', 'd@x.com']
+    log.close()
@@ -0,0 +1,104 @@
+from unittest import mock
+
+import pandas as pd
+import pytest
+
+import FirebaseSync
+from FirebaseSync import sync_dataframe, load_sync_manifest, fast_delete_collection, delete_store, SYNC_MANIFEST_SAVE_EVERY
+from ParticipantStore import MemoryStore, SQLiteStore, FirestoreStore, FIELD_NAME, FIELD_EMAIL
+from CommitController import CommitController
+
+def make_rows(count):
+    return pd.DataFrame({
+        'UUID': [f'uuid-{i}' for i in range(count)],
+        'Counter': '0',
+        'isim': 'Participant',
+        'mail': [f'user{i}@example.com' for i in range(count)],
+        'mobile': [f'555{i:07d}' for i in range(count)],
+    })
+
+def test_manifest_is_saved_every_few_batches_and_at_the_end(tmp_path):
+    manifest_path = str(tmp_path / 'manifest.json')
+    batches = SYNC_MANIFEST_SAVE_EVERY * 6 + 1
+    controller = CommitController(batch_size=1, min_batch_size=1, max_batch_size=1)
+    with mock.patch.object(FirebaseSync, 'save_sync_manifest', wraps=FirebaseSync.save_sync_manifest) as save:
+        result = sync_dataframe(MemoryStore(), make_rows(batches), manifest_path=manifest_path, controller=controller)
+
+    assert result['inserted'] == batches
+    assert save.call_count == 7 # Six full intervals plus the final save
+    assert len(load_sync_manifest(manifest_path)) == batches
+
+class FakeDocumentRef:
+    def __init__(self, doc_id):
+        self.id = doc_id
+
+class FakeBatch:
+    def __init__(self, documents, commits):
+        self.documents = documents
+        self.commits = commits
+        self.deletes = []
+
+    def delete(self, doc_ref):
+        self.deletes.append(doc_ref.id)
+
+    def commit(self):
+        for doc_id in self.deletes:
+            del self.documents[doc_id]
+        self.commits.append(len(self.deletes))
+
+class FakeCollection:
+    def __init__(self, name, documents):
+        self.id = name
+        self.documents = documents
+
+    def list_documents(self, page_size=None):
+        return [FakeDocumentRef(doc_id) for doc_id in list(self.documents)]
+
+class FakeFirestore:
+    """Just enough of a Firestore client for the keys-only delete."""
+
+    def __init__(self, count):
+        self.documents = {f'uuid-{i}': {} for i in range(count)}
+        self.commits = []
+
+    def collection(self, name):
+        return FakeCollection(name, self.documents)
+
+    def batch(self):
+        return FakeBatch(self.documents, self.commits)
+
+def test_fast_delete_removes_every_document_in_batches(tmp_path, monkeypatch):
+    manifest_path = tmp_path / 'manifest.json'
+    manifest_path.write_text('{}')
+    monkeypatch.setattr(FirestoreStore, 'sync_manifest_path', str(manifest_path))
+    db = FakeFirestore(1234)
+
+    assert fast_delete_collection(db, db.collection('users'), workers=3, batch_size=500) == 1234
+    assert db.documents == {}
+    assert sorted(db.commits) == [234, 500, 500]
+    assert not manifest_path.exists() # The recorded sync state is stale after a wipe
+
+@pytest.mark.parametrize('backend', ['memory', 'sqlite'])
+def test_delete_store_empties_local_backends(tmp_path, backend):
+    store = MemoryStore() if backend == 'memory' else SQLiteStore(str(tmp_path / 'participants.sqlite'))
+    sync_dataframe(store, make_rows(30), manifest_path=str(tmp_path / 'manifest.json'))
+
+    assert delete_store(store, workers=2) == 30
+    assert store.list_all() == []
+    assert delete_store(store) == 0
+    store.close()
+
+def test_cleared_fields_are_cleared_in_the_store(tmp_path):
+    store = MemoryStore()
+    manifest_path = str(tmp_path / 'manifest.json')
+    rows = make_rows(2)
+    sync_dataframe(store, rows, manifest_path=manifest_path)
+
+    rows.loc[0, 'mail'] = ''
+    rows.loc[1, 'isim'] = None
+    result = sync_dataframe(store, rows, manifest_path=manifest_path)
+
+    assert result['updated'] == 2
+    documents = dict(store.list_all())
+    assert documents['uuid-0'][FIELD_EMAIL] == ''
+    assert documents['uuid-1'][FIELD_NAME] == ''
@@ -0,0 +1,24 @@
+import json
+import threading
+
+from MailScheduler import MailScheduler
+
+def test_concurrent_saves_leave_a_readable_state_file(tmp_path, capsys):
+    state_file = str(tmp_path / 'state.json')
+    scheduler = MailScheduler('test', per_minute=0, per_day=0, state_file=state_file)
+    jobs = [{'email': f'user{i}@example.com', 'mobile': f'555{i:07d}'} for i in range(200)]
+
+    def checkpoint(offset):
+        for i in range(40):
+            scheduler.save('source', jobs[offset + i:])
+    threads = [threading.Thread(target=checkpoint, args=(offset,)) for offset in range(0, 80, 10)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert 'Warning' not in capsys.readouterr().out
+    with open(state_file, encoding='utf-8') as f:
+        assert json.load(f)['test']['queue']['source'] == 'source'
+    assert sorted(path.name for path in tmp_path.iterdir()) == ['state.json'] # No temporary files left behind
+    assert MailScheduler('test', state_file=state_file).load_queue('source') is not None
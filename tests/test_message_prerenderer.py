@@ -0,0 +1,72 @@
+import re
+
+from PIL import Image
+
+from smtp_sink import SMTPSink
+from MailSender import (
+    MessagePrerenderer, QREmailTemplate, SMTPSenderPool, _init_qr_renderer, _render_qr_job, qr_job_attachments,
+)
+from MailScheduler import MailScheduler
+
+SENDER = 'sender@example.com'
+SUBJECT = 'Your ticket'
+
+def normalize(message):
+    """Replaces the MIME boundary, which is random per template instance."""
+    boundary = re.search(r'boundary="([^"]+)"', message).group(1)
+    return message.replace(boundary, 'BOUNDARY')
+
+def make_jobs(tmp_path, count):
+    jobs = []
+    for i in range(count):
+        qr_path = str(tmp_path / f'555000{i}_designed.png')
+        Image.new('RGB', (20, 20), (i, i, i)).save(qr_path)
+        jobs.append({'index': i, 'email': f'user{i}@example.com', 'mobile': f'555000{i}', 'qr_path': qr_path,
+                     'name': 'şule ığdır' if i == 0 else f'participant {i}', 'qr_paths': [qr_path]})
+    del jobs[-1]['qr_paths'] # Queued by an older version: one ticket, no qr_paths
+    return jobs
+
+def build_message(job):
+    """What send_qr_codes renders in the sending threads when render_workers is 0."""
+    return QREmailTemplate(SENDER, SUBJECT).render(job['email'], job['name'], *qr_job_attachments(job))
+
+def test_worker_messages_match_in_process_messages(tmp_path):
+    jobs = make_jobs(tmp_path, 5)
+    prerenderer = MessagePrerenderer(jobs, _render_qr_job, initializer=_init_qr_renderer, initargs=(SENDER, SUBJECT), workers=2, window=2)
+    try:
+        for job in jobs:
+            assert normalize(prerenderer.get(job)) == normalize(build_message(job))
+    finally:
+        prerenderer.close()
+
+def test_requeued_and_unknown_jobs_are_rendered_on_demand(tmp_path):
+    jobs = make_jobs(tmp_path, 4)
+    prerenderer = MessagePrerenderer(jobs[:3], _render_qr_job, initializer=_init_qr_renderer, initargs=(SENDER, SUBJECT), workers=1, window=1)
+    try:
+        first = prerenderer.get(jobs[0])
+        assert prerenderer.get(jobs[0]) == first # Requeued: no longer prefetched, rendered again
+        assert normalize(prerenderer.get(jobs[3])) == normalize(build_message(jobs[3])) # Not in the prefetch list
+        assert normalize(prerenderer.get(jobs[1])) == normalize(build_message(jobs[1]))
+    finally:
+        prerenderer.close()
+
+def test_throttled_jobs_are_sent_from_rendered_messages(tmp_path):
+    jobs = make_jobs(tmp_path, 8)
+    sink = SMTPSink(throttle_rate=0.4).start()
+    prerenderer = MessagePrerenderer(jobs, _render_qr_job, initializer=_init_qr_renderer, initargs=(SENDER, SUBJECT), workers=2, window=3)
+    renders = []
+    def get(job):
+        renders.append(job['email'])
+        return prerenderer.get(job)
+    try:
+        scheduler = MailScheduler('test', per_minute=0, per_day=0, state_file=str(tmp_path / 'state.json'), throttle_backoff=0.01)
+        pool = SMTPSenderPool(sink.host, sink.port, SENDER, '', concurrency=2, max_deferrals=20)
+        result = pool.run(jobs, build_message=get, on_sent=lambda job: None, on_failed=lambda job, reason: None, scheduler=scheduler)
+    finally:
+        prerenderer.close()
+        sink.stop()
+
+    assert result['deferred'] > 0
+    assert result['sent'] == len(jobs)
+    assert len(renders) == len(jobs) + result['deferred'] # Every retry got a message again
+    assert sink.snapshot()['accepted'] == len(jobs)
@@ -0,0 +1,51 @@
+import pandas as pd
+import pytest
+
+from OfflineCheckin import CheckinJournal, reconcile, open_ledger
+from ParticipantStore import MemoryStore, FIELD_COUNTER, FIELD_NAME
+
+class LostReplyStore(MemoryStore):
+    """Applies increments, then raises as if the confirmation never reached the ledger."""
+    lose_reply = True
+
+    def increment_counters(self, records, write_id=None):
+        applied = super().increment_counters(records, write_id=write_id)
+        if self.lose_reply:
+            raise RuntimeError('connection reset') # Not retried by CommitController
+        return applied
+
+@pytest.fixture
+def journal_path(tmp_path):
+    path = str(tmp_path / 'gate.sqlite')
+    journal = CheckinJournal(path, gate='north')
+    journal.seed(pd.DataFrame({'UUID': ['u1', 'u2'], 'isim': ['A', 'B'], 'mail': ['a@x', 'b@x'], 'mobile': ['1', '2']}))
+    for uuid_value in ('u1', 'u1', 'u2', 'unknown'):
+        journal.record_scan(uuid_value)
+    journal.close()
+    return path
+
+def make_store(store_class):
+    store = store_class()
+    store.upsert_batch([('u1', {FIELD_NAME: 'A'}), ('u2', {FIELD_NAME: 'B'})])
+    return store
+
+def test_reconcile_rerun_counts_once(tmp_path, journal_path):
+    store = make_store(MemoryStore)
+    ledger_path = str(tmp_path / 'ledger.sqlite')
+    assert reconcile(store, [journal_path], ledger_path)['pushed'] == 2
+    assert reconcile(store, [journal_path], ledger_path)['pushed'] == 0
+    assert store.documents['u1'][FIELD_COUNTER] == 2
+    assert store.documents['u2'][FIELD_COUNTER] == 1
+
+def test_unconfirmed_push_does_not_double_count(tmp_path, journal_path):
+    store = make_store(LostReplyStore)
+    ledger_path = str(tmp_path / 'ledger.sqlite')
+    assert reconcile(store, [journal_path], ledger_path)['failed'] == 2
+    ledger = open_ledger(ledger_path)
+    assert ledger.execute("SELECT COUNT(*) FROM pushing").fetchone()[0] == 2 # Unconfirmed
+    ledger.close()
+
+    store.lose_reply = False
+    assert reconcile(store, [journal_path], ledger_path)['pushed'] == 2 # Same write ID, skipped by the store
+    assert store.documents['u1'][FIELD_COUNTER] == 2
+    assert store.documents['u2'][FIELD_COUNTER] == 1
@@ -0,0 +1,90 @@
+import pytest
+
+from Pipeline import Pipeline, Stage, STAGE_RAN, STAGE_SKIPPED, STAGE_FAILED, STAGE_DECLINED, STAGE_BLOCKED
+
+@pytest.fixture(params=[False, True], ids=['sequential', 'parallel'])
+def parallel(request):
+    return request.param
+
+def build_pipeline(tmp_path, calls, fail=(), **extra):
+    """source.txt -> copy (copy.txt) -> upper (upper.txt), plus a report stage that always runs after copy."""
+    source, copy, upper = tmp_path / 'source.txt', tmp_path / 'copy.txt', tmp_path / 'upper.txt'
+
+    def step(name, func):
+        def run(context):
+            calls.append(name)
+            if name in fail:
+                return False
+            func()
+        return run
+
+    stages = [
+        Stage('copy', step('copy', lambda: copy.write_text(source.read_text())), inputs=[str(source)], outputs=[str(copy)]),
+        Stage('upper', step('upper', lambda: upper.write_text(copy.read_text().upper())),
+              inputs=[str(copy)], outputs=[str(upper)], after=['copy'], **extra),
+        Stage('report', step('report', lambda: None), after=['copy'], always_run=True),
+    ]
+    return Pipeline(stages, state_path=str(tmp_path / 'state.json'))
+
+def test_unchanged_stages_are_skipped_until_an_input_changes(tmp_path, parallel):
+    (tmp_path / 'source.txt').write_text('ada')
+    calls = []
+    assert set(build_pipeline(tmp_path, calls).run(parallel=parallel).values()) == {STAGE_RAN}
+
+    calls.clear()
+    results = build_pipeline(tmp_path, calls).run(parallel=parallel)
+    assert results == {'copy': STAGE_SKIPPED, 'upper': STAGE_SKIPPED, 'report': STAGE_RAN}
+    assert calls == ['report']
+
+    calls.clear()
+    (tmp_path / 'source.txt').write_text('grace')
+    results = build_pipeline(tmp_path, calls).run(parallel=parallel)
+    assert results == {'copy': STAGE_RAN, 'upper': STAGE_RAN, 'report': STAGE_RAN}
+    assert (tmp_path / 'upper.txt').read_text() == 'GRACE'
+
+def test_missing_output_or_force_reruns_a_stage(tmp_path, parallel):
+    (tmp_path / 'source.txt').write_text('ada')
+    calls = []
+    build_pipeline(tmp_path, calls).run(parallel=parallel)
+
+    calls.clear()
+    (tmp_path / 'upper.txt').unlink()
+    results = build_pipeline(tmp_path, calls).run(parallel=parallel)
+    assert results['copy'] == STAGE_SKIPPED
+    assert results['upper'] == STAGE_RAN
+
+    calls.clear()
+    results = build_pipeline(tmp_path, calls).run(parallel=parallel, force=True)
+    assert set(results.values()) == {STAGE_RAN}
+    assert sorted(calls) == ['copy', 'report', 'upper']
+
+def test_failed_stage_blocks_downstream_and_is_retried(tmp_path, parallel):
+    (tmp_path / 'source.txt').write_text('ada')
+    calls = []
+    results = build_pipeline(tmp_path, calls, fail={'copy'}).run(parallel=parallel)
+    assert results == {'copy': STAGE_FAILED, 'upper': STAGE_BLOCKED, 'report': STAGE_BLOCKED}
+    assert calls == ['copy']
+
+    calls.clear()
+    results = build_pipeline(tmp_path, calls).run(parallel=parallel)
+    assert results['copy'] == STAGE_RAN # A failure records no fingerprint
+
+def test_declined_stage_is_not_run_until_confirmed(tmp_path, parallel, monkeypatch):
+    (tmp_path / 'source.txt').write_text('ada')
+    monkeypatch.setattr('builtins.input', lambda prompt: 'no')
+    calls = []
+    results = build_pipeline(tmp_path, calls, confirm='Upper-case?').run(parallel=parallel)
+    assert results == {'copy': STAGE_RAN, 'upper': STAGE_DECLINED, 'report': STAGE_RAN}
+    assert 'upper' not in calls
+
+    calls.clear()
+    results = build_pipeline(tmp_path, calls, confirm='Upper-case?').run(parallel=parallel, assume_yes=True)
+    assert results['upper'] == STAGE_RAN
+
+def test_targets_select_upstream_stages_only(tmp_path):
+    (tmp_path / 'source.txt').write_text('ada')
+    calls = []
+    results = build_pipeline(tmp_path, calls).run(targets=['upper'])
+    assert list(results) == ['copy', 'upper']
+    with pytest.raises(ValueError):
+        build_pipeline(tmp_path, calls).run(targets=['missing'])
@@ -0,0 +1,82 @@
+import os
+import shutil
+
+import pandas as pd
+import pytest
+from PIL import Image, ImageFont
+
+from CertificateGeneratorSender import generate_certificates
+from QRDesign import overlay_qr_on_template, resolve_font_path, DESIGN_QR_SIZE
+
+@pytest.fixture
+def saved(monkeypatch):
+    """Names of the images saved (i.e. rendered) since the last clear()."""
+    names = []
+    save = Image.Image.save
+    def recording_save(image, fp, *args, **kwargs):
+        names.append(os.path.basename(fp))
+        return save(image, fp, *args, **kwargs)
+    monkeypatch.setattr(Image.Image, 'save', recording_save)
+    return names
+
+def make_image(path, color='white', size=(200, 100)):
+    Image.new('RGB', size, color).save(path)
+    return str(path)
+
+def render_certificates(tmp_path, attendees, saved):
+    saved.clear()
+    generate_certificates(attendees, str(tmp_path / 'template.png'), str(tmp_path / 'out'),
+                          font_path=str(tmp_path / 'missing.ttf'), font_size=20, workers=1, file_format='png')
+    return sorted(saved)
+
+def test_certificates_are_rendered_again_only_when_their_inputs_change(tmp_path, saved):
+    (tmp_path / 'out').mkdir()
+    make_image(tmp_path / 'template.png')
+    attendees = [{'isim': f'Participant {i}', 'mobile': f'555000{i}'} for i in range(3)]
+    assert render_certificates(tmp_path, attendees, saved) == ['5550000.png', '5550001.png', '5550002.png']
+
+    assert render_certificates(tmp_path, attendees, saved) == []
+
+    attendees[1]['isim'] = 'Renamed Participant'
+    assert render_certificates(tmp_path, attendees, saved) == ['5550001.png']
+
+    (tmp_path / 'out' / '5550002.png').unlink()
+    assert render_certificates(tmp_path, attendees, saved) == ['5550002.png']
+
+    make_image(tmp_path / 'template.png', color='ivory')
+    assert render_certificates(tmp_path, attendees, saved) == ['5550000.png', '5550001.png', '5550002.png']
+
+def test_designed_tickets_are_rendered_again_only_when_their_inputs_change(tmp_path, saved):
+    qr_dir, out_dir = tmp_path / 'qr', tmp_path / 'designed'
+    qr_dir.mkdir()
+    for mobile in ('5550000', '5550001'):
+        make_image(qr_dir / f'{mobile}.png', color='black', size=(20, 20))
+    csv_path = tmp_path / 'attendees.csv'
+    template_size = (DESIGN_QR_SIZE + 10, DESIGN_QR_SIZE + 10)
+    make_image(tmp_path / 'template.png', size=template_size)
+
+    def design(names):
+        pd.DataFrame({'mobile': ['5550000', '5550001'], 'isim': names}).to_csv(csv_path, index=False)
+        saved.clear()
+        assert overlay_qr_on_template(str(qr_dir), str(tmp_path / 'template.png'), str(out_dir), csv_path=str(csv_path))
+        return sorted(saved)
+
+    assert design(['Ada', 'Grace']) == ['5550000_designed.png', '5550001_designed.png']
+    assert design(['Ada', 'Grace']) == []
+    assert design(['Ada', 'Grace Hopper']) == ['5550001_designed.png']
+    (out_dir / '5550000_designed.png').unlink()
+    assert design(['Ada', 'Grace Hopper']) == ['5550000_designed.png']
+    make_image(tmp_path / 'template.png', color='ivory', size=template_size)
+    assert design(['Ada', 'Grace Hopper']) == ['5550000_designed.png', '5550001_designed.png']
+
+def test_resolved_design_font_is_the_file_pil_loads(tmp_path, monkeypatch):
+    fonts = tmp_path / 'share' / 'fonts' / 'truetype'
+    fonts.mkdir(parents=True)
+    shutil.copy(ImageFont.truetype('DejaVuSans.ttf', 10).path, fonts / 'design-font.ttf')
+    monkeypatch.setenv('XDG_DATA_HOME', str(tmp_path / 'share'))
+    monkeypatch.chdir(tmp_path)
+
+    resolved = resolve_font_path('design-font.ttf')
+    assert resolved == str(fonts / 'design-font.ttf')
+    assert ImageFont.truetype('design-font.ttf', 10).path == resolved
+    assert resolve_font_path('missing-font.ttf') is None
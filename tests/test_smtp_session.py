@@ -0,0 +1,107 @@
+import time
+import smtplib
+
+import pytest
+
+from smtp_sink import SMTPSink
+from MailSender import SMTPSession, SMTPSenderPool, open_smtp_session
+from MailScheduler import MailScheduler
+
+SENDER = 'sender@example.com'
+REFUSED = 'nobody@example.com'
+MESSAGE = 'Subject: test\r\n\r\nHello\r\n'
+
+@pytest.fixture
+def sink():
+    sink = SMTPSink(refused_recipients=[REFUSED]).start()
+    yield sink
+    sink.stop()
+
+def test_refused_recipient_fails_only_that_message(sink):
+    session = SMTPSession(sink.host, sink.port, SENDER, '')
+    with pytest.raises(smtplib.SMTPRecipientsRefused):
+        session.send(REFUSED, MESSAGE)
+    session.send('someone@example.com', MESSAGE)
+    session.close()
+
+    assert session.reconnects == 0
+    stats = sink.snapshot()
+    assert stats['sessions'] == 1
+    assert stats['accepted'] == 1
+
+def test_pool_keeps_sending_after_refused_recipient(sink):
+    jobs = [{'email': REFUSED}] + [{'email': f'user{i}@example.com'} for i in range(5)]
+    sent, failed = [], []
+    pool = SMTPSenderPool(sink.host, sink.port, SENDER, '', concurrency=2)
+    result = pool.run(jobs, build_message=lambda job: MESSAGE,
+                      on_sent=lambda job: sent.append(job['email']),
+                      on_failed=lambda job, reason: failed.append((job['email'], reason)))
+
+    assert result['sent'] == 5
+    assert result['failed'] == 1
+    assert result['reconnects'] == 0
+    assert [email for email, _ in failed] == [REFUSED]
+    assert failed[0][1].startswith('Sending failed')
+
+def test_pool_fails_job_after_max_deferrals(tmp_path):
+    sink = SMTPSink(throttle_rate=1.0).start() # Every message gets 451
+    try:
+        scheduler = MailScheduler('test', per_minute=0, per_day=0, state_file=str(tmp_path / 'state.json'), throttle_backoff=0.01)
+        failed = []
+        pool = SMTPSenderPool(sink.host, sink.port, SENDER, '', concurrency=2, max_deferrals=3)
+        result = pool.run([{'email': 'full@example.com'}, {'email': 'grey@example.com'}], build_message=lambda job: MESSAGE,
+                          on_sent=lambda job: None, on_failed=lambda job, reason: failed.append(reason), scheduler=scheduler)
+    finally:
+        sink.stop()
+
+    assert result['sent'] == 0
+    assert result['failed'] == 2
+    assert result['deferred'] == 4 # Two requeues per job, the third rejection fails it
+    assert result['pending'] == []
+    assert all(reason.startswith('Temporarily rejected 3 times') for reason in failed)
+
+def test_password_is_not_sent_without_starttls(sink):
+    with pytest.raises(smtplib.SMTPNotSupportedError, match='STARTTLS'):
+        open_smtp_session(sink.host, sink.port, SENDER, 'secret', allow_insecure=False)
+    with pytest.raises(smtplib.SMTPNotSupportedError, match='STARTTLS'):
+        SMTPSession(sink.host, sink.port, SENDER, 'secret').send('someone@example.com', MESSAGE)
+    assert sink.snapshot()['accepted'] == 0
+
+def test_throttling_spaces_out_retries_without_quotas(tmp_path):
+    sink = SMTPSink(throttle_rate=1.0).start()
+    try:
+        scheduler = MailScheduler('test', per_minute=0, per_day=0, state_file=str(tmp_path / 'state.json'), throttle_backoff=0.1)
+        attempts = []
+        def build_message(job):
+            attempts.append(time.monotonic())
+            return MESSAGE
+        pool = SMTPSenderPool(sink.host, sink.port, SENDER, '', concurrency=1, max_deferrals=3)
+        pool.run([{'email': 'grey@example.com'}], build_message=build_message,
+                 on_sent=lambda job: None, on_failed=lambda job, reason: None, scheduler=scheduler)
+    finally:
+        sink.stop()
+
+    assert len(attempts) == 3
+    gaps = [later - earlier for earlier, later in zip(attempts, attempts[1:])]
+    # Jittered between half and all of 0.1s after the first rejection, then of 0.2s
+    assert gaps[0] >= 0.05
+    assert gaps[1] >= 0.1
+
+def test_throttling_lowers_the_sending_rate(tmp_path):
+    results = {}
+    for throttle_rate in (0.0, 0.3):
+        sink = SMTPSink(throttle_rate=throttle_rate).start()
+        try:
+            scheduler = MailScheduler('test', per_minute=0, per_day=0, state_file=str(tmp_path / f'{throttle_rate}.json'),
+                                      throttle_backoff=0.05)
+            pool = SMTPSenderPool(sink.host, sink.port, SENDER, '', concurrency=2, max_deferrals=0)
+            jobs = [{'email': f'user{i}@example.com'} for i in range(20)]
+            results[throttle_rate] = pool.run(jobs, build_message=lambda job: MESSAGE, on_sent=lambda job: None,
+                                              on_failed=lambda job, reason: None, scheduler=scheduler)
+        finally:
+            sink.stop()
+
+    assert results[0.0]['deferred'] == 0
+    assert results[0.3]['deferred'] > 0
+    assert results[0.3]['sent'] == results[0.0]['sent'] == 20
+    assert results[0.3]['rate'] < results[0.0]['rate'] / 2
@@ -0,0 +1,42 @@
+import uuid
+
+import pandas as pd
+
+from TicketIndex import TicketIndex, write_ticket_index, MAX_FIELD_BYTES
+
+def make_uuid(i):
+    return str(uuid.uuid5(uuid.NAMESPACE_DNS, f'555{i:07d}'))
+
+def test_round_trip(tmp_path):
+    index_path = str(tmp_path / 'tickets.idx')
+    df = pd.DataFrame({
+        'UUID': [make_uuid(i) for i in range(50)] + ['not-a-uuid'],
+        'isim': [f'Katılımcı Öztürk {i}' for i in range(50)] + ['Skipped'],
+        'mail': [f'user{i}@example.com' for i in range(50)] + [''],
+        'mobile': [f'555{i:07d}' for i in range(50)] + [''],
+    })
+
+    assert write_ticket_index(df, index_path) == 50
+    with TicketIndex(index_path) as index:
+        assert len(index) == 50
+        for i in (0, 17, 49):
+            assert index.lookup(make_uuid(i)) == {
+                'uuid': make_uuid(i),
+                'name': f'Katılımcı Öztürk {i}',
+                'email': f'user{i}@example.com',
+                'mobile': f'555{i:07d}',
+            }
+        assert make_uuid(50) not in index
+        assert index.lookup('not-a-uuid') is None
+
+def test_long_multibyte_name_is_cut_at_a_character_boundary(tmp_path):
+    index_path = str(tmp_path / 'tickets.idx')
+    name = 'ş' * MAX_FIELD_BYTES # Two bytes per character; the odd byte limit falls inside one
+    write_ticket_index(pd.DataFrame({'UUID': [make_uuid(1)], 'isim': [name], 'mail': ['x@example.com'], 'mobile': ['5550000001']}), index_path)
+
+    with TicketIndex(index_path) as index:
+        ticket = index.lookup(make_uuid(1))
+    assert name.startswith(ticket['name'])
+    assert len(ticket['name'].encode('utf-8')) == MAX_FIELD_BYTES - 1
+    assert ticket['email'] == 'x@example.com'
+    assert ticket['mobile'] == '5550000001'